@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for lambda_function_full.py
+
+Every measurement runs in a fresh interpreter, the way a new Lambda execution
+environment would, and the script fails if the median module import time is
+over budget or if importing the module (or answering a 400) pulls in boto3 or
+yt-dlp.
+
+Usage:
+    python bench_cold_start.py [--runs 10] [--budget-ms 150]
+    python bench_cold_start.py --path deployment --path lambda-layer/python \
+        --bundle deployment/botocore_models.pickle
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Same layout as the Lambda bundle: dependencies from deployment_full, yt-dlp from the layer
+DEFAULT_PATHS = [
+    BACKEND_DIR,
+    os.path.join(BACKEND_DIR, 'deployment_full'),
+    os.path.join(BACKEND_DIR, 'lambda-layer', 'python'),
+]
+
+HEAVY_MODULES = ['boto3', 'botocore', 'yt_dlp']
+
+# Runs inside the child interpreter and prints one JSON line of timings
+PROBE = r'''
+import json, sys, time
+start = time.perf_counter()
+import lambda_function_full
+imported = time.perf_counter()
+loaded_on_import = [m for m in HEAVY if m in sys.modules]
+
+response = lambda_function_full.lambda_handler({'body': '{}'}, None)
+handled = time.perf_counter()
+loaded_on_400 = [m for m in HEAVY if m in sys.modules]
+assert response['statusCode'] == 400, response
+
+lambda_function_full.get_client('s3')
+client_ready = time.perf_counter()
+
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'bad_request_ms': (handled - imported) * 1000,
+    's3_client_ms': (client_ready - handled) * 1000,
+    'loaded_on_import': loaded_on_import,
+    'loaded_on_400': loaded_on_400,
+}))
+'''
+
+
+def run_probe(paths, bundle=None):
+    """Run the probe in a fresh interpreter and return its timings"""
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join(paths),
+        PYTHONDONTWRITEBYTECODE='1',
+        RAW_BUCKET='bench-raw',
+        TRANSCRIPTS_BUCKET='bench-transcripts',
+        SUMMARIES_BUCKET='bench-summaries',
+        AWS_DEFAULT_REGION=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'),
+        AWS_ACCESS_KEY_ID=os.environ.get('AWS_ACCESS_KEY_ID', 'bench'),
+        AWS_SECRET_ACCESS_KEY=os.environ.get('AWS_SECRET_ACCESS_KEY', 'bench'),
+        # Without a bundle, get_client() falls back to the stock botocore loader
+        BOTOCORE_MODEL_BUNDLE=os.path.abspath(bundle) if bundle else '',
+    )
+    output = subprocess.run(
+        [sys.executable, '-c', f'HEAVY = {HEAVY_MODULES!r}\n{PROBE}'],
+        env=env, cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure handler cold-start time')
+    parser.add_argument('--runs', type=int, default=10, help='fresh interpreters to start')
+    parser.add_argument('--budget-ms', type=float, default=150, help='median import time budget')
+    parser.add_argument('--path', action='append', help='module search path (repeatable)')
+    parser.add_argument('--bundle', help='botocore model bundle from bundle_botocore_models.py')
+    args = parser.parse_args()
+
+    results = [run_probe(args.path or DEFAULT_PATHS, args.bundle) for _ in range(args.runs)]
+
+    print(f"{'metric':<16}{'min':>10}{'median':>10}{'max':>10}")
+    for metric in ['import_ms', 's3_client_ms', 'bad_request_ms']:
+        values = [result[metric] for result in results]
+        print(f"{metric:<16}{min(values):>10.1f}{statistics.median(values):>10.1f}{max(values):>10.1f}")
+
+    failures = []
+    import_median = statistics.median(result['import_ms'] for result in results)
+    if import_median > args.budget_ms:
+        failures.append(f"median import {import_median:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+    for stage in ['loaded_on_import', 'loaded_on_400']:
+        loaded = sorted({module for result in results for module in result[stage]})
+        if loaded:
+            failures.append(f"{stage.replace('_', ' ')}: {', '.join(loaded)}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print(f"OK: median import {import_median:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
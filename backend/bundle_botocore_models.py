@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Build the pre-serialized botocore model bundle for the Lambda package
+
+The function only talks to a handful of AWS services, but botocore ships the
+models for all of them. Building a client makes the stock loader scan every
+service directory under botocore/data/ and decode large gzipped JSON models.
+This script writes the models the function needs into one pickle file that
+lambda_function_full.py loads without any directory probing. With --prune, it
+also deletes the other services from the package's botocore/data/.
+
+Usage:
+    python bundle_botocore_models.py --target deployment [--prune]
+"""
+import argparse
+import os
+import pickle
+import shutil
+import sys
+
+BUNDLE_FILENAME = 'botocore_models.pickle'
+
+# Every service lambda_function_full.py creates a client for
+SERVICES = ['s3', 'transcribe', 'bedrock-runtime', 'lambda']
+
+# Per-service model types: client, endpoint resolution and pagination (plus their SDK extras)
+MODEL_TYPES = [
+    'service-2',
+    'service-2.sdk-extras',
+    'endpoint-rule-set-1',
+    'paginators-1',
+    'paginators-1.sdk-extras',
+    'waiters-2',
+]
+
+# Top-level data files the session and client creator load on their own
+SHARED_DATA = ['endpoints', 'partitions', 'sdk-default-configuration', '_retry']
+
+
+def load_botocore(target):
+    """Import botocore from the package being built, not from the build machine"""
+    sys.path.insert(0, os.path.abspath(target))
+    import botocore
+    from botocore.loaders import Loader
+
+    if not os.path.abspath(botocore.__file__).startswith(os.path.abspath(target)):
+        raise SystemExit(f"botocore is not installed in {target}")
+    return botocore, Loader(include_default_search_paths=False, extra_search_paths=[Loader.BUILTIN_DATA_PATH])
+
+
+def build_bundle(botocore, loader, services):
+    """Collect the models and pickle each one separately so the function only decodes what it uses"""
+    from botocore.exceptions import DataNotFoundError
+
+    index = {}
+    data = {}
+    for name in SHARED_DATA:
+        data[name] = pickle.dumps(loader.load_data(name), protocol=pickle.HIGHEST_PROTOCOL)
+
+    for service_name in services:
+        api_version = loader.determine_latest_version(service_name, 'service-2')
+        for type_name in MODEL_TYPES:
+            name = f"{service_name}/{api_version}/{type_name}"
+            try:
+                model = loader.load_data(name)
+            except DataNotFoundError:
+                continue
+            data[name] = pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)
+            index.setdefault(type_name, {}).setdefault(service_name, []).append(api_version)
+
+    return {
+        'botocore_version': botocore.__version__,
+        'index': index,
+        'data': data,
+    }
+
+
+def prune_data_dir(data_dir, services):
+    """Delete every service directory the function never builds a client for"""
+    removed = 0
+    for entry in os.listdir(data_dir):
+        path = os.path.join(data_dir, entry)
+        if os.path.isdir(path) and entry not in services:
+            shutil.rmtree(path)
+            removed += 1
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bundle the botocore models the Lambda function uses')
+    parser.add_argument('--target', required=True, help='package directory containing botocore/')
+    parser.add_argument('--service', action='append', help='service to bundle (repeatable, default: all used)')
+    parser.add_argument('--prune', action='store_true', help='delete unused services from botocore/data/')
+    args = parser.parse_args()
+
+    services = args.service or SERVICES
+    botocore, loader = load_botocore(args.target)
+    bundle = build_bundle(botocore, loader, services)
+
+    bundle_path = os.path.join(args.target, BUNDLE_FILENAME)
+    with open(bundle_path, 'wb') as f:
+        pickle.dump(bundle, f, protocol=pickle.HIGHEST_PROTOCOL)
+    print(f"Bundled {len(bundle['data'])} models for botocore {bundle['botocore_version']}: "
+          f"{bundle_path} ({os.path.getsize(bundle_path) / 1024:.0f} KiB)")
+
+    if args.prune:
+        removed = prune_data_dir(loader.BUILTIN_DATA_PATH, services)
+        print(f"Pruned {removed} unused services from {loader.BUILTIN_DATA_PATH}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,6 +2,11 @@
 
 # Script to package Lambda function for deployment
 
+# Handler module to package; it is always deployed as lambda_function.py. The API
+# routes, S3 notification and EventBridge rules in infra/ call handlers that only
+# lambda_function_full.py implements
+LAMBDA_SOURCE=${LAMBDA_SOURCE:-lambda_function_full.py}
+
 echo "🚀 Packaging Lambda function for deployment..."
 
 # Create deployment directory
@@ -10,11 +15,17 @@ cd deployment
 
 # Install dependencies
 echo "📦 Installing Python dependencies..."
-pip install -r ../requirements.txt -t .
+# Binary wheels for the Lambda runtime, so NumPy works when packaging on another platform
+pip install -r ../requirements.txt -t . \
+    --platform manylinux2014_x86_64 --python-version 3.11 --implementation cp --only-binary=:all:
 
 # Copy Lambda function code
 echo "📋 Copying Lambda function code..."
-cp ../lambda_function.py .
+cp "../$LAMBDA_SOURCE" lambda_function.py
+
+# Ship only the botocore models the function uses, pre-serialized for fast client creation
+echo "✂️ Bundling botocore models and pruning unused services..."
+python ../bundle_botocore_models.py --target . --prune
 
 # Create deployment package
 echo "🗜️ Creating deployment package..."
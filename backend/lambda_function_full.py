@@ -1,202 +1,3219 @@
+import hashlib
 import json
-import boto3
+import math
 import os
+import random
+import re
+import struct
 import subprocess
+import sys
 import tempfile
 import uuid
 import time
-import yt_dlp
-from urllib.parse import urlparse, parse_qs
-from botocore.exceptions import ClientError
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from difflib import SequenceMatcher
+from urllib.parse import urlparse, parse_qs, unquote_plus
 
-# Initialize AWS clients
-s3_client = boto3.client('s3')
-transcribe_client = boto3.client('transcribe')
-bedrock_client = boto3.client('bedrock-runtime')
+# AWS clients are created on first use and reused across warm invocations, so
+# cache hits and validation errors never pay for importing boto3 (see get_client).
+# There is one per service.
+_clients = {}
+_clients_lock = threading.Lock()
+_boto3_session = None
+# time.monotonic() value at which the current invocation times out (see set_invocation_deadline)
+_invocation_deadline = None
+# Search index objects read by warm invocations: shards of the current generation and
+# unmerged segments, both immutable once written (see search_index)
+_search_cache = {'generation': None, 'shards': {}, 'segments': {}}
+# Serializes read-modify-write updates of checkpoint records within an invocation
+_checkpoint_lock = threading.RLock()
+
+# Pre-serialized botocore models written by bundle_botocore_models.py at deploy time;
+# when present, clients are built from it instead of scanning botocore/data/
+BOTOCORE_MODEL_BUNDLE = os.environ.get(
+    'BOTOCORE_MODEL_BUNDLE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'botocore_models.pickle')
+)
 
 # Environment variables
 RAW_BUCKET = os.environ['RAW_BUCKET']
 TRANSCRIPTS_BUCKET = os.environ['TRANSCRIPTS_BUCKET']
 SUMMARIES_BUCKET = os.environ['SUMMARIES_BUCKET']
 BEDROCK_MODEL = os.environ.get('BEDROCK_MODEL', 'anthropic.claude-3-sonnet-20240229-v1:0')
+# When enabled, jobs pause after starting Transcribe and resume from the
+# transcribe-output/ S3 event instead of polling inside the invocation
+TRANSCRIPTION_EVENTS = os.environ.get('TRANSCRIPTION_EVENTS', 'true').lower() == 'true'
+# Default for the per-request "streaming" option: pipe yt-dlp through ffmpeg into an
+# S3 multipart upload instead of staging the audio in /tmp
+STREAMING_UPLOAD = os.environ.get('STREAMING_UPLOAD', 'false').lower() == 'true'
+FFMPEG_PATH = os.environ.get('FFMPEG_PATH', 'ffmpeg')
+
+# Bump whenever the summarization prompt changes so stale cached results are not served
+PROMPT_VERSION = 'v3'
+
+# YouTube video IDs are always 11 characters from the URL-safe base64 alphabet
+VIDEO_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{11}$')
+YOUTUBE_HOSTS = {
+    'youtube.com', 'www.youtube.com', 'm.youtube.com', 'music.youtube.com',
+    'youtube-nocookie.com', 'www.youtube-nocookie.com'
+}
+YOUTUBE_PATH_PREFIXES = ('shorts', 'embed', 'live', 'v', 'e')
+
+# Caption tracks are tried in this order; Transcribe is configured for en-US,
+# so only English tracks are considered
+CAPTION_LANGUAGES = ['en', 'en-US', 'en-GB', 'en-orig']
+MIN_CAPTION_WORDS = 20
+CAPTION_TAG_PATTERN = re.compile(r'<[^>]+>')
+
+# Pre-flight: a video's metadata is read before anything is downloaded. Live streams,
+# unreleased premieres and private or members-only videos fail straight away, as do
+# videos without captions longer than MAX_VIDEO_SECONDS
+MAX_VIDEO_SECONDS = int(os.environ.get('MAX_VIDEO_SECONDS', '14400'))
+REJECTED_LIVE_STATUSES = {
+    'is_live': 'Live streams can be summarized once they have ended',
+    'is_upcoming': 'This video has not premiered yet',
+    'post_live': 'This live stream is still being processed by YouTube, try again later',
+}
+REJECTED_AVAILABILITY = {
+    'private': 'This video is private',
+    'premium_only': 'This video requires YouTube Premium',
+    'subscriber_only': 'This video is available to channel members only',
+    'needs_auth': 'This video requires signing in',
+}
+# yt-dlp errors that mean the video itself cannot be processed, rather than a failed request
+UNAVAILABLE_VIDEO_PATTERN = re.compile(
+    r'Private video|members-only|live event will begin|Premieres in|Video unavailable|'
+    r'has been removed|no longer available|confirm your age',
+    re.IGNORECASE
+)
+YT_DLP_ERROR_PREFIX = re.compile(r'^ERROR: (?:\[[^\]]+\] [\w-]+: )?')
+
+# Word timings are stored next to the transcript text as a binary artifact (see
+# encode_transcript_words): a header, a time index with an entry every
+# TRANSCRIPT_INDEX_INTERVAL_MS, then little-endian columns and the UTF-8 words
+TRANSCRIPT_WORDS_MAGIC = b'TWRD'
+TRANSCRIPT_WORDS_VERSION = 1
+# magic, version, reserved, word count, index interval (ms), index entries, text bytes
+TRANSCRIPT_WORDS_HEADER = struct.Struct('<4sHHIIII')
+# first word starting at or after the entry's time, and that word's text offset
+TRANSCRIPT_INDEX_ENTRY = struct.Struct('<II')
+TRANSCRIPT_INDEX_INTERVAL_MS = 1000
+TIMESTAMP_PATTERN = re.compile(r'^(?:(?:(\d+):)?(\d+):)?(\d+(?:\.\d+)?)$')
+
+# Job records live next to the summaries and track each pipeline stage
+JOB_PREFIX = 'jobs/'
+# Per-video checkpoints (see save_checkpoint) let a retried request resume from the last
+# completed stage; stages older than CHECKPOINT_MAX_AGE seconds are ignored
+CHECKPOINTS = os.environ.get('CHECKPOINTS', 'true').lower() == 'true'
+CHECKPOINT_PREFIX = 'checkpoints/'
+CHECKPOINT_MAX_AGE = int(os.environ.get('CHECKPOINT_MAX_AGE', '86400'))
+# Job fields restored along with checkpointed audio
+AUDIO_CHECKPOINT_FIELDS = ('audio_format', 'audio_size', 'vad', 'audio_offset_map', 'fingerprint')
+# Job fields checkpointed with started Transcribe jobs, taken over by a retry that adopts them
+TRANSCRIPTION_CHECKPOINT_FIELDS = ('transcribe_job_name', 'transcribe_segments', 'transcribe_slots')
+# Request coalescing: one job per video holds leases/{video_id}.json (claimed with a
+# conditional write) and concurrent requests attach to it. The job record's updated_at is
+# the heartbeat: a lease lapses when its job has ended or has not been updated for
+# LEASE_SECONDS (LEASE_TRANSCRIBING_SECONDS while paused on Transcribe)
+LEASE_PREFIX = 'leases/'
+LEASE_SECONDS = int(os.environ.get('LEASE_SECONDS', '960'))
+LEASE_TRANSCRIBING_SECONDS = int(os.environ.get('LEASE_TRANSCRIBING_SECONDS', '14400'))
+LEASE_CLAIM_ATTEMPTS = 3
+CORS_HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type',
+    'Access-Control-Allow-Methods': 'GET, POST, OPTIONS'
+}
+
+# Transcribe job names embed the video and job IDs so completion events can find their job
+TRANSCRIBE_OUTPUT_PREFIX = 'transcribe-output/'
+TRANSCRIBE_JOB_PATTERN = re.compile(
+    r'^transcribe-(?P<video_id>[A-Za-z0-9_-]{11})-(?P<job_id>[0-9a-f]{32})(?:-(?P<segment>\d+))?$'
+)
+
+# Fallback polling: start fast for short clips and back off for long ones
+POLL_INITIAL_DELAY = 2
+POLL_MAX_DELAY = 30
+POLL_BACKOFF = 1.5
+# GET /jobs checks Transcribe directly if no completion event arrived within this many seconds
+TRANSCRIPTION_CHECK_AFTER = 60
+
+# Chunked transcription: audio of at least CHUNKED_TRANSCRIPTION_MIN_SECONDS is cut into
+# segments of about TRANSCRIBE_SEGMENT_SECONDS (at a silence near each cut point when
+# there is one) that overlap by TRANSCRIBE_SEGMENT_OVERLAP seconds, transcribed by
+# concurrent Transcribe jobs and stitched back together on word timestamps
+CHUNKED_TRANSCRIPTION = os.environ.get('CHUNKED_TRANSCRIPTION', 'true').lower() == 'true'
+CHUNKED_TRANSCRIPTION_MIN_SECONDS = int(os.environ.get('CHUNKED_TRANSCRIPTION_MIN_SECONDS', '1200'))
+TRANSCRIBE_SEGMENT_SECONDS = int(os.environ.get('TRANSCRIBE_SEGMENT_SECONDS', '600'))
+TRANSCRIBE_SEGMENT_OVERLAP = 15
+SILENCE_SEARCH_WINDOW = 30
+SILENCE_DETECT_FILTER = 'silencedetect=noise=-35dB:d=0.4'
+SILENCE_PATTERN = re.compile(r'silence_(start|end): (-?[\d.]+)')
+# Overlapping segments are joined on a run of at least this many matching words,
+# otherwise at the middle of the overlap
+MIN_STITCH_MATCH = 3
+
+# Voice-activity trimming: non-speech stretches of at least VAD_MIN_SILENCE seconds are
+# cut out before transcription, keeping VAD_PADDING seconds next to speech. VAD_METHOD is
+# "energy" (frame energy of the decoded PCM, needs NumPy), "silencedetect" (ffmpeg),
+# "auto" (energy when NumPy is installed) or "off"
+VAD_METHOD = os.environ.get('VAD_METHOD', 'auto')
+VAD_NOISE_DB = float(os.environ.get('VAD_NOISE_DB', '-40'))
+VAD_MIN_SILENCE = float(os.environ.get('VAD_MIN_SILENCE', '2.0'))
+VAD_PADDING = 0.3
+VAD_SAMPLE_RATE = 16000
+VAD_FRAME_SECONDS = 0.03
+# Trimming re-encodes the audio, so it is skipped unless it removes at least this many seconds.
+# The trimmed audio keeps the job's encoding; stream-copied (native) audio becomes speech-opus
+VAD_MIN_SAVINGS = 10.0
+
+# SponsorBlock: with the "skip_sponsors" option, crowd-sourced sponsor, intro, outro and
+# self-promotion spans are cut from the audio along with the silences above, or dropped
+# from caption transcripts. SPONSORBLOCK_API may point at a local stand-in (sponsorblock_stub.py).
+# Sponsor-free transcripts, summaries, checkpoints and leases are stored under the video ID
+# plus SPONSOR_FREE_SUFFIX, apart from those of the full video (see output_id)
+SKIP_SPONSORS = os.environ.get('SKIP_SPONSORS', 'false').lower() == 'true'
+SPONSORBLOCK_API = os.environ.get('SPONSORBLOCK_API', 'https://sponsor.ajay.app')
+SPONSORBLOCK_CATEGORIES = os.environ.get('SPONSORBLOCK_CATEGORIES', 'sponsor,intro,outro,selfpromo').split(',')
+SPONSOR_FREE_SUFFIX = '.no-sponsors'
+
+# Audio fingerprint deduplication (needs NumPy): the first FINGERPRINT_SECONDS of each
+# downloaded track are reduced to spectral-peak landmark hashes and a MinHash signature,
+# indexed under FINGERPRINT_PREFIX in TRANSCRIPTS_BUCKET with FINGERPRINT_LSH_BANDS bands.
+# A track whose signature agrees with an already-transcribed video's on at least
+# FINGERPRINT_MATCH_THRESHOLD of its values, and whose duration agrees within
+# FINGERPRINT_DURATION_SLACK (a share of the longer one, at least
+# FINGERPRINT_DURATION_SLACK_SECONDS), reuses that video's transcript and summary
+FINGERPRINT_DEDUPE = os.environ.get('FINGERPRINT_DEDUPE', 'true').lower() == 'true'
+FINGERPRINT_MATCH_THRESHOLD = float(os.environ.get('FINGERPRINT_MATCH_THRESHOLD', '0.4'))
+FINGERPRINT_PREFIX = 'fingerprints/'
+FINGERPRINT_SECONDS = 300
+FINGERPRINT_SAMPLE_RATE = 8000
+FINGERPRINT_WINDOW = 1024
+FINGERPRINT_HOP = 256
+# FFT bin ranges in which each frame's strongest bin may become a peak
+FINGERPRINT_PEAK_BANDS = [(8, 16), (16, 32), (32, 64), (64, 128), (128, 256), (256, 512)]
+FINGERPRINT_FAN_OUT = 5
+FINGERPRINT_MAX_DELTA = 63
+FINGERPRINT_MIN_HASHES = 200
+FINGERPRINT_PERMUTATIONS = 64
+FINGERPRINT_LSH_BANDS = 16
+FINGERPRINT_DURATION_SLACK = 0.02
+FINGERPRINT_DURATION_SLACK_SECONDS = 10
+MINHASH_PRIME = (1 << 31) - 1
+
+# Transcription backends (see TranscriptionBackend): "auto" picks one per job from
+# the audio duration and how busy each backend is
+TRANSCRIPTION_BACKEND = os.environ.get('TRANSCRIPTION_BACKEND', 'auto')
+# In-process speech-to-text with faster-whisper, used only when it is installed
+LOCAL_TRANSCRIPTION_MODEL = os.environ.get('LOCAL_TRANSCRIPTION_MODEL', 'base.en')
+LOCAL_TRANSCRIPTION_WORKERS = int(os.environ.get('LOCAL_TRANSCRIPTION_WORKERS', '1'))
+# Clips up to LOCAL_TRANSCRIPTION_MAX_SECONDS are transcribed locally, and clips up to
+# LOCAL_TRANSCRIPTION_BUSY_MAX_SECONDS too once TRANSCRIBE_QUEUE_THRESHOLD Transcribe jobs are queued
+LOCAL_TRANSCRIPTION_MAX_SECONDS = int(os.environ.get('LOCAL_TRANSCRIPTION_MAX_SECONDS', '300'))
+LOCAL_TRANSCRIPTION_BUSY_MAX_SECONDS = int(os.environ.get('LOCAL_TRANSCRIPTION_BUSY_MAX_SECONDS', '900'))
+TRANSCRIBE_QUEUE_THRESHOLD = int(os.environ.get('TRANSCRIBE_QUEUE_THRESHOLD', '10'))
+
+# Audio containers Transcribe reads natively, keyed by yt-dlp extension, with the
+# MediaFormat and Content-Type to use for each
+TRANSCRIBE_MEDIA_FORMATS = {
+    'mp3': ('mp3', 'audio/mpeg'),
+    'm4a': ('mp4', 'audio/mp4'),
+    'mp4': ('mp4', 'audio/mp4'),
+    'webm': ('webm', 'audio/webm'),
+    'ogg': ('ogg', 'audio/ogg'),
+    'opus': ('ogg', 'audio/ogg'),
+    'flac': ('flac', 'audio/flac'),
+    'wav': ('wav', 'audio/wav'),
+}
+# Lowest average bitrate (kbps) considered adequate for speech recognition
+MIN_SPEECH_ABR = 32
+# Default for the per-request "audio_profile" option: "native" stream-copies the
+# smallest adequate audio-only format, "mp3" re-encodes to high-quality stereo MP3,
+# and the speech profiles re-encode to 16 kHz mono Opus (in Ogg) or FLAC
+AUDIO_PROFILE = os.environ.get('AUDIO_PROFILE', 'native')
+AUDIO_PROFILES = ['native', 'mp3', 'speech-opus', 'speech-flac']
+SPEECH_SAMPLE_RATE = 16000
+SPEECH_OPUS_BITRATE = int(os.environ.get('SPEECH_OPUS_BITRATE', '24'))
+# ffmpeg output options for each re-encoding, keyed by the plan's "encoding"
+AUDIO_ENCODINGS = {
+    'mp3': ['-c:a', 'libmp3lame', '-q:a', '0', '-f', 'mp3'],
+    'speech-opus': ['-ac', '1', '-ar', str(SPEECH_SAMPLE_RATE), '-c:a', 'libopus',
+                    '-b:a', f'{SPEECH_OPUS_BITRATE}k', '-application', 'voip', '-f', 'ogg'],
+    'speech-flac': ['-ac', '1', '-ar', str(SPEECH_SAMPLE_RATE), '-sample_fmt', 's16', '-c:a', 'flac', '-f', 'flac'],
+}
+MP3_AUDIO_PLAN = {'format': 'bestaudio/best', 'ext': 'mp3', 'media_format': 'mp3', 'content_type': 'audio/mpeg', 'transcode': True, 'encoding': 'mp3'}
+SPEECH_AUDIO_PLANS = {
+    'speech-opus': {'format': 'bestaudio/best', 'ext': 'ogg', 'media_format': 'ogg', 'content_type': 'audio/ogg', 'transcode': True, 'encoding': 'speech-opus'},
+    'speech-flac': {'format': 'bestaudio/best', 'ext': 'flac', 'media_format': 'flac', 'content_type': 'audio/flac', 'transcode': True, 'encoding': 'speech-flac'},
+}
+
+# Map-reduce summarization: transcripts are split into chunks of about
+# CHUNK_TOKEN_BUDGET tokens on sentence boundaries and summarized concurrently
+CHUNK_TOKEN_BUDGET = int(os.environ.get('CHUNK_TOKEN_BUDGET', '3000'))
+SUMMARY_WORKERS = int(os.environ.get('SUMMARY_WORKERS', '4'))
+# Stream the final summary into the job record's partial_summary as tokens arrive,
+# writing the record at most once per STREAM_FLUSH_INTERVAL seconds
+STREAM_SUMMARIES = os.environ.get('STREAM_SUMMARIES', 'true').lower() == 'true'
+STREAM_FLUSH_INTERVAL = 1.0
+# Chapter-aware summarization: videos with at least two chapters in yt-dlp's info (which
+# include chapters parsed from description timestamps) get one summary per chapter,
+# generated concurrently with CHAPTER_SUMMARY_MODEL, and an overall summary built from them
+CHAPTER_SUMMARIES = os.environ.get('CHAPTER_SUMMARIES', 'true').lower() == 'true'
+CHAPTER_SUMMARY_MODEL = os.environ.get('CHAPTER_SUMMARY_MODEL', BEDROCK_MODEL)
+
+# Full-text search: every summarized video is added to an inverted index in
+# SUMMARIES_BUCKET as a small segment; segments are merged into SEARCH_SHARDS
+# term-hashed shards once SEARCH_MERGE_SEGMENTS have accumulated (or on schedule)
+SEARCH_PREFIX = 'search/'
+SEARCH_SHARDS = int(os.environ.get('SEARCH_SHARDS', '16'))
+SEARCH_MERGE_SEGMENTS = int(os.environ.get('SEARCH_MERGE_SEGMENTS', '32'))
+# Conditional-put attempts when updating the count of unmerged segments
+SEARCH_COUNT_ATTEMPTS = 5
+SEARCH_MAX_RESULTS = 50
+SEARCH_TOKEN_PATTERN = re.compile(r"[^\W_]+(?:'[^\W_]+)*")
+SEARCH_PHRASE_PATTERN = re.compile(r'"([^"]+)"')
+SEARCH_STOPWORDS = frozenset(
+    'a an and are as at be but by for from has have i if in is it its of on or so that the this '
+    'to was were will with you we they he she them our your'.split()
+)
+SENTENCE_BOUNDARY_PATTERN = re.compile(r'(?<=[.!?])\s+')
+
+# Batch requests: at most MAX_BATCH_SIZE URLs, BATCH_CONCURRENCY job invocations started
+# at once (videos in flight for local runs), and separate limits for each expensive
+# stage that hold across every invocation (see StageSlots)
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', '100'))
+BATCH_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', '8'))
+MAX_CONCURRENT_DOWNLOADS = int(os.environ.get('MAX_CONCURRENT_DOWNLOADS', '3'))
+MAX_CONCURRENT_TRANSCRIBE_JOBS = int(os.environ.get('MAX_CONCURRENT_TRANSCRIBE_JOBS', '8'))
+MAX_CONCURRENT_BEDROCK_CALLS = int(os.environ.get('MAX_CONCURRENT_BEDROCK_CALLS', '4'))
+BATCH_PREFIX = 'batches/'
+# Stage slots are objects under SLOT_PREFIX. A slot held outside Lambda lapses after
+# SLOT_LEASE_SECONDS, and a stage waits at most SLOT_MAX_WAIT seconds for a free slot
+SLOT_PREFIX = 'slots/'
+SLOT_LEASE_SECONDS = int(os.environ.get('SLOT_LEASE_SECONDS', '900'))
+SLOT_MAX_WAIT = int(os.environ.get('SLOT_MAX_WAIT', '600'))
+SLOT_POLL_INITIAL_DELAY = 0.5
+SLOT_POLL_MAX_DELAY = 5
+
+# Playlist and channel ingestion keeps one index of seen video IDs per source
+SOURCE_PREFIX = 'sources/'
+SOURCE_PATH_PREFIXES = ('/playlist', '/@', '/channel/', '/c/', '/user/')
+# A bare channel URL lists the channel's tabs, not its videos, so it is read from its uploads tab
+CHANNEL_UPLOADS_TAB = 'videos'
+
+# Streaming uploads buffer at most MULTIPART_MAX_IN_FLIGHT parts in memory
+MULTIPART_PART_SIZE = 8 * 1024 * 1024
+MULTIPART_MAX_IN_FLIGHT = 4
+
+# Per-service client settings. Pool sizes match the most concurrent calls each
+# service can see: batch workers, multipart parts of every in-flight download, and
+# the stage limits above. read_timeout is the upper bound; near the end of an
+# invocation, calls wait no longer than the time left (see send_within_deadline).
+CLIENT_SETTINGS = {
+    's3': {
+        'max_pool_connections': BATCH_CONCURRENCY + MAX_CONCURRENT_DOWNLOADS * MULTIPART_MAX_IN_FLIGHT,
+        'read_timeout': 60,
+        'max_attempts': 5,
+    },
+    'transcribe': {'max_pool_connections': MAX_CONCURRENT_TRANSCRIBE_JOBS, 'read_timeout': 30, 'max_attempts': 5},
+    'bedrock-runtime': {'max_pool_connections': MAX_CONCURRENT_BEDROCK_CALLS, 'read_timeout': 300, 'max_attempts': 8},
+    'lambda': {'max_pool_connections': BATCH_CONCURRENCY, 'read_timeout': 30, 'max_attempts': 5},
+}
+CLIENT_CONNECT_TIMEOUT = 5
+# Seconds kept back from the Lambda deadline so a timed-out call can still be recorded
+CLIENT_DEADLINE_MARGIN = 10
+# Calls made inside the margin, such as recording that a job failed, still wait this long
+CLIENT_MIN_CALL_SECONDS = 5
+
+class PipelineError(Exception):
+    """A pipeline stage failed with a message that is safe to show to the client"""
+
+class DeadlineExceeded(PipelineError):
+    """An AWS call got no response before the invocation ran out of time; botocore does not retry it"""
+
+class TranscriptionBackend:
+    """A speech-to-text engine.
+
+    submit() starts transcribing one piece of audio and returns the transcript
+    ({'text': ..., 'words': [{'start', 'end', 'text', 'confidence'}, ...]} with
+    times in seconds) when the backend finishes in-process, or None when the
+    transcription runs elsewhere and wait() or a completion event picks it up.
+    Remote backends read audio uploaded to RAW_BUCKET; local ones read a file.
+    """
+    name = None
+    remote = False
+
+    def available(self):
+        """Whether the backend can be used in this environment"""
+        return True
+
+    def submit(self, name, audio, audio_plan):
+        raise NotImplementedError
+
+    def wait(self, name, max_wait=300):
+        """Block until a submitted transcription finishes, returning the transcript or None"""
+        raise NotImplementedError
+
+    def queue_depth(self):
+        """Transcriptions already waiting for this backend"""
+        return 0
+
+class AwsTranscribeBackend(TranscriptionBackend):
+    """Amazon Transcribe batch jobs over audio in RAW_BUCKET"""
+    name = 'transcribe'
+    remote = True
+
+    def submit(self, name, audio, audio_plan):
+        start_transcription_job(name, audio, audio_plan['media_format'])
+        return None
+
+    def wait(self, name, max_wait=300):
+        try:
+            status = wait_for_transcription_job(name, max_wait)
+            if not status or status['TranscriptionJobStatus'] != 'COMPLETED':
+                return None
+            return transcript_from_transcribe_output(load_transcribe_output(transcribe_output_key(status)))
+        except Exception as e:
+            print(f"Transcription wait error: {str(e)}")
+            return None
+
+    def queue_depth(self):
+        try:
+            response = get_client('transcribe').list_transcription_jobs(Status='QUEUED', MaxResults=100)
+            return len(response.get('TranscriptionJobSummaries', []))
+        except Exception as e:
+            print(f"Transcribe queue check error: {str(e)}")
+            return 0
+
+class LocalWhisperBackend(TranscriptionBackend):
+    """faster-whisper on the function's own CPU, skipping the remote job round trip"""
+    name = 'local'
+
+    def __init__(self):
+        self._model = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(LOCAL_TRANSCRIPTION_WORKERS)
+        self._pending = 0
+
+    def available(self):
+        import importlib.util
+        return importlib.util.find_spec('faster_whisper') is not None
+
+    def load_model(self):
+        """Load the model once per container (call with _lock held)"""
+        if self._model is None:
+            from faster_whisper import WhisperModel
+            print(f"Loading local transcription model {LOCAL_TRANSCRIPTION_MODEL}")
+            self._model = WhisperModel(
+                LOCAL_TRANSCRIPTION_MODEL,
+                device='cpu',
+                compute_type='int8',
+                download_root=os.path.join(tempfile.gettempdir(), 'whisper-models')
+            )
+        return self._model
+
+    def submit(self, name, audio, audio_plan):
+        with self._lock:
+            self._pending += 1
+        try:
+            # Inference is CPU-bound, so only LOCAL_TRANSCRIPTION_WORKERS run at once
+            with self._slots:
+                with self._lock:
+                    model = self.load_model()
+                segments, _ = model.transcribe(audio, language='en', word_timestamps=True, beam_size=1)
+                words = [
+                    {
+                        'start': round(word.start, 3),
+                        'end': round(word.end, 3),
+                        'text': word.word.strip(),
+                        'confidence': round(word.probability, 3)
+                    }
+                    for segment in segments for word in (segment.words or [])
+                ]
+        finally:
+            with self._lock:
+                self._pending -= 1
+        print(f"Local transcription {name}: {len(words)} words")
+        return {'text': ' '.join(word['text'] for word in words), 'words': words}
+
+    def queue_depth(self):
+        return self._pending
+
+class FakeTranscriptionBackend(TranscriptionBackend):
+    """In-memory backend for tests and local runs: returns canned text with evenly spaced word timings"""
+    name = 'fake'
+
+    def __init__(self, transcripts=None, default_text='This is a placeholder transcript.', seconds_per_word=0.4):
+        self.transcripts = transcripts or {}
+        self.default_text = default_text
+        self.seconds_per_word = seconds_per_word
+        self.submitted = []
+
+    def submit(self, name, audio, audio_plan):
+        self.submitted.append((name, audio))
+        text = self.transcripts.get(name, self.default_text)
+        words = [
+            {
+                'start': round(index * self.seconds_per_word, 3),
+                'end': round((index + 1) * self.seconds_per_word, 3),
+                'text': word,
+                'confidence': 1.0
+            }
+            for index, word in enumerate(text.split())
+        ]
+        return {'text': text, 'words': words}
+
+TRANSCRIPTION_BACKENDS = {
+    backend.name: backend
+    for backend in [AwsTranscribeBackend(), LocalWhisperBackend(), FakeTranscriptionBackend()]
+}
+
+class StageSlots:
+    """At most `limit` holders of a pipeline stage at once, across every invocation.
+
+    Each slot is an S3 object, slots/{stage}/{index}.json, created with
+    IfNoneMatch like a video lease, so invocations in different containers
+    share the limit. A slot records when it expires: at the end of the holding
+    invocation by default, so a holder that crashes or times out frees it. An
+    expired slot is taken over with IfMatch on its ETag. acquire() returns
+    tokens ({'key', 'etag'}) that can be stored in a job record and released
+    by a later invocation.
+    """
+
+    def __init__(self, stage, limit):
+        self.stage = stage
+        self.limit = limit
+
+    def slot_key(self, index):
+        return f"{SLOT_PREFIX}{self.stage}/{index}.json"
+
+    def try_acquire(self, holder, expires_at):
+        """Take one free or expired slot without waiting, returning its token or None"""
+        from botocore.exceptions import ClientError
+        s3 = get_client('s3')
+        body = json.dumps({'holder': holder, 'expires_at': expires_at})
+        first = random.randrange(self.limit)
+        for index in [(first + offset) % self.limit for offset in range(self.limit)]:
+            key = self.slot_key(index)
+            try:
+                current = s3.get_object(Bucket=SUMMARIES_BUCKET, Key=key)
+                if json.loads(current['Body'].read())['expires_at'] > time.time():
+                    continue
+                condition = {'IfMatch': current['ETag']}
+            except ClientError as e:
+                if e.response['Error']['Code'] not in ['NoSuchKey', '404']:
+                    raise
+                condition = {'IfNoneMatch': '*'}
+            try:
+                response = s3.put_object(
+                    Bucket=SUMMARIES_BUCKET, Key=key, Body=body, ContentType='application/json', **condition
+                )
+                return {'key': key, 'etag': response['ETag']}
+            except ClientError as e:
+                # Another invocation took the slot first; try the next one
+                if e.response['Error']['Code'] not in ['PreconditionFailed', 'ConditionalRequestConflict']:
+                    raise
+        return None
+
+    def acquire(self, holder, count=1, ttl=None):
+        """Wait until count slots are free and take them all, returning their tokens.
+
+        Slots are taken all at once or not at all, so holders of several slots
+        cannot block each other. Slots expire after ttl seconds when given.
+        Raises PipelineError after SLOT_MAX_WAIT seconds, or when the
+        invocation is about to time out.
+        """
+        count = min(count, self.limit)
+        max_wait = SLOT_MAX_WAIT
+        if _invocation_deadline is not None:
+            max_wait = min(max_wait, _invocation_deadline - time.monotonic() - CLIENT_DEADLINE_MARGIN)
+        give_up = time.monotonic() + max_wait
+        delay = SLOT_POLL_INITIAL_DELAY
+        while True:
+            expires_at = slot_expiry(ttl)
+            tokens = []
+            for _ in range(count):
+                token = self.try_acquire(holder, expires_at)
+                if not token:
+                    break
+                tokens.append(token)
+            if len(tokens) == count:
+                return tokens
+            self.release(tokens)
+            if time.monotonic() + delay > give_up:
+                raise PipelineError(f"Timed out waiting for a free {self.stage} slot. Please try again later.")
+            print(f"Waiting for a free {self.stage} slot ({self.limit} in use)")
+            time.sleep(delay * random.uniform(0.5, 1.0))
+            delay = min(delay * 2, SLOT_POLL_MAX_DELAY)
+
+    def release(self, tokens):
+        """Free slots taken by acquire(), unless they expired and were taken over"""
+        from botocore.exceptions import ClientError
+        for token in tokens:
+            try:
+                get_client('s3').delete_object(Bucket=SUMMARIES_BUCKET, Key=token['key'], IfMatch=token['etag'])
+            except ClientError as e:
+                if e.response['Error']['Code'] not in ['PreconditionFailed', 'NoSuchKey', '404']:
+                    raise
+
+    @contextmanager
+    def hold(self, holder=None):
+        """Hold one slot for the duration of a with block"""
+        tokens = self.acquire(holder or uuid.uuid4().hex)
+        try:
+            yield
+        finally:
+            self.release(tokens)
+
+DOWNLOAD_SLOTS = StageSlots('download', MAX_CONCURRENT_DOWNLOADS)
+TRANSCRIBE_SLOTS = StageSlots('transcribe', MAX_CONCURRENT_TRANSCRIBE_JOBS)
+BEDROCK_SLOTS = StageSlots('bedrock', MAX_CONCURRENT_BEDROCK_CALLS)
+
+def get_client(service_name):
+    """Return the shared boto3 client for a service, creating it on first use.
+
+    boto3 is imported here rather than at module level because importing it and
+    building clients dominates cold-start time. Clients are configured from
+    CLIENT_SETTINGS with adaptive retries and TCP keepalive. Each service keeps
+    one client, and with it one connection pool, for the life of the container;
+    the time left in the invocation is enforced per call by send_within_deadline.
+    """
+    client = _clients.get(service_name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(service_name)
+            if client is None:
+                client = get_boto3_session().client(service_name, config=build_client_config(service_name))
+                http_session = client._endpoint.http_session
+                client.meta.events.register(
+                    'before-send',
+                    lambda request, **kwargs: send_within_deadline(http_session, service_name, request)
+                )
+                _clients[service_name] = client
+    return client
+
+def set_invocation_deadline(context):
+    """Record when the current invocation times out so client timeouts can respect it"""
+    global _invocation_deadline
+    get_remaining_time = getattr(context, 'get_remaining_time_in_millis', None)
+    if get_remaining_time is None:
+        _invocation_deadline = None
+    else:
+        _invocation_deadline = time.monotonic() + get_remaining_time() / 1000
+
+def slot_expiry(ttl=None):
+    """Epoch time at which a stage slot taken now expires: after ttl seconds, or when the invocation times out"""
+    if ttl is not None:
+        return time.time() + ttl
+    if _invocation_deadline is not None:
+        return time.time() + max(0.0, _invocation_deadline - time.monotonic())
+    return time.time() + SLOT_LEASE_SECONDS
+
+def call_time_limit(service_name):
+    """Return how long a call to the service may wait for its response, or None while its read timeout fits in the invocation"""
+    if _invocation_deadline is None:
+        return None
+    remaining = _invocation_deadline - time.monotonic() - CLIENT_DEADLINE_MARGIN
+    if remaining >= CLIENT_SETTINGS[service_name]['read_timeout']:
+        return None
+    return max(remaining, CLIENT_MIN_CALL_SECONDS)
+
+def send_within_deadline(http_session, service_name, request):
+    """botocore before-send handler that stops waiting for a response when the invocation runs out of time.
+
+    While the service's read timeout fits in the time left, returns None and
+    botocore sends the request itself. Otherwise the request is sent on a
+    separate thread through the client's own connection pool, and
+    DeadlineExceeded is raised if no response arrives within call_time_limit.
+    Streaming response bodies are read later and only bounded by the read timeout.
+    """
+    time_limit = call_time_limit(service_name)
+    if time_limit is None:
+        return None
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        return executor.submit(http_session.send, request).result(timeout=time_limit)
+    except FutureTimeoutError:
+        raise DeadlineExceeded(f"Ran out of time waiting for {service_name}. Please try again.")
+    finally:
+        executor.shutdown(wait=False)
+
+def build_client_config(service_name):
+    """Build the botocore Config for a service client"""
+    from botocore.config import Config
+
+    settings = CLIENT_SETTINGS[service_name]
+    return Config(
+        connect_timeout=CLIENT_CONNECT_TIMEOUT,
+        read_timeout=settings['read_timeout'],
+        max_pool_connections=settings['max_pool_connections'],
+        # Adaptive mode adds client-side rate limiting on top of standard retries,
+        # so throttled Bedrock and Transcribe calls back off instead of piling up
+        retries={'mode': 'adaptive', 'total_max_attempts': settings['max_attempts']},
+        tcp_keepalive=True,
+    )
+
+def get_boto3_session():
+    """Return the boto3 session shared by all clients (call with _clients_lock held).
+
+    Uses the bundled botocore models when the deployment package ships them.
+    """
+    global _boto3_session
+    if _boto3_session is None:
+        import boto3
+        import botocore.session
+
+        botocore_session = botocore.session.get_session()
+        loader = load_bundled_loader(BOTOCORE_MODEL_BUNDLE)
+        if loader is not None:
+            botocore_session.register_component('data_loader', loader)
+        _boto3_session = boto3.Session(botocore_session=botocore_session)
+    return _boto3_session
+
+def load_bundled_loader(bundle_path):
+    """Build a botocore loader that serves models from the pickled bundle.
+
+    Returns None, so the stock loader is used, when there is no bundle or it was
+    built for a different botocore version.
+    """
+    import pickle
+
+    import botocore
+    from botocore.exceptions import DataNotFoundError
+    from botocore.loaders import Loader, instance_cache
+
+    try:
+        with open(bundle_path, 'rb') as f:
+            bundle = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    if bundle.get('botocore_version') != botocore.__version__:
+        print(f"Ignoring botocore model bundle built for {bundle.get('botocore_version')} "
+              f"(running {botocore.__version__})")
+        return None
+
+    class BundledLoader(Loader):
+        """Resolves models from the bundle index without touching botocore/data/"""
+
+        def __init__(self, index, data):
+            super().__init__(include_default_search_paths=False)
+            self._index = index
+            self._data = data
+
+        @instance_cache
+        def list_available_services(self, type_name):
+            return sorted(self._index.get(type_name, {}))
+
+        @instance_cache
+        def list_api_versions(self, service_name, type_name):
+            versions = self._index.get(type_name, {}).get(service_name)
+            if not versions:
+                raise DataNotFoundError(data_path=service_name)
+            return sorted(versions)
+
+        @instance_cache
+        def load_data_with_path(self, name):
+            if name not in self._data:
+                raise DataNotFoundError(data_path=name)
+            # Reported as a builtin path so the session treats the bundled endpoints as botocore's own
+            return pickle.loads(self._data[name]), os.path.join(self.BUILTIN_DATA_PATH, name)
+
+    return BundledLoader(bundle['index'], bundle['data'])
+
+def lambda_handler(event, context):
+    """
+    Main Lambda handler for YouTube video summarization.
+
+    Routes API Gateway requests (POST /summarize, GET /jobs/{job_id},
+    POST /batch, GET /batches/{batch_id}, POST /ingest, GET /sources/{source_id},
+    GET /transcripts/{video_id}, GET /search),
+    the asynchronous self-invocations that run the pipeline for a job, batch or
+    playlist/channel source, and the transcription completion events that
+    resume a paused job.
+    """
+    set_invocation_deadline(context)
+    try:
+        # Background invocation queued by submit_summarize_job
+        if event.get('action') == 'process_job':
+            process_job(event['job_id'], wait_for_transcript=not TRANSCRIPTION_EVENTS)
+            return {'job_id': event['job_id']}
+        
+        # Background invocation queued by the GET /jobs fallback check
+        if event.get('action') == 'resume_job':
+            resume_job(event['job_id'])
+            return {'job_id': event['job_id']}
+        
+        # Transcribe output written to S3, or a Transcribe job state change from EventBridge
+        if 'Records' in event or event.get('source') == 'aws.transcribe':
+            handle_transcription_event(event)
+            return {'status': 'ok'}
+        
+        # Background invocation queued by submit_ingest, or a scheduled ingestion
+        if event.get('action') == 'ingest_source':
+            ingest_source(event['source'], event['email'], event.get('options') or {}, context)
+            return {'source_id': source_id_for(event['source'])}
+        
+        # Scheduled merge of the search index segments
+        if event.get('action') == 'merge_search_index':
+            return {'merged': merge_search_index()}
+        
+        # Background invocation queued by submit_batch
+        if event.get('action') == 'process_batch':
+            process_batch(event['batch_id'], context)
+            return {'batch_id': event['batch_id']}
+        
+        path_parameters = event.get('pathParameters') or {}
+        if event.get('httpMethod') == 'GET':
+            if path_parameters.get('batch_id'):
+                return get_batch_status(path_parameters['batch_id'])
+            if path_parameters.get('job_id'):
+                return get_job_status(path_parameters['job_id'], context)
+            if path_parameters.get('source_id'):
+                return get_source_status(path_parameters['source_id'])
+            if path_parameters.get('video_id'):
+                return get_transcript_range(path_parameters['video_id'], event.get('queryStringParameters') or {})
+            if event.get('resource') == '/search':
+                return search_videos(event.get('queryStringParameters') or {})
+            return build_response(404, {'error': 'Not found'})
+        
+        if event.get('resource') == '/batch':
+            return submit_batch(event, context)
+        
+        if event.get('resource') == '/ingest':
+            return submit_ingest(event, context)
+        
+        return submit_summarize_job(event, context)
+        
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return build_response(500, {'error': f'Internal server error: {str(e)}'})
+
+def build_response(status_code, payload):
+    """Build an API Gateway proxy response with CORS headers"""
+    return {
+        'statusCode': status_code,
+        'headers': CORS_HEADERS,
+        'body': json.dumps(payload)
+    }
+
+def parse_body(event):
+    """Parse the JSON request body of an API Gateway event"""
+    if isinstance(event.get('body'), str):
+        return json.loads(event['body'])
+    return event.get('body') or {}
+
+def submit_summarize_job(event, context):
+    """Validate a POST /summarize request and queue a job, answering from the cache when possible"""
+    body = parse_body(event)
+    youtube_url = body.get('url')
+    email = body.get('email')
+    
+    if not youtube_url or not email:
+        return build_response(400, {'error': 'URL and email are required'})
+    
+    # Extract video ID from YouTube URL
+    video_id = extract_video_id(youtube_url)
+    if not video_id:
+        return build_response(400, {'error': 'Invalid YouTube URL'})
+    
+    print(f"Processing video: {video_id}")
+    options = parse_job_options(body)
+    
+    # Return the stored result if this video was already summarized
+    # with the current model, prompt and sponsor setting
+    cached_result = get_cached_result(output_id(video_id, options))
+    if cached_result:
+        print(f"Cache hit for video: {video_id}")
+        cached_result['cached'] = True
+        cached_result['status'] = 'completed'
+        return build_response(200, cached_result)
+    
+    # Concurrent requests for the same video and sponsor setting share one job
+    job, attached = claim_video_job(video_id, youtube_url, email, options)
+    if attached:
+        print(f"Attached to in-flight job {job['job_id']} for video: {video_id}")
+    else:
+        start_job_worker(job['job_id'], context)
+    
+    return build_response(202, {
+        'job_id': job['job_id'],
+        'video_id': video_id,
+        'status': job['status'],
+        'stage': job['stage'],
+        'attached': attached,
+        'status_url': f"/jobs/{job['job_id']}"
+    })
+
+def start_job_worker(job_id, context):
+    """Run the pipeline for a job in a separate asynchronous invocation of this function"""
+    function_name = getattr(context, 'function_name', None)
+    if not function_name:
+        # Local runs have no Lambda context or S3 events, so process the job inline
+        process_job(job_id, wait_for_transcript=True)
+        return
+    
+    invoke_async(function_name, {'action': 'process_job', 'job_id': job_id})
+    print(f"Queued job {job_id}")
+
+def invoke_async(function_name, payload):
+    """Invoke a Lambda function asynchronously"""
+    get_client('lambda').invoke(
+        FunctionName=function_name,
+        InvocationType='Event',
+        Payload=json.dumps(payload)
+    )
+
+def job_key(job_id):
+    """S3 key of a job record"""
+    return f"{JOB_PREFIX}{job_id}.json"
+
+def parse_job_options(body):
+    """Read per-request pipeline options, falling back to the environment defaults"""
+    audio_profile = body.get('audio_profile', AUDIO_PROFILE)
+    if audio_profile not in AUDIO_PROFILES:
+        audio_profile = AUDIO_PROFILE
+    transcription_backend = body.get('transcription_backend', TRANSCRIPTION_BACKEND)
+    if transcription_backend not in ['auto', 'transcribe', 'local']:
+        transcription_backend = TRANSCRIPTION_BACKEND
+    return {
+        'streaming': bool(body.get('streaming', STREAMING_UPLOAD)),
+        'audio_profile': audio_profile,
+        'chunked': bool(body.get('chunked', CHUNKED_TRANSCRIPTION)),
+        'skip_sponsors': bool(body.get('skip_sponsors', SKIP_SPONSORS)),
+        'dedupe': bool(body.get('dedupe', FINGERPRINT_DEDUPE)),
+        'transcription_backend': transcription_backend
+    }
+
+def create_job(video_id, youtube_url, email, options):
+    """Create and store a new job record"""
+    now = int(time.time())
+    job = {
+        'job_id': uuid.uuid4().hex,
+        'video_id': video_id,
+        'url': youtube_url,
+        'email': email,
+        'options': options,
+        'status': 'queued',
+        'stage': 'queued',
+        'created_at': now,
+        'updated_at': now
+    }
+    save_job(job)
+    return job
+
+def lease_key(output):
+    """S3 key of the lease naming the job that is producing an output (see output_id)"""
+    return f"{LEASE_PREFIX}{output}.json"
+
+def lease_lapsed(job):
+    """Whether a lease holder's job can no longer be relied on to produce the video's result"""
+    if not job or job['status'] in ['completed', 'failed']:
+        return True
+    timeout = LEASE_TRANSCRIBING_SECONDS if job['stage'] == 'transcribing' else LEASE_SECONDS
+    return time.time() - job['updated_at'] > timeout
+
+def claim_video_job(video_id, youtube_url, email, options):
+    """Return (job, attached): a new job that holds the video's lease, or the in-flight job holding it.
+
+    The new job's record is stored first, then the lease is created with
+    IfNoneMatch, or a lapsed lease replaced with IfMatch on its ETag, so exactly
+    one of several concurrent requests wins and the rest attach to its job.
+    Leases are taken per output_id, so a request only attaches to a job that
+    removes sponsors if it does too. A request that cannot settle the lease
+    after LEASE_CLAIM_ATTEMPTS runs its own job rather than fail.
+    """
+    from botocore.exceptions import ClientError
+    s3 = get_client('s3')
+    job = create_job(video_id, youtube_url, email, options)
+    key = lease_key(output_id(video_id, options))
+    lease = json.dumps({'video_id': video_id, 'job_id': job['job_id'], 'claimed_at': job['created_at']})
+    
+    for _ in range(LEASE_CLAIM_ATTEMPTS):
+        try:
+            current = s3.get_object(Bucket=SUMMARIES_BUCKET, Key=key)
+            holder = load_job(json.loads(current['Body'].read())['job_id'])
+            if not lease_lapsed(holder):
+                s3.delete_object(Bucket=SUMMARIES_BUCKET, Key=job_key(job['job_id']))
+                return holder, True
+            condition = {'IfMatch': current['ETag']}
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ['NoSuchKey', '404']:
+                raise
+            condition = {'IfNoneMatch': '*'}
+        
+        try:
+            s3.put_object(
+                Bucket=SUMMARIES_BUCKET,
+                Key=key,
+                Body=lease,
+                ContentType='application/json',
+                **condition
+            )
+            return job, False
+        except ClientError as e:
+            # Another request claimed or replaced the lease first; read it again
+            if e.response['Error']['Code'] not in ['PreconditionFailed', 'ConditionalRequestConflict']:
+                raise
+    
+    print(f"Could not settle the lease for {video_id}, running job {job['job_id']} without it")
+    return job, False
+
+def load_job(job_id):
+    """Load a job record, returning None if it does not exist"""
+    content = read_from_s3(SUMMARIES_BUCKET, job_key(job_id))
+    return json.loads(content) if content else None
+
+def save_job(job):
+    """Store a job record"""
+    get_client('s3').put_object(
+        Bucket=SUMMARIES_BUCKET,
+        Key=job_key(job['job_id']),
+        Body=json.dumps(job),
+        ContentType='application/json'
+    )
+
+def checkpoint_key(output):
+    """S3 key of the checkpoint record of a video and sponsor setting (see output_id)"""
+    return f"{CHECKPOINT_PREFIX}{output}.json"
+
+def load_checkpoint(video_id):
+    """Return the fresh stages of a video's checkpoint record as {stage: fields}.
+
+    Stages are metadata, upload (an unfinished multipart upload), audio,
+    transcription, transcript and partials (chunk, reduce and chapter summaries).
+    """
+    if not CHECKPOINTS:
+        return {}
+    try:
+        content = read_from_s3(SUMMARIES_BUCKET, checkpoint_key(video_id))
+    except Exception as e:
+        print(f"Checkpoint read error: {str(e)}")
+        return {}
+    stages = json.loads(content)['stages'] if content else {}
+    oldest = time.time() - CHECKPOINT_MAX_AGE
+    return {stage: fields for stage, fields in stages.items() if fields['at'] >= oldest}
+
+def save_checkpoint(video_id, stage, **fields):
+    """Record that a stage of a video's pipeline completed, with what a retry needs to resume after it"""
+    if not CHECKPOINTS:
+        return
+    with _checkpoint_lock:
+        try:
+            content = read_from_s3(SUMMARIES_BUCKET, checkpoint_key(video_id))
+            record = json.loads(content) if content else {'video_id': video_id, 'stages': {}}
+            record['stages'][stage] = dict(fields, at=int(time.time()))
+            get_client('s3').put_object(
+                Bucket=SUMMARIES_BUCKET,
+                Key=checkpoint_key(video_id),
+                Body=json.dumps(record),
+                ContentType='application/json'
+            )
+        except Exception as e:
+            print(f"Checkpoint write error: {str(e)}")
+
+def clear_checkpoint(video_id, *stages):
+    """Drop stages from a video's checkpoint record, or the whole record when no stages are given"""
+    if not CHECKPOINTS:
+        return
+    with _checkpoint_lock:
+        try:
+            if not stages:
+                get_client('s3').delete_object(Bucket=SUMMARIES_BUCKET, Key=checkpoint_key(video_id))
+                return
+            content = read_from_s3(SUMMARIES_BUCKET, checkpoint_key(video_id))
+            if not content:
+                return
+            record = json.loads(content)
+            for stage in stages:
+                record['stages'].pop(stage, None)
+            get_client('s3').put_object(
+                Bucket=SUMMARIES_BUCKET,
+                Key=checkpoint_key(video_id),
+                Body=json.dumps(record),
+                ContentType='application/json'
+            )
+        except Exception as e:
+            print(f"Checkpoint write error: {str(e)}")
+
+def update_job(job, **fields):
+    """Apply fields to a job record and store it"""
+    job.update(fields)
+    job['updated_at'] = int(time.time())
+    save_job(job)
+    print(f"Job {job['job_id']}: status={job['status']} stage={job['stage']}")
+
+def get_job_status(job_id, context=None):
+    """Handle GET /jobs/{job_id}"""
+    if not re.match(r'^[0-9a-f]{32}$', job_id):
+        return build_response(400, {'error': 'Invalid job ID'})
+    
+    job = load_job(job_id)
+    if not job:
+        return build_response(404, {'error': 'Job not found'})
+    
+    # Fallback for a missed completion event: check Transcribe directly once the
+    # job has been waiting a while, and queue the resume in the background
+    if (job['stage'] == 'transcribing' and not job.get('resume_requested_at')
+            and time.time() - job['updated_at'] > TRANSCRIPTION_CHECK_AFTER):
+        check_paused_job(job, context)
+    
+    job.pop('email', None)
+    return build_response(200, job)
+
+def check_paused_job(job, context):
+    """Queue a resume for a job whose transcription finished without an event reaching us"""
+    try:
+        statuses = [get_transcription_status(name) for name in transcription_job_names(job)]
+        failed = next((status for status in statuses if status['TranscriptionJobStatus'] == 'FAILED'), None)
+        if failed:
+            fail_transcription(job, failed)
+        elif all(status['TranscriptionJobStatus'] == 'COMPLETED' for status in statuses):
+            update_job(job, resume_requested_at=int(time.time()))
+            function_name = getattr(context, 'function_name', None)
+            if function_name:
+                invoke_async(function_name, {'action': 'resume_job', 'job_id': job['job_id']})
+            else:
+                resume_job(job['job_id'])
+    except Exception as e:
+        print(f"Transcription check error: {str(e)}")
+
+def process_job(job_id, wait_for_transcript=False):
+    """Run the pipeline for a queued job, recording progress in the job record.
+
+    With wait_for_transcript False the job pauses once Transcribe has started
+    and is resumed by handle_transcription_event.
+    """
+    job = load_job(job_id)
+    if not job:
+        print(f"Job not found: {job_id}")
+        return
+    run_job_stage(job, lambda: run_summary_pipeline(job, wait_for_transcript))
+
+def run_job_stage(job, stage):
+    """Run one pipeline stage for a job and record its outcome.
+
+    A stage returns the final result, or None when the job is paused waiting
+    for an external event.
+    """
+    try:
+        result = stage()
+        if result:
+            update_job(job, status='completed', stage='completed', result=result)
+    except PipelineError as e:
+        release_transcription_slots(job)
+        update_job(job, status='failed', error=str(e))
+    except Exception as e:
+        print(f"Job {job['job_id']} error: {str(e)}")
+        release_transcription_slots(job)
+        update_job(job, status='failed', error=f'Internal server error: {str(e)}')
+
+def submit_batch(event, context):
+    """Handle POST /batch: deduplicate URLs by video ID and queue one job per new video"""
+    body = parse_body(event)
+    urls = body.get('urls')
+    email = body.get('email')
+    
+    if not isinstance(urls, list) or not urls or not email:
+        return build_response(400, {'error': 'A list of URLs and an email are required'})
+    if len(urls) > MAX_BATCH_SIZE:
+        return build_response(400, {'error': f'At most {MAX_BATCH_SIZE} URLs per batch'})
+    
+    batch = create_batch(urls, email, parse_job_options(body), context)
+    batch.pop('email', None)
+    return build_response(202, batch)
+
+def create_batch(urls, email, options, context):
+    """Create a batch record with one job per new video and start processing it"""
+    items = []
+    seen_video_ids = set()
+    for url in urls:
+        video_id = extract_video_id(url) if isinstance(url, str) else None
+        if not video_id:
+            items.append({'url': url, 'status': 'failed', 'error': 'Invalid YouTube URL'})
+            continue
+        if video_id in seen_video_ids:
+            continue
+        seen_video_ids.add(video_id)
+        
+        cached_result = get_cached_result(output_id(video_id, options))
+        if cached_result:
+            cached_result['cached'] = True
+            items.append({'url': url, 'video_id': video_id, 'status': 'completed', 'result': cached_result})
+        else:
+            job, attached = claim_video_job(video_id, url, email, options)
+            item = {'url': url, 'video_id': video_id, 'job_id': job['job_id'], 'status': 'queued'}
+            if attached:
+                item['attached'] = True
+            items.append(item)
+    
+    now = int(time.time())
+    batch = {
+        'batch_id': uuid.uuid4().hex,
+        'email': email,
+        'status': 'queued',
+        'items': items,
+        'created_at': now,
+        'updated_at': now
+    }
+    save_batch(batch)
+    
+    if any(item['status'] == 'queued' for item in items):
+        function_name = getattr(context, 'function_name', None)
+        if function_name:
+            invoke_async(function_name, {'action': 'process_batch', 'batch_id': batch['batch_id']})
+        else:
+            process_batch(batch['batch_id'], context)
+    else:
+        update_batch(batch, status='completed')
+    return batch
+
+def batch_key(batch_id):
+    """S3 key of a batch record"""
+    return f"{BATCH_PREFIX}{batch_id}.json"
+
+def save_batch(batch):
+    """Store a batch record"""
+    get_client('s3').put_object(
+        Bucket=SUMMARIES_BUCKET,
+        Key=batch_key(batch['batch_id']),
+        Body=json.dumps(batch),
+        ContentType='application/json'
+    )
+
+def update_batch(batch, **fields):
+    """Apply fields to a batch record and store it"""
+    batch.update(fields)
+    batch['updated_at'] = int(time.time())
+    save_batch(batch)
+
+def load_batch(batch_id):
+    """Load a batch record, returning None if it does not exist"""
+    content = read_from_s3(SUMMARIES_BUCKET, batch_key(batch_id))
+    return json.loads(content) if content else None
+
+def process_batch(batch_id, context=None):
+    """Start the queued jobs of a batch.
+
+    Inside Lambda each video runs as its own asynchronous process_job
+    invocation, exactly like a single POST /summarize job: it pauses while
+    Transcribe runs and is resumed by the completion events, so no invocation
+    has to outlast a batch. Local runs have no events and process the videos
+    in-process, up to BATCH_CONCURRENCY at once. Either way the stage limits
+    (see StageSlots) apply across all of the videos, and the batch record is
+    not written per video; GET /batches/{batch_id} reads each item's job record.
+    """
+    batch = load_batch(batch_id)
+    if not batch:
+        print(f"Batch not found: {batch_id}")
+        return
+    
+    # Items attached to another request's job have nothing to run here
+    pending = [item for item in batch['items'] if item['status'] == 'queued' and not item.get('attached')]
+    update_batch(batch, status='running')
+    
+    function_name = getattr(context, 'function_name', None)
+    with ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY) as executor:
+        if function_name:
+            list(executor.map(lambda item: start_job_worker(item['job_id'], context), pending))
+            print(f"Batch {batch_id}: started {len(pending)} jobs")
+            return
+        list(executor.map(lambda item: process_job(item['job_id'], True), pending))
+    refresh_batch_items(batch)
+
+def refresh_batch_items(batch):
+    """Bring a batch's unfinished items up to date from their job records.
+
+    The record is stored when an item has finished, and the batch is completed
+    once every item has.
+    """
+    finished = False
+    for item in batch['items']:
+        if item['status'] not in ['queued', 'running'] or not item.get('job_id'):
+            continue
+        job = load_job(item['job_id']) or {'status': 'failed', 'stage': 'failed', 'error': 'Job record missing'}
+        # Only an attached item can be left behind by a job that lost its lease;
+        # a job of the batch's own that is paused on Transcribe is still pending
+        if item.get('attached') and job['status'] not in ['completed', 'failed'] and lease_lapsed(job):
+            job = {'status': 'failed', 'stage': job['stage'], 'error': 'Attached job stopped responding'}
+        item['status'] = job['status']
+        item['stage'] = job['stage']
+        if job['status'] in ['completed', 'failed']:
+            finished = True
+            item.pop('stage')
+            for field in ['result', 'error']:
+                if job.get(field):
+                    item[field] = job[field]
+    
+    if finished:
+        if all(item['status'] in ['completed', 'failed'] for item in batch['items']):
+            batch['status'] = 'completed'
+        update_batch(batch)
+
+def get_batch_status(batch_id):
+    """Handle GET /batches/{batch_id}, aggregating item results and live stages from the job records"""
+    if not re.match(r'^[0-9a-f]{32}$', batch_id):
+        return build_response(400, {'error': 'Invalid batch ID'})
+    
+    batch = load_batch(batch_id)
+    if not batch:
+        return build_response(404, {'error': 'Batch not found'})
+    
+    refresh_batch_items(batch)
+    batch.pop('email', None)
+    return build_response(200, batch)
+
+def normalize_source_url(url):
+    """Canonical form of a playlist or channel URL, or None if it is not one"""
+    parsed = urlparse(url.strip())
+    hostname = (parsed.hostname or '').lower()
+    if hostname not in YOUTUBE_HOSTS or not parsed.path.startswith(SOURCE_PATH_PREFIXES):
+        return None
+    if parsed.path.startswith('/playlist'):
+        playlist_id = parse_qs(parsed.query).get('list', [None])[0]
+        return f"https://www.youtube.com/playlist?list={playlist_id}" if playlist_id else None
+    path = parsed.path.rstrip('/')
+    # /@handle or /channel/ID (/c/name, /user/name) without a tab
+    if path.count('/') == (1 if path.startswith('/@') else 2):
+        path = f"{path}/{CHANNEL_UPLOADS_TAB}"
+    return f"https://www.youtube.com{path}"
+
+def source_id_for(url):
+    """Stable index ID for a playlist or channel URL"""
+    return hashlib.sha1(normalize_source_url(url).encode('utf-8')).hexdigest()[:16]
+
+def source_key(source_id):
+    """S3 key of a source's ingestion index"""
+    return f"{SOURCE_PREFIX}{source_id}.json"
+
+def load_source_index(source_id):
+    """Load a source's ingestion index, returning None if it has never been ingested"""
+    content = read_from_s3(SUMMARIES_BUCKET, source_key(source_id))
+    return json.loads(content) if content else None
+
+def save_source_index(index):
+    """Store a source's ingestion index"""
+    get_client('s3').put_object(
+        Bucket=SUMMARIES_BUCKET,
+        Key=source_key(index['source_id']),
+        Body=json.dumps(index),
+        ContentType='application/json'
+    )
+
+def submit_ingest(event, context):
+    """Handle POST /ingest: queue incremental ingestion of a playlist or channel"""
+    body = parse_body(event)
+    source_url = body.get('source')
+    email = body.get('email')
+    
+    if not source_url or not email:
+        return build_response(400, {'error': 'Source URL and email are required'})
+    if not normalize_source_url(source_url):
+        return build_response(400, {'error': 'Invalid YouTube playlist or channel URL'})
+    
+    source_id = source_id_for(source_url)
+    payload = {'action': 'ingest_source', 'source': source_url, 'email': email, 'options': parse_job_options(body)}
+    function_name = getattr(context, 'function_name', None)
+    if function_name:
+        # Listing a large channel can take longer than the API Gateway timeout
+        invoke_async(function_name, payload)
+    else:
+        ingest_source(source_url, email, payload['options'], context)
+    
+    return build_response(202, {'source_id': source_id, 'status_url': f"/sources/{source_id}"})
+
+def list_source_entries(source_url):
+    """Enumerate a playlist or channel with one flat extraction (no per-video requests).
+
+    Entries of nested playlists, such as the tabs of a channel page, are flattened.
+    """
+    import yt_dlp
+    ydl_opts = {
+        'extract_flat': 'in_playlist',
+        'skip_download': True,
+        'quiet': True,
+        'no_warnings': True,
+    }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        result = ydl.extract_info(source_url, download=False)
+    
+    def flatten(entries):
+        for entry in entries or []:
+            if entry and entry.get('entries') is not None:
+                yield from flatten(entry['entries'])
+            elif entry and entry.get('id'):
+                yield entry
+    
+    return list(flatten((result or {}).get('entries')))
+
+def ingest_source(source_url, email, options, context):
+    """Summarize the videos of a playlist or channel that have not been seen before.
+
+    The index keeps the set of processed video IDs, so a re-run costs one flat
+    listing plus a set difference. At most MAX_BATCH_SIZE new videos are
+    submitted per run, newest first; the rest stay unseen and are submitted by
+    the following runs. Upcoming and live entries are left unseen so they are
+    picked up once they have been published.
+    """
+    source_id = source_id_for(source_url)
+    index = load_source_index(source_id) or {
+        'source_id': source_id,
+        'source': normalize_source_url(source_url),
+        'video_ids': []
+    }
+    index.pop('newest_upload_date', None)
+    seen_video_ids = set(index['video_ids'])
+    
+    try:
+        entries = list_source_entries(index['source'])
+    except Exception as e:
+        print(f"Source listing error: {str(e)}")
+        index.update(last_run_at=int(time.time()), last_error=str(e))
+        save_source_index(index)
+        return
+    
+    videos = [entry for entry in entries if VIDEO_ID_PATTERN.match(entry['id'])]
+    unseen = [
+        entry for entry in videos
+        if entry['id'] not in seen_video_ids
+        and entry.get('live_status') not in ['is_upcoming', 'is_live']
+    ]
+    new_entries = unseen[:MAX_BATCH_SIZE]
+    print(f"Source {source_id}: {len(entries)} entries, {len(new_entries)} new, {len(unseen) - len(new_entries)} left for later runs")
+    
+    batch = None
+    if new_entries:
+        urls = [f"https://www.youtube.com/watch?v={entry['id']}" for entry in new_entries]
+        batch = create_batch(urls, email, options, context)
+        seen_video_ids.update(entry['id'] for entry in new_entries)
+    
+    index.update(
+        video_ids=sorted(seen_video_ids),
+        last_run_at=int(time.time()),
+        last_listed=len(entries),
+        last_new=len(new_entries),
+        last_pending=len(unseen) - len(new_entries),
+        last_batch_id=batch['batch_id'] if batch else None,
+        # A listing without a single video ID is almost certainly the wrong page
+        last_error='The source listing contains no videos' if entries and not videos else None
+    )
+    save_source_index(index)
+
+def get_source_status(source_id):
+    """Handle GET /sources/{source_id}"""
+    if not re.match(r'^[0-9a-f]{16}$', source_id):
+        return build_response(400, {'error': 'Invalid source ID'})
+    
+    index = load_source_index(source_id)
+    if not index:
+        return build_response(404, {'error': 'Source not found'})
+    
+    index['video_count'] = len(index.pop('video_ids'))
+    return build_response(200, index)
+
+def get_transcript_range(video_id, query):
+    """Handle GET /transcripts/{video_id}?start=12:00&end=15:00"""
+    if not VIDEO_ID_PATTERN.match(video_id):
+        return build_response(400, {'error': 'Invalid video ID'})
+    start = parse_timestamp(query.get('start') or '0')
+    end = parse_timestamp(query['end']) if query.get('end') else None
+    if start is None or (query.get('end') and (end is None or end <= start)):
+        return build_response(400, {'error': 'start and end must be seconds or [hh:]mm:ss, with end after start'})
+    
+    # Word times are in video time either way, so fall back to the sponsor-free transcript
+    for output in [video_id, output_id(video_id, {'skip_sponsors': True})]:
+        transcript = read_transcript_range(output, start, end)
+        if transcript is not None:
+            break
+    if transcript is None:
+        return build_response(404, {'error': 'Transcript not found'})
+    return build_response(200, dict(transcript, video_id=video_id, start=start, end=end))
+
+def parse_timestamp(value):
+    """Parse seconds ("725.5") or a clock time ("12:05", "1:02:05") into seconds, or None if invalid"""
+    match = TIMESTAMP_PATTERN.match(value.strip())
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours or 0) * 3600 + int(minutes or 0) * 60 + float(seconds)
+
+def run_summary_pipeline(job, wait_for_transcript):
+    """Produce the transcript and summary for a job, returning the response body.
+
+    Stages are checkpointed per video, so a retry after a timeout or a failed
+    Bedrock call picks up where the last attempt stopped: at the stored
+    transcript, at a running Transcribe job, at audio already in RAW_BUCKET or
+    at an unfinished streaming upload.
+    """
+    video_id = job['video_id']
+    output = job_output_id(job)
+    update_job(job, status='running', stage='transcript')
+    checkpoint = load_checkpoint(output)
+    
+    # A transcript is model-independent, so reuse it if only the summary is missing
+    transcript_text = read_from_s3(TRANSCRIPTS_BUCKET, transcript_cache_key(output))
+    if transcript_text:
+        print(f"Reusing stored transcript: {transcript_cache_key(output)}")
+        return summarize_transcript(job, transcript_text, 'stored', restore_transcript_checkpoint(job, checkpoint))
+    
+    audio = restore_audio_checkpoint(job, checkpoint)
+    if audio:
+        info = {'duration': job['preflight']['duration']}
+        route = job['preflight']['route']
+        # Audio is only checkpointed once it is in RAW_BUCKET for Transcribe
+        backend = TRANSCRIPTION_BACKENDS[audio['backend']]
+    else:
+        info = preflight_video(job)
+        route = (job.get('preflight') or {}).get('route')
+        if info:
+            record_video_chapters(job, info)
+            if job.get('options', {}).get('skip_sponsors'):
+                record_sponsor_segments(job, info)
+            save_checkpoint(
+                output, 'metadata',
+                preflight=job['preflight'], chapters=job.get('chapters'), sponsor_segments=job.get('sponsor_segments')
+            )
+        
+        # Prefer an existing caption track over downloading and transcribing audio
+        if route == 'captions':
+            update_job(job, stage='captions')
+            transcript = fetch_caption_transcript(info, job.get('sponsor_segments'))
+            if transcript:
+                return summarize_transcript(job, transcript['text'], 'captions', transcript['cues'])
+            # The track could not be used: route the job as a video without captions
+            route = audio_route(job, job['preflight']['duration'])
+            update_job(job, preflight=dict(job['preflight'], route=route))
+            save_checkpoint(
+                output, 'metadata',
+                preflight=job['preflight'], chapters=job.get('chapters'), sponsor_segments=job.get('sponsor_segments')
+            )
+            print(f"Caption track unusable for {video_id}, rerouted: {route}")
+        
+        backend = select_transcription_backend(job, info)
+        if not backend.remote:
+            return transcribe_locally(job, info, backend)
+    if route == 'chunked' and _invocation_deadline is not None:
+        # Long videos never wait on Transcribe inside a Lambda invocation; the job
+        # pauses and is resumed by the completion events or the GET /jobs check
+        wait_for_transcript = False
+    
+    statuses = adopt_transcription_checkpoint(job, checkpoint) if audio else None
+    if statuses:
+        # Completion events of transcriptions that already finished went to the earlier attempt
+        finished = all(status['TranscriptionJobStatus'] == 'COMPLETED' for status in statuses)
+        return await_adopted_transcription(job, backend, wait_for_transcript or finished)
+    if audio:
+        audio_s3_key, audio_plan, duration = audio['audio_s3_key'], audio['audio_plan'], audio['duration']
+    else:
+        audio_s3_key, audio_plan = upload_job_audio(job, info, checkpoint)
+        result = deduplicate_job_audio(job, presign_raw_audio(audio_s3_key))
+        if result:
+            cleanup_s3_audio(audio_s3_key)
+            return result
+        duration = (info or {}).get('duration')
+        checkpoint_job_audio(job, backend, audio_s3_key, audio_plan, duration, trimmed=False)
+    if not (audio and audio['trimmed']):
+        audio_s3_key, audio_plan, duration = trim_job_audio(job, audio_s3_key, audio_plan, duration)
+        checkpoint_job_audio(job, backend, audio_s3_key, audio_plan, duration, trimmed=True)
+    
+    if use_chunked_transcription(job, duration):
+        return transcribe_in_segments(job, backend, audio_s3_key, audio_plan, duration, wait_for_transcript)
+    if not wait_for_transcript:
+        transcribe_job_name = start_job_transcription(job, backend, audio_s3_key, audio_plan)
+        print(f"Job {job['job_id']} paused until {transcribe_job_name} completes")
+        return None
+    
+    # Waiting in-process (local runs) claims the resume so completion events skip the job
+    claim_job_resume(job)
+    transcribe_job_name = start_job_transcription(job, backend, audio_s3_key, audio_plan)
+    transcript = backend.wait(transcribe_job_name)
+    return finish_transcription(job, transcript)
+
+def checkpoint_job_audio(job, backend, audio_s3_key, audio_plan, duration, trimmed):
+    """Checkpoint a job's audio in RAW_BUCKET with the job fields that describe it"""
+    save_checkpoint(
+        job_output_id(job), 'audio',
+        audio_s3_key=audio_s3_key,
+        audio_plan=audio_plan,
+        duration=duration,
+        trimmed=trimmed,
+        backend=backend.name,
+        job_fields={field: job[field] for field in AUDIO_CHECKPOINT_FIELDS if field in job}
+    )
+
+def restore_audio_checkpoint(job, checkpoint):
+    """Return the checkpointed audio stage when its audio is still in RAW_BUCKET, restoring the job fields saved with it"""
+    audio = checkpoint.get('audio')
+    metadata = checkpoint.get('metadata')
+    if not audio or not metadata or audio['backend'] not in TRANSCRIPTION_BACKENDS:
+        return None
+    if not raw_audio_exists(audio['audio_s3_key']):
+        return None
+    print(f"Resuming from checkpointed audio: s3://{RAW_BUCKET}/{audio['audio_s3_key']}")
+    update_job(
+        job,
+        preflight=metadata['preflight'],
+        **{field: metadata[field] for field in ('chapters', 'sponsor_segments') if metadata.get(field)},
+        **audio['job_fields']
+    )
+    return audio
+
+def restore_transcript_checkpoint(job, checkpoint):
+    """Return the checkpointed word timings of a stored transcript as timed text, restoring the job's chapters.
+
+    Without them a retry after the transcript was stored would lose its
+    chapter-by-chapter summary. Returns None when there is nothing to restore.
+    """
+    if 'transcript' not in checkpoint or not (checkpoint.get('metadata') or {}).get('chapters'):
+        return None
+    words = load_transcript_words(job_output_id(job))
+    if words:
+        update_job(job, chapters=checkpoint['metadata']['chapters'])
+    return words
+
+def adopt_transcription_checkpoint(job, checkpoint):
+    """Take over the Transcribe jobs an earlier attempt started, returning their statuses.
+
+    The attempt's job is marked superseded, so completion events for its
+    Transcribe jobs resume this job instead (see load_paused_job). Returns None
+    when there are none or one of them failed.
+    """
+    transcription = checkpoint.get('transcription')
+    if not transcription:
+        return None
+    fields = {key: transcription[key] for key in TRANSCRIPTION_CHECKPOINT_FIELDS if key in transcription}
+    try:
+        statuses = [get_transcription_status(name) for name in transcription_job_names(fields)]
+    except Exception as e:
+        print(f"Checkpointed transcription is not usable: {str(e)}")
+        return None
+    if any(status['TranscriptionJobStatus'] == 'FAILED' for status in statuses):
+        return None
+    
+    previous_job_id = transcription['job_id']
+    if previous_job_id != job['job_id']:
+        previous = load_job(previous_job_id)
+        if previous and previous['status'] not in ['completed', 'failed']:
+            update_job(previous, status='failed', error=f"Superseded by job {job['job_id']}", superseded_by=job['job_id'])
+    print(f"Adopting {len(statuses)} transcription(s) started by job {previous_job_id}")
+    update_job(
+        job,
+        stage='transcribing',
+        transcription_backend=transcription['backend'],
+        audio_s3_key=transcription['audio_s3_key'],
+        **fields
+    )
+    return statuses
+
+def await_adopted_transcription(job, backend, wait_for_transcript):
+    """Pause an adopted job until its transcription completes, or wait for it in-process"""
+    if not wait_for_transcript:
+        print(f"Job {job['job_id']} paused until its adopted transcription completes")
+        return None
+    # Completion events skip a job that is waited on in-process
+    if not claim_job_resume(job):
+        return None
+    # The Transcribe slots were taken by the attempt that started the transcriptions
+    transcripts = [backend.wait(name) for name in transcription_job_names(job)]
+    if job.get('transcribe_segments'):
+        return finish_segmented_transcription(job, transcripts)
+    return finish_transcription(job, transcripts[0])
+
+def select_transcription_backend(job, info):
+    """Pick the transcription backend for a job.
+
+    An explicit choice in the job options or TRANSCRIPTION_BACKEND wins. With
+    "auto", short clips are transcribed in-process when the local engine is
+    installed and has a free worker, as are medium-length ones while
+    Transcribe has a queue. Everything else goes to Transcribe.
+    """
+    choice = job.get('options', {}).get('transcription_backend', TRANSCRIPTION_BACKEND)
+    if choice != 'auto':
+        backend = TRANSCRIPTION_BACKENDS.get(choice)
+        if backend and backend.available():
+            return backend
+        print(f"Transcription backend {choice} is not available, using transcribe")
+        return TRANSCRIPTION_BACKENDS['transcribe']
+    
+    local = TRANSCRIPTION_BACKENDS['local']
+    duration = (info or {}).get('duration')
+    if (duration and duration <= LOCAL_TRANSCRIPTION_BUSY_MAX_SECONDS and local.available()
+            and local.queue_depth() < LOCAL_TRANSCRIPTION_WORKERS):
+        if duration <= LOCAL_TRANSCRIPTION_MAX_SECONDS:
+            return local
+        queued = TRANSCRIPTION_BACKENDS['transcribe'].queue_depth()
+        if queued >= TRANSCRIBE_QUEUE_THRESHOLD:
+            print(f"{queued} Transcribe jobs queued, transcribing locally")
+            return local
+    return TRANSCRIPTION_BACKENDS['transcribe']
+
+def transcribe_locally(job, info, backend):
+    """Download a job's audio and transcribe it in-process, skipping the S3 upload and remote job"""
+    audio_plan = plan_job_audio(job, info)
+    with DOWNLOAD_SLOTS.hold(job['job_id']):
+        audio_file_path = download_video_audio(job['url'], job['video_id'], audio_plan)
+    if not audio_file_path:
+        raise PipelineError('Failed to download video audio. YouTube may be blocking automated requests.')
+    
+    try:
+        record_audio_size(job, audio_plan, os.path.getsize(audio_file_path), (info or {}).get('duration'))
+        result = deduplicate_job_audio(job, audio_file_path)
+        if result:
+            return result
+        trimmed_plan = trimmed_audio_plan(audio_plan)
+        trimmed_path = trim_non_speech(job, audio_file_path, (info or {}).get('duration'), trimmed_plan)
+        if trimmed_path:
+            cleanup_temp_files(audio_file_path)
+            audio_file_path, audio_plan = trimmed_path, trimmed_plan
+        update_job(job, stage='transcribing', transcription_backend=backend.name)
+        transcript = backend.submit(f"{backend.name}-{job['video_id']}-{job['job_id']}", audio_file_path, audio_plan)
+    finally:
+        cleanup_temp_files(audio_file_path)
+    
+    return complete_transcription(job, transcript, backend.name)
+
+def plan_job_audio(job, info):
+    """Choose a job's audio format and record it as the job enters the download stage"""
+    audio_plan = plan_audio_format(info, job.get('options', {}).get('audio_profile', AUDIO_PROFILE))
+    update_job(job, stage='downloading', audio_format=audio_plan)
+    return audio_plan
+
+def upload_job_audio(job, info, checkpoint=None):
+    """Download a job's audio and upload it to RAW_BUCKET, returning the S3 key and audio plan.
+
+    A streaming upload continues the unfinished multipart upload of an earlier
+    attempt in the checkpoint when the same audio format was chosen.
+    """
+    video_id = job['video_id']
+    options = job.get('options', {})
+    audio_plan = plan_job_audio(job, info)
+    audio_s3_key = f"audio/{video_id}_{uuid.uuid4().hex}.{audio_plan['ext']}"
+    
+    with DOWNLOAD_SLOTS.hold(job['job_id']):
+        if options.get('streaming'):
+            upload = (checkpoint or {}).get('upload')
+            upload_id = None
+            if upload and upload['audio_plan'] == audio_plan:
+                audio_s3_key, upload_id = upload['audio_s3_key'], upload['upload_id']
+            
+            def on_upload_started(new_upload_id):
+                save_checkpoint(job_output_id(job), 'upload', audio_s3_key=audio_s3_key, audio_plan=audio_plan, upload_id=new_upload_id)
+            
+            # Steps 1-2: Download, encode and upload concurrently without touching /tmp
+            audio_bytes = stream_audio_to_s3(job['url'], audio_s3_key, audio_plan, upload_id, on_upload_started)
+            clear_checkpoint(job_output_id(job), 'upload')
+            if not audio_bytes:
+                raise PipelineError('Failed to download video audio. YouTube may be blocking automated requests.')
+        else:
+            # Step 1: Download video audio
+            audio_file_path = download_video_audio(job['url'], video_id, audio_plan)
+            if not audio_file_path:
+                raise PipelineError('Failed to download video audio. YouTube may be blocking automated requests.')
+            
+            try:
+                # Step 2: Upload audio to S3
+                audio_bytes = os.path.getsize(audio_file_path)
+                upload_audio_to_s3(audio_file_path, audio_s3_key, audio_plan['content_type'])
+            finally:
+                cleanup_temp_files(audio_file_path)
+    
+    record_audio_size(job, audio_plan, audio_bytes, (info or {}).get('duration'))
+    return audio_s3_key, audio_plan
+
+def record_audio_size(job, audio_plan, audio_bytes, duration):
+    """Record the size of a job's audio and, for re-encoded audio, the bytes saved against the downloaded source"""
+    audio_size = {'bytes': audio_bytes}
+    if duration:
+        audio_size['kbps'] = round(audio_bytes * 8 / duration / 1000, 1)
+    source_bytes = audio_plan.get('source_filesize')
+    if source_bytes:
+        audio_size['source_bytes'] = source_bytes
+        audio_size['saved_percent'] = round(100 * (1 - audio_bytes / source_bytes), 1)
+        print(f"Audio profile {audio_plan['encoding']}: {audio_bytes} bytes, {audio_size['saved_percent']}% smaller than the source")
+    update_job(job, audio_size=audio_size)
+
+def deduplicate_job_audio(job, source):
+    """Look a job's downloaded audio (a local path or URL) up in the fingerprint index.
+
+    Returns the response body built from a matching, already-transcribed video,
+    or None to transcribe as usual. The fingerprint is recorded in the job either
+    way, and indexed once the job's own transcript is summarized.
+    """
+    if not job.get('options', {}).get('dedupe'):
+        return None
+    import importlib.util
+    if not importlib.util.find_spec('numpy'):
+        return None
+    # Only the opening minutes are fingerprinted, so a match also needs the same length
+    duration = (job.get('preflight') or {}).get('duration')
+    if not duration:
+        return None
+    
+    update_job(job, stage='fingerprinting')
+    try:
+        hashes = audio_fingerprint(source)
+        if len(hashes) < FINGERPRINT_MIN_HASHES:
+            print(f"Audio fingerprint too sparse to match ({len(hashes)} hashes)")
+            return None
+        signature = minhash_signature(hashes)
+        match = find_fingerprint_match(job['video_id'], signature, duration)
+    except Exception as e:
+        print(f"Fingerprint error, transcribing as usual: {str(e)}")
+        return None
+    
+    fingerprint = {'signature': signature, 'hashes': int(len(hashes)), 'duration': duration}
+    if match:
+        fingerprint.update(duplicate_of=match[0], similarity=round(match[1], 3))
+    update_job(job, fingerprint=fingerprint)
+    return reuse_duplicate_transcript(job, match[0]) if match else None
+
+def reuse_duplicate_transcript(job, duplicate_id):
+    """Serve a job from the transcript and summary of a video with the same audio, skipping transcription.
+
+    Returns None when the other video's transcript is gone. Without a cached
+    result for it, the reused transcript is summarized as usual. Word timings
+    are not copied, since the other upload may start at a different point.
+    Only the other video's output with the job's sponsor setting is reused.
+    """
+    video_id = job['video_id']
+    output = job_output_id(job)
+    duplicate = output_id(duplicate_id, job.get('options'))
+    transcript_text = read_from_s3(TRANSCRIPTS_BUCKET, transcript_cache_key(duplicate))
+    if not transcript_text:
+        return None
+    print(f"Audio of {video_id} matches {duplicate_id}, reusing its transcript")
+    cached = get_cached_result(duplicate)
+    if not cached:
+        return summarize_transcript(job, transcript_text, 'fingerprint')
+    
+    summary = read_from_s3(SUMMARIES_BUCKET, summary_cache_key(duplicate)) or cached['summary']
+    save_to_s3(TRANSCRIPTS_BUCKET, transcript_cache_key(output), transcript_text)
+    save_to_s3(SUMMARIES_BUCKET, summary_cache_key(output), summary)
+    result = dict(
+        cached,
+        video_id=video_id,
+        transcript_source='fingerprint',
+        transcript_key=transcript_cache_key(output),
+        summary_key=summary_cache_key(output),
+        duplicate_of=duplicate_id
+    )
+    save_cached_result(output, result)
+    clear_checkpoint(output)
+    try:
+        index_video(video_id, summary, transcript_text)
+    except Exception as e:
+        print(f"Search index error: {str(e)}")
+    register_job_fingerprint(job)
+    return result
+
+def start_job_transcription(job, backend, audio_s3_key, audio_plan):
+    """Start the remote transcription of a job's uploaded audio, returning the transcription job name"""
+    # Step 3: Start transcription job
+    transcribe_job_name = f"transcribe-{job['video_id']}-{job['job_id']}"
+    hold_transcription_slots(job, 1)
+    backend.submit(transcribe_job_name, audio_s3_key, audio_plan)
+    update_job(
+        job,
+        stage='transcribing',
+        transcription_backend=backend.name,
+        transcribe_job_name=transcribe_job_name,
+        audio_s3_key=audio_s3_key
+    )
+    checkpoint_job_transcription(job)
+    return transcribe_job_name
+
+def checkpoint_job_transcription(job):
+    """Checkpoint the Transcribe jobs a job started, so a retry can take them over"""
+    save_checkpoint(
+        job_output_id(job), 'transcription',
+        job_id=job['job_id'],
+        backend=job['transcription_backend'],
+        audio_s3_key=job['audio_s3_key'],
+        **{key: job[key] for key in TRANSCRIPTION_CHECKPOINT_FIELDS if job.get(key)}
+    )
+
+def hold_transcription_slots(job, count):
+    """Take a Transcribe slot for each of the count Transcribe jobs a job is about to start.
+
+    The slots stay taken while the job is paused, and are released by
+    release_transcription_slots when the job ends, possibly in another invocation.
+    """
+    tokens = TRANSCRIBE_SLOTS.acquire(job['job_id'], count, ttl=LEASE_TRANSCRIBING_SECONDS)
+    update_job(job, transcribe_slots=tokens)
+
+def release_transcription_slots(job):
+    """Free the Transcribe slots a job holds"""
+    tokens = job.pop('transcribe_slots', None)
+    if tokens:
+        TRANSCRIBE_SLOTS.release(tokens)
+
+def finish_transcription(job, transcript):
+    """Summarize a job once Transcribe has produced its transcript"""
+    release_transcription_slots(job)
+    cleanup_s3_audio(job['audio_s3_key'])
+    return complete_transcription(job, transcript, 'transcribe')
+
+def complete_transcription(job, transcript, transcript_source):
+    """Store a backend transcript's word timings in original video time and summarize its text"""
+    if not transcript or not transcript['text']:
+        raise PipelineError('Failed to transcribe audio')
+    words = remap_words(transcript.get('words') or [], job.get('audio_offset_map'))
+    return summarize_transcript(job, transcript['text'], transcript_source, words)
+
+def trimmed_audio_plan(audio_plan):
+    """Plan for a job's trimmed audio: its own re-encoding, or speech-opus for stream-copied audio"""
+    if audio_plan.get('transcode') and audio_plan.get('encoding') in AUDIO_ENCODINGS:
+        return dict(audio_plan)
+    return dict(SPEECH_AUDIO_PLANS['speech-opus'])
+
+def trim_job_audio(job, audio_s3_key, audio_plan, duration):
+    """Replace a job's uploaded audio with a copy trimmed of non-speech, returning (key, plan, duration).
+
+    The trimmed audio is streamed from ffmpeg into RAW_BUCKET, never through /tmp.
+    """
+    trimmed_plan = trimmed_audio_plan(audio_plan)
+    trimmed_key = f"audio/{job['video_id']}_{uuid.uuid4().hex}.{trimmed_plan['ext']}"
+    if not duration or not trim_non_speech(job, presign_raw_audio(audio_s3_key), duration, trimmed_plan, trimmed_key):
+        return audio_s3_key, audio_plan, duration
+    cleanup_s3_audio(audio_s3_key)
+    return trimmed_key, trimmed_plan, job['vad']['trimmed_seconds']
+
+def trim_non_speech(job, source, duration, audio_plan, s3_key=None):
+    """Cut long non-speech stretches and the job's sponsor segments out of the audio at source (a local path or URL).
+
+    The trimmed audio is encoded as audio_plan says. With s3_key it is streamed
+    to RAW_BUCKET and the number of bytes uploaded is returned; otherwise the
+    path of a file in a new temporary directory is returned. Returns None when
+    there is nothing to cut, trimming fails, or silence alone would not save
+    VAD_MIN_SAVINGS seconds. The offset map and the seconds removed are recorded in the job.
+    """
+    method = VAD_METHOD
+    if method == 'auto':
+        import importlib.util
+        method = 'energy' if importlib.util.find_spec('numpy') else 'silencedetect'
+    if method not in ['energy', 'silencedetect']:
+        method = 'off'
+    sponsor_spans = [(segment['start'], segment['end']) for segment in job.get('sponsor_segments') or []]
+    if method == 'off' and not sponsor_spans:
+        return None
+    
+    update_job(job, stage='trimming')
+    try:
+        if method == 'energy':
+            silences, duration = detect_silences_energy(source)
+        elif method == 'silencedetect':
+            silences = detect_silences_ffmpeg(source, duration)
+        else:
+            silences = []
+        intervals = speech_intervals(silences, duration, sponsor_spans)
+        removed = duration - sum(end - start for start, end in intervals)
+        print(f"VAD ({method}): {removed:.1f}s of {duration:.1f}s is non-speech or sponsored")
+        if not intervals or (removed < VAD_MIN_SAVINGS and not sponsor_spans):
+            update_job(job, vad={'method': method, 'original_seconds': round(duration, 3), 'removed_seconds': 0})
+            return None
+        
+        trimmed = cut_speech_intervals(source, intervals, audio_plan, s3_key)
+    except Exception as e:
+        print(f"VAD trimming error, transcribing untrimmed audio: {str(e)}")
+        return None
+    
+    update_job(
+        job,
+        vad={
+            'method': method,
+            'original_seconds': round(duration, 3),
+            'trimmed_seconds': round(duration - removed, 3),
+            'removed_seconds': round(removed, 3),
+            'sponsor_seconds': round(sum(max(0.0, min(end, duration) - start) for start, end in sponsor_spans), 3)
+        },
+        audio_offset_map=build_offset_map(intervals)
+    )
+    return trimmed
+
+def record_video_chapters(job, info):
+    """Record the video's chapters in the job, so the summary can follow them after the job pauses"""
+    chapters = [
+        {'title': chapter.get('title') or f"Chapter {index + 1}", 'start': float(chapter['start_time']), 'end': float(chapter['end_time'])}
+        for index, chapter in enumerate(info.get('chapters') or [])
+        if chapter.get('start_time') is not None and chapter.get('end_time') is not None
+    ]
+    if CHAPTER_SUMMARIES and len(chapters) >= 2:
+        update_job(job, chapters=chapters)
+
+def record_sponsor_segments(job, info):
+    """Fetch the video's SponsorBlock segments and record them in the job as sponsor_segments"""
+    segments = fetch_sponsor_segments(info)
+    if segments:
+        update_job(job, sponsor_segments=segments)
+    return segments
+
+def use_chunked_transcription(job, duration):
+    """Whether a job's audio is long enough to transcribe as concurrent segments"""
+    if not job.get('options', {}).get('chunked', CHUNKED_TRANSCRIPTION):
+        return False
+    return (duration or 0) >= CHUNKED_TRANSCRIPTION_MIN_SECONDS
+
+def transcribe_in_segments(job, backend, audio_s3_key, audio_plan, duration, wait_for_transcript):
+    """Transcribe long audio as overlapping segments on concurrent remote transcription jobs.
+
+    With wait_for_transcript False the job pauses once every segment job has
+    started, and resume_segmented_job stitches the transcripts after the last
+    one completes.
+    """
+    update_job(job, stage='segmenting')
+    source_url = presign_raw_audio(audio_s3_key)
+    segments = plan_transcription_segments(source_url, duration)
+    for segment in segments:
+        segment['job_name'] = f"transcribe-{job['video_id']}-{job['job_id']}-{segment['index']}"
+        segment['audio_s3_key'] = f"audio/{job['video_id']}_{job['job_id']}_{segment['index']}.{audio_plan['ext']}"
+    print(f"Transcribing {duration}s of audio as {len(segments)} segments")
+
+    def start_segment(segment):
+        cut_audio_segment_to_s3(source_url, segment, audio_plan)
+        backend.submit(segment['job_name'], segment['audio_s3_key'], audio_plan)
+
+    def transcribe_segment(segment):
+        start_segment(segment)
+        return backend.wait(segment['job_name'])
+
+    # One Transcribe slot per segment, held until the stitched transcript is summarized
+    hold_transcription_slots(job, len(segments))
+    try:
+        with ThreadPoolExecutor(max_workers=len(segments)) as executor:
+            if not wait_for_transcript:
+                list(executor.map(start_segment, segments))
+                update_job(job, stage='transcribing', transcription_backend=backend.name,
+                           audio_s3_key=audio_s3_key, transcribe_segments=segments)
+                checkpoint_job_transcription(job)
+                print(f"Job {job['job_id']} paused until {len(segments)} segment transcriptions complete")
+                return None
+            claim_job_resume(job)
+            update_job(job, stage='transcribing', transcription_backend=backend.name,
+                       audio_s3_key=audio_s3_key, transcribe_segments=segments)
+            checkpoint_job_transcription(job)
+            transcripts = list(executor.map(transcribe_segment, segments))
+    except Exception:
+        cleanup_s3_audio(audio_s3_key)
+        cleanup_segment_audio(segments)
+        raise
+    return finish_segmented_transcription(job, transcripts)
+
+def plan_transcription_segments(source_url, duration):
+    """Split the audio into overlapping segments, moving each cut to a nearby silence where there is one.
+
+    There are never more segments than Transcribe slots, so a job can hold a slot for each.
+    """
+    count = min(max(1, round(duration / TRANSCRIBE_SEGMENT_SECONDS)), MAX_CONCURRENT_TRANSCRIBE_JOBS)
+    nominal_cuts = [duration * i / count for i in range(1, count)]
+    with ThreadPoolExecutor(max_workers=max(1, len(nominal_cuts))) as executor:
+        silences = list(executor.map(lambda cut: find_silence_near(source_url, cut), nominal_cuts))
+
+    bounds = [0.0] + [
+        silence if silence is not None else cut
+        for cut, silence in zip(nominal_cuts, silences)
+    ] + [float(duration)]
+    return [
+        {
+            'index': index,
+            # Each segment also covers the end of the previous one so words cut at the boundary are heard whole
+            'start': round(max(0.0, bounds[index] - TRANSCRIBE_SEGMENT_OVERLAP) if index else 0.0, 3),
+            'end': round(bounds[index + 1], 3)
+        }
+        for index in range(count)
+    ]
+
+def transcription_job_names(job):
+    """Names of the Transcribe jobs a paused job is waiting on"""
+    segments = job.get('transcribe_segments')
+    if segments:
+        return [segment['job_name'] for segment in segments]
+    return [job['transcribe_job_name']]
+
+def resume_segmented_job(job):
+    """Stitch and summarize a segmented transcription once every segment's output is in S3"""
+    job_id = job['job_id']
+    # Segment job names share the ID of the job that started them, which an adopting job does not
+    name_prefix = job['transcribe_segments'][0]['job_name'].rsplit('-', 1)[0]
+    listed = get_client('s3').list_objects_v2(
+        Bucket=TRANSCRIPTS_BUCKET,
+        Prefix=f"{TRANSCRIBE_OUTPUT_PREFIX}{name_prefix}-"
+    )
+    present = {item['Key'] for item in listed.get('Contents', [])}
+    output_keys = [f"{TRANSCRIBE_OUTPUT_PREFIX}{segment['job_name']}.json" for segment in job['transcribe_segments']]
+    pending = [key for key in output_keys if key not in present]
+    if pending:
+        print(f"Job {job_id} waiting for {len(pending)} of {len(output_keys)} segment transcriptions")
+        return
+
+    # Segments finish close together and both S3 and EventBridge deliver events, so stitch only once
+    if not claim_job_resume(job):
+        return
+    print(f"Resuming job {job_id} from {len(output_keys)} segment transcriptions")
+    run_job_stage(job, lambda: finish_segmented_transcription(
+        job, [transcript_from_transcribe_output(load_transcribe_output(key)) for key in output_keys]
+    ))
+
+def claim_job_resume(job):
+    """Claim the right to resume a job, returning False when another invocation already has"""
+    from botocore.exceptions import ClientError
+    try:
+        get_client('s3').put_object(
+            Bucket=SUMMARIES_BUCKET,
+            Key=f"{JOB_PREFIX}{job['job_id']}.resumed",
+            Body=b'',
+            IfNoneMatch='*'
+        )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] in ['PreconditionFailed', 'ConditionalRequestConflict']:
+            print(f"Job {job['job_id']} is already being resumed")
+            return False
+        raise
+
+def finish_segmented_transcription(job, transcripts):
+    """Stitch the segment transcripts back into one and summarize it"""
+    segments = job['transcribe_segments']
+    release_transcription_slots(job)
+    cleanup_segment_audio(segments)
+    if any(transcript is None for transcript in transcripts):
+        cleanup_s3_audio(job['audio_s3_key'])
+        raise PipelineError('Failed to transcribe audio')
+
+    words = []
+    previous_end = 0.0
+    for segment, transcript in zip(segments, transcripts):
+        words = stitch_words(words, offset_words(transcript['words'], segment['start']), segment['start'], previous_end)
+        previous_end = segment['end']
+    print(f"Stitched {len(segments)} segments into {len(words)} words")
+    return finish_transcription(job, {'text': ' '.join(word['text'] for word in words), 'words': words})
+
+def summarize_transcript(job, transcript_text, transcript_source, timed_text=None):
+    """Store the transcript, generate and store the summary, and return the response body.
+
+    timed_text is the transcript as start/end/text dicts (words or caption cues).
+    With it, a job with recorded chapters is summarized chapter by chapter.
+    """
+    video_id = job['video_id']
+    output = job_output_id(job)
+    transcript_key = transcript_cache_key(output)
+    summary_key = summary_cache_key(output)
+    if transcript_source != 'stored':
+        save_to_s3(TRANSCRIPTS_BUCKET, transcript_key, transcript_text)
+        if timed_text:
+            save_transcript_words(output, timed_text if transcript_source != 'captions' else caption_words(timed_text))
+        save_checkpoint(output, 'transcript', source=transcript_source, words=bool(timed_text))
+    
+    # Generate summary using Bedrock
+    update_job(job, status='running', stage='summarizing')
+    on_text = stream_summary_to_job(job) if STREAM_SUMMARIES else None
+    summary_checkpoint = load_summary_checkpoint(output)
+    chapters = split_into_chapters(timed_text, job['chapters']) if timed_text and job.get('chapters') else []
+    if len(chapters) >= 2:
+        summary, chapter_summaries = generate_chapter_summaries_bedrock(chapters, on_text, summary_checkpoint)
+    else:
+        summary, chapter_summaries = generate_summary_bedrock(transcript_text, on_text, summary_checkpoint), None
+    job.pop('partial_summary', None)
+    if summary:
+        save_to_s3(SUMMARIES_BUCKET, summary_key, summary)
+    
+    result = {
+        'summary': summary or f"This video discusses: {transcript_text[:500]}...",
+        'transcript': transcript_text[:1000] + '...' if len(transcript_text) > 1000 else transcript_text,
+        'video_id': video_id,
+        'transcript_source': transcript_source,
+        'transcript_key': transcript_key,
+        'summary_key': summary_key
+    }
+    if summary and chapter_summaries:
+        result['chapters'] = chapter_summaries
+        result['chapters_key'] = summary_cache_key(output, 'chapters.json')
+        get_client('s3').put_object(
+            Bucket=SUMMARIES_BUCKET,
+            Key=result['chapters_key'],
+            Body=json.dumps({'video_id': video_id, 'summary': summary, 'chapters': chapter_summaries}),
+            ContentType='application/json'
+        )
+    # Fallback summaries are not cached so the next request retries Bedrock,
+    # resuming from the checkpointed partial summaries
+    if summary:
+        save_cached_result(output, result)
+        clear_checkpoint(output)
+    try:
+        index_video(video_id, summary or '', transcript_text)
+    except Exception as e:
+        print(f"Search index error: {str(e)}")
+    register_job_fingerprint(job)
+    return result
+
+def register_job_fingerprint(job):
+    """Index the audio fingerprint recorded for a job, so later uploads of the same audio reuse its transcript"""
+    if not job.get('fingerprint'):
+        return
+    try:
+        register_fingerprint(job['video_id'], job['fingerprint'])
+    except Exception as e:
+        print(f"Fingerprint index error: {str(e)}")
+
+def stream_summary_to_job(job):
+    """Return a callback that appends streamed summary text to the job record.
+
+    The record is rewritten at most every STREAM_FLUSH_INTERVAL seconds so
+    pollers see the summary grow without an S3 write per token.
+    """
+    parts = []
+    last_flush = [0.0]
+    
+    def on_text(text):
+        parts.append(text)
+        if time.time() - last_flush[0] >= STREAM_FLUSH_INTERVAL:
+            last_flush[0] = time.time()
+            update_job(job, partial_summary=''.join(parts))
+    
+    return on_text
+
+def handle_transcription_event(event):
+    """Resume paused jobs from S3 object-created or Transcribe state-change events"""
+    # EventBridge "Transcribe Job State Change"
+    if event.get('source') == 'aws.transcribe':
+        detail = event.get('detail', {})
+        job_name = detail.get('TranscriptionJobName', '')
+        status = detail.get('TranscriptionJobStatus')
+        if status == 'COMPLETED':
+            resume_transcribed_job(job_name, f"{TRANSCRIBE_OUTPUT_PREFIX}{job_name}.json")
+        elif status == 'FAILED':
+            job = load_paused_job(job_name)
+            if job:
+                fail_transcription(job, get_transcription_status(job_name))
+        return
+    
+    # S3 ObjectCreated notifications for transcribe-output/*.json
+    for record in event.get('Records', []):
+        if record.get('eventSource') != 'aws:s3':
+            continue
+        output_key = unquote_plus(record['s3']['object']['key'])
+        if not output_key.startswith(TRANSCRIBE_OUTPUT_PREFIX) or not output_key.endswith('.json'):
+            continue
+        job_name = output_key[len(TRANSCRIBE_OUTPUT_PREFIX):-len('.json')]
+        resume_transcribed_job(job_name, output_key)
+
+def load_paused_job(transcribe_job_name):
+    """Find the job waiting on a Transcribe job, or None if it is not waiting any more"""
+    match = TRANSCRIBE_JOB_PATTERN.match(transcribe_job_name)
+    if not match:
+        print(f"Ignoring transcription not started by a job: {transcribe_job_name}")
+        return None
+    
+    job = load_job(match.group('job_id'))
+    # A retry that adopted the transcription (see adopt_transcription_checkpoint) waits in its place
+    while job and job.get('superseded_by'):
+        job = load_job(job['superseded_by'])
+    # S3 and EventBridge may both deliver completion, so only resume once
+    if (not job or job['status'] in ['completed', 'failed'] or job['stage'] != 'transcribing'
+            or transcribe_job_name not in transcription_job_names(job)):
+        print(f"No paused job for transcription: {transcribe_job_name}")
+        return None
+    return job
+
+def resume_transcribed_job(transcribe_job_name, output_key):
+    """Continue a paused job straight to summarization from its Transcribe output"""
+    job = load_paused_job(transcribe_job_name)
+    if not job:
+        return
+    if job.get('transcribe_segments'):
+        resume_segmented_job(job)
+        return
+    # Both events may arrive at once, and a job waited on in-process has claimed its resume already
+    if not claim_job_resume(job):
+        return
+    print(f"Resuming job {job['job_id']} from {output_key}")
+    run_job_stage(job, lambda: finish_transcription(
+        job, transcript_from_transcribe_output(load_transcribe_output(output_key))
+    ))
+
+def resume_job(job_id):
+    """Resume a paused job after confirming its transcription finished"""
+    job = load_job(job_id)
+    if not job or job['stage'] != 'transcribing':
+        return
+
+    statuses = [get_transcription_status(name) for name in transcription_job_names(job)]
+    failed = next((status for status in statuses if status['TranscriptionJobStatus'] == 'FAILED'), None)
+    if failed:
+        fail_transcription(job, failed)
+    elif all(status['TranscriptionJobStatus'] == 'COMPLETED' for status in statuses):
+        if job.get('transcribe_segments'):
+            resume_segmented_job(job)
+        else:
+            resume_transcribed_job(job['transcribe_job_name'], transcribe_output_key(statuses[0]))
+
+def fail_transcription(job, status):
+    """Mark a job failed because its Transcribe job failed"""
+    reason = status.get('FailureReason', 'Unknown error')
+    print(f"Transcription failed: {reason}")
+    release_transcription_slots(job)
+    cleanup_s3_audio(job['audio_s3_key'])
+    cleanup_segment_audio(job.get('transcribe_segments') or [])
+    update_job(job, status='failed', error=f'Failed to transcribe audio: {reason}')
+
+def extract_video_info(url):
+    """Extract video metadata with yt-dlp without downloading any media"""
+    import yt_dlp
+    try:
+        ydl_opts = {
+            'skip_download': True,
+            'quiet': True,
+            'no_warnings': True,
+        }
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            return ydl.sanitize_info(ydl.extract_info(url, download=False))
+    except Exception as e:
+        print(f"Metadata extraction error: {str(e)}")
+        if UNAVAILABLE_VIDEO_PATTERN.search(str(e)):
+            raise PipelineError(YT_DLP_ERROR_PREFIX.sub('', str(e)))
+        return None
+
+def preflight_video(job):
+    """Read a job's video metadata before downloading anything, and pick the job's route.
+
+    Raises PipelineError for videos that cannot be summarized. Otherwise
+    records the duration, live status, availability, caption presence and route
+    ("captions", "single" or "chunked") as the job's preflight, and returns the
+    info. Returns None when the metadata cannot be read, so the download is
+    attempted as before.
+    """
+    update_job(job, stage='preflight')
+    info = extract_video_info(job['url'])
+    if not info:
+        return None
+    
+    duration = info.get('duration')
+    live_status = info.get('live_status')
+    availability = info.get('availability')
+    if live_status in REJECTED_LIVE_STATUSES:
+        raise PipelineError(REJECTED_LIVE_STATUSES[live_status])
+    if availability in REJECTED_AVAILABILITY:
+        raise PipelineError(REJECTED_AVAILABILITY[availability])
+    has_captions = select_caption_track(info) is not None
+    route = 'captions' if has_captions else audio_route(job, duration)
+    update_job(job, preflight={
+        'duration': duration,
+        'live_status': live_status,
+        'availability': availability,
+        'has_captions': has_captions,
+        'route': route
+    })
+    print(f"Pre-flight for {job['video_id']}: {route} ({duration}s)")
+    return info
+
+def audio_route(job, duration):
+    """Route of a video that has to be transcribed: "chunked" or "single".
+
+    Raises PipelineError for videos longer than MAX_VIDEO_SECONDS.
+    """
+    if duration and duration > MAX_VIDEO_SECONDS:
+        raise PipelineError(
+            f"This video is {duration / 3600:.1f} hours long; videos without captions "
+            f"are limited to {MAX_VIDEO_SECONDS / 3600:g} hours"
+        )
+    return 'chunked' if use_chunked_transcription(job, duration) else 'single'
+
+def select_caption_track(info):
+    """Pick the best English WebVTT caption track, preferring manual over automatic captions"""
+    video_language = info.get('language') or 'en'
+    candidates = [('subtitles', info.get('subtitles') or {})]
+    # Automatic captions for a non-English video are machine translations, so skip them
+    if video_language.startswith('en'):
+        candidates.append(('automatic_captions', info.get('automatic_captions') or {}))
+    
+    for source, tracks in candidates:
+        languages = [lang for lang in CAPTION_LANGUAGES if lang in tracks]
+        languages += sorted(lang for lang in tracks if lang.startswith('en-') and lang not in languages)
+        for lang in languages:
+            for track in tracks[lang]:
+                if track.get('ext') == 'vtt' and track.get('url'):
+                    print(f"Selected {source} caption track: {lang}")
+                    return track
+    return None
+
+def parse_caption_cues(vtt_content):
+    """Parse WebVTT bytes into cues of start/end seconds and plain text.
+
+    Automatic captions repeat the previous line at the top of every cue so the
+    text rolls on screen; repeated lines are dropped here.
+    """
+    from yt_dlp import webvtt
+    cues = []
+    last_line = None
+    for block in webvtt.parse_fragment(vtt_content):
+        if not isinstance(block, webvtt.CueBlock):
+            continue
+        lines = []
+        for line in CAPTION_TAG_PATTERN.sub('', block.text).splitlines():
+            line = ' '.join(line.split())
+            if line and line != last_line:
+                lines.append(line)
+                last_line = line
+        if lines:
+            # WebVTT timestamps are parsed as 90 kHz MPEG ticks
+            cues.append({
+                'start': block.start / 90000,
+                'end': block.end / 90000,
+                'text': ' '.join(lines)
+            })
+    return cues
+
+def fetch_sponsor_segments(info):
+    """Look up the video's SponsorBlock segments to skip, as a list of category/start/end dicts.
+
+    yt-dlp's SponsorBlock post-processor does the API query (by hash prefix) and
+    drops segments submitted for a different video duration. A failed lookup
+    skips nothing.
+    """
+    import yt_dlp
+    from yt_dlp.postprocessor import SponsorBlockPP
+    try:
+        with yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True}) as ydl:
+            _, info = SponsorBlockPP(ydl, SPONSORBLOCK_CATEGORIES, SPONSORBLOCK_API).run(dict(info))
+        segments = [
+            {'category': chapter['category'], 'start': float(chapter['start_time']), 'end': float(chapter['end_time'])}
+            for chapter in info.get('sponsorblock_chapters') or []
+            if chapter['type'] == 'skip'
+        ]
+        print(f"Found {len(segments)} SponsorBlock segments to skip")
+        return segments
+    except Exception as e:
+        print(f"SponsorBlock lookup error: {str(e)}")
+        return []
+
+def fetch_caption_transcript(info, skip_segments=None):
+    """Return a transcript built from the video's caption track, as text plus the timed
+    cues, or None if none is usable.
+
+    Cues whose midpoint falls inside one of skip_segments are left out.
+    """
+    import yt_dlp
+    try:
+        track = select_caption_track(info)
+        if not track:
+            print("No usable caption track found")
+            return None
+        
+        with yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True}) as ydl:
+            vtt_content = ydl.urlopen(track['url']).read()
+        
+        cues = parse_caption_cues(vtt_content)
+        if skip_segments:
+            cues = [
+                cue for cue in cues
+                if not any(segment['start'] <= (cue['start'] + cue['end']) / 2 < segment['end'] for segment in skip_segments)
+            ]
+        transcript_text = ' '.join(cue['text'] for cue in cues)
+        if len(transcript_text.split()) < MIN_CAPTION_WORDS:
+            print("Caption track too short, falling back to transcription")
+            return None
+        
+        print(f"Transcript built from captions: {len(transcript_text)} characters")
+        return {'text': transcript_text, 'cues': cues}
+    
+    except Exception as e:
+        print(f"Caption fetch error: {str(e)}")
+        return None
+
+def extract_video_id(url):
+    """Extract the canonical video ID from any supported YouTube URL form"""
+    try:
+        parsed = urlparse(url.strip())
+        hostname = (parsed.hostname or '').lower()
+        path_parts = [part for part in parsed.path.split('/') if part]
+        video_id = None
+        
+        if hostname in YOUTUBE_HOSTS:
+            if parsed.path == '/watch':
+                video_id = parse_qs(parsed.query).get('v', [None])[0]
+            elif len(path_parts) >= 2 and path_parts[0] in YOUTUBE_PATH_PREFIXES:
+                video_id = path_parts[1]
+        elif hostname in ['youtu.be', 'www.youtu.be'] and path_parts:
+            video_id = path_parts[0]
+        
+        if video_id and VIDEO_ID_PATTERN.match(video_id):
+            return video_id
+    except:
+        pass
+    return None
+
+def output_id(video_id, options):
+    """Name under which the transcript, summary, checkpoint and lease of a video are stored.
+
+    A job that removes sponsor segments produces a different transcript and
+    summary from the same video, so its outputs get a suffixed name and are
+    never served to, or shared with, requests that keep them.
+    """
+    if (options or {}).get('skip_sponsors'):
+        return f"{video_id}{SPONSOR_FREE_SUFFIX}"
+    return video_id
+
+def job_output_id(job):
+    """output_id of a job's video with the job's options"""
+    return output_id(job['video_id'], job.get('options'))
+
+def transcript_cache_key(output):
+    """S3 key of the stored transcript, which only depends on the video and its sponsor setting (see output_id)"""
+    return f"transcripts/{output}.txt"
+
+def transcript_words_key(output):
+    """S3 key of a stored transcript's word timings (see encode_transcript_words)"""
+    return f"transcripts/{output}.words.bin"
+
+def caption_words(cues):
+    """Split caption cues into words, spreading each cue's words evenly over its duration"""
+    words = []
+    for cue in cues:
+        texts = cue['text'].split()
+        step = (cue['end'] - cue['start']) / len(texts)
+        words.extend(
+            {'start': cue['start'] + index * step, 'end': cue['start'] + (index + 1) * step, 'text': text, 'confidence': 1.0}
+            for index, text in enumerate(texts)
+        )
+    return words
+
+def little_endian(column):
+    """Return an array in little-endian byte order, the order used in stored artifacts"""
+    if sys.byteorder == 'big':
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column
+
+def encode_transcript_words(words):
+    """Pack word timings into the compact binary transcript artifact.
+
+    Layout after the TRANSCRIPT_WORDS_HEADER:
+      index       entries x (first word index, text offset), one per TRANSCRIPT_INDEX_INTERVAL_MS
+      start_ms    words x uint32
+      end_ms      words x uint32
+      offsets     (words + 1) x uint32: word i is text[offsets[i]:offsets[i + 1] - 1]
+      confidence  words x uint8 (0-255)
+      text        the words in UTF-8, separated by single spaces
+
+    Index entry k points at the first word starting at or after k intervals, so
+    the words of any time range are one contiguous slice of the text section.
+    """
+    encoded = [word['text'].encode('utf-8') for word in words]
+    offsets = array('I', [0])
+    for text in encoded:
+        offsets.append(offsets[-1] + len(text) + 1)
+    starts = array('I', [max(0, round(word['start'] * 1000)) for word in words])
+    ends = array('I', [max(0, round(word['end'] * 1000)) for word in words])
+    confidence = bytes(round(min(max(word.get('confidence') or 0, 0), 1) * 255) for word in words)
+    text = b' '.join(encoded)
+    
+    index = []
+    word_index = 0
+    entry_count = (starts[-1] // TRANSCRIPT_INDEX_INTERVAL_MS + 2) if starts else 1
+    for entry in range(entry_count):
+        while word_index < len(starts) and starts[word_index] < entry * TRANSCRIPT_INDEX_INTERVAL_MS:
+            word_index += 1
+        index.append(TRANSCRIPT_INDEX_ENTRY.pack(word_index, offsets[word_index]))
+    
+    header = TRANSCRIPT_WORDS_HEADER.pack(
+        TRANSCRIPT_WORDS_MAGIC, TRANSCRIPT_WORDS_VERSION, 0,
+        len(words), TRANSCRIPT_INDEX_INTERVAL_MS, entry_count, len(text)
+    )
+    return b''.join([
+        header, *index,
+        little_endian(starts).tobytes(), little_endian(ends).tobytes(), little_endian(offsets).tobytes(),
+        confidence, text
+    ])
+
+def parse_transcript_words_header(data):
+    """Return (word count, index interval, index entries, text bytes) from the start of an artifact"""
+    magic, version, _, word_count, interval_ms, entry_count, text_bytes = TRANSCRIPT_WORDS_HEADER.unpack_from(data)
+    if magic != TRANSCRIPT_WORDS_MAGIC or version != TRANSCRIPT_WORDS_VERSION:
+        raise ValueError('Not a transcript words artifact')
+    return word_count, interval_ms, entry_count, text_bytes
+
+def transcript_text_offset(word_count, entry_count):
+    """Byte offset of the text section in an artifact"""
+    return (TRANSCRIPT_WORDS_HEADER.size + entry_count * TRANSCRIPT_INDEX_ENTRY.size
+            + word_count * 4 * 2 + (word_count + 1) * 4 + word_count)
+
+def decode_transcript_words(data):
+    """Unpack a whole binary transcript artifact into start/end/text/confidence word dicts"""
+    word_count, _, entry_count, text_bytes = parse_transcript_words_header(data)
+    position = TRANSCRIPT_WORDS_HEADER.size + entry_count * TRANSCRIPT_INDEX_ENTRY.size
+    columns = []
+    for length in [word_count, word_count, word_count + 1]:
+        column = array('I')
+        column.frombytes(data[position:position + length * 4])
+        columns.append(little_endian(column))
+        position += length * 4
+    starts, ends, offsets = columns
+    confidence = data[position:position + word_count]
+    text = data[position + word_count:position + word_count + text_bytes]
+    return [
+        {
+            'start': starts[i] / 1000,
+            'end': ends[i] / 1000,
+            'text': text[offsets[i]:offsets[i + 1] - 1].decode('utf-8'),
+            'confidence': round(confidence[i] / 255, 3)
+        }
+        for i in range(word_count)
+    ]
+
+def save_transcript_words(video_id, words):
+    """Store a transcript's word timings as the binary artifact next to its text"""
+    key = transcript_words_key(video_id)
+    data = encode_transcript_words(words)
+    get_client('s3').put_object(Bucket=TRANSCRIPTS_BUCKET, Key=key, Body=data, ContentType='application/octet-stream')
+    print(f"Saved {len(words)} word timings to S3: s3://{TRANSCRIPTS_BUCKET}/{key} ({len(data)} bytes)")
+
+def load_transcript_words(video_id):
+    """Read and unpack a stored transcript's whole word timings artifact, returning None if there is none"""
+    from botocore.exceptions import ClientError
+    try:
+        response = get_client('s3').get_object(Bucket=TRANSCRIPTS_BUCKET, Key=transcript_words_key(video_id))
+    except ClientError as e:
+        if e.response['Error']['Code'] in ['NoSuchKey', '404']:
+            return None
+        raise
+    return decode_transcript_words(response['Body'].read())
+
+def read_s3_range(bucket, key, first, last):
+    """Read bytes first..last (inclusive) of an S3 object, returning None if it does not exist"""
+    from botocore.exceptions import ClientError
+    try:
+        response = get_client('s3').get_object(Bucket=bucket, Key=key, Range=f"bytes={first}-{last}")
+        return response['Body'].read()
+    except ClientError as e:
+        if e.response['Error']['Code'] in ['NoSuchKey', '404']:
+            return None
+        raise
+
+def read_transcript_range(video_id, start, end=None):
+    """Return the text of the words starting at or after start and before end seconds, or None without an artifact.
+
+    Two ranged GETs when both bounds fall on index entries: the header plus the
+    index up to end, then the slice of the text section between the two entries.
+    A bound inside an interval costs two more small reads, of the start times
+    of that interval's words and of the matching word's text offset.
+    """
+    key = transcript_words_key(video_id)
+    start_ms = round(start * 1000)
+    end_ms = round(end * 1000) if end is not None else None
+    interval_ms = TRANSCRIPT_INDEX_INTERVAL_MS
+    last_entry = end_ms // interval_ms if end is not None else 0
+    head = read_s3_range(
+        TRANSCRIPTS_BUCKET, key, 0,
+        TRANSCRIPT_WORDS_HEADER.size + (max(start_ms // interval_ms, last_entry) + 2) * TRANSCRIPT_INDEX_ENTRY.size - 1
+    )
+    if head is None:
+        return None
+    word_count, interval_ms, entry_count, text_bytes = parse_transcript_words_header(head)
+    if interval_ms != TRANSCRIPT_INDEX_INTERVAL_MS:
+        # Written with another interval: fetch its whole index instead
+        head = read_s3_range(TRANSCRIPTS_BUCKET, key, 0, TRANSCRIPT_WORDS_HEADER.size + entry_count * TRANSCRIPT_INDEX_ENTRY.size - 1)
+    columns_offset = TRANSCRIPT_WORDS_HEADER.size + entry_count * TRANSCRIPT_INDEX_ENTRY.size
+    
+    def index_entry(entry):
+        if entry >= entry_count:
+            return word_count, text_bytes + 1
+        return TRANSCRIPT_INDEX_ENTRY.unpack_from(head, TRANSCRIPT_WORDS_HEADER.size + entry * TRANSCRIPT_INDEX_ENTRY.size)
+    
+    def column_values(position, first, last):
+        values = array('I')
+        values.frombytes(read_s3_range(TRANSCRIPTS_BUCKET, key, position + first * 4, position + last * 4 - 1))
+        return little_endian(values)
+    
+    def first_word_from(time_ms):
+        """Index and text offset of the first word starting at or after time_ms"""
+        word, offset = index_entry(time_ms // interval_ms)
+        if time_ms % interval_ms == 0:
+            return word, offset
+        # Inside an interval: find the word among the interval's start times
+        next_word, next_offset = index_entry(time_ms // interval_ms + 1)
+        if next_word > word:
+            word += bisect_left(column_values(columns_offset, word, next_word), time_ms)
+        if word == next_word:
+            return next_word, next_offset
+        return word, column_values(columns_offset + word_count * 8, word, word + 1)[0]
+    
+    first_word, first_offset = first_word_from(start_ms)
+    last_word, last_offset = first_word_from(end_ms) if end is not None else (word_count, text_bytes + 1)
+    text = ''
+    if last_offset > first_offset:
+        text_offset = transcript_text_offset(word_count, entry_count)
+        text = read_s3_range(
+            TRANSCRIPTS_BUCKET, key, text_offset + first_offset, text_offset + last_offset - 2
+        ).decode('utf-8')
+    return {'text': text, 'word_count': max(0, last_word - first_word)}
+
+def summary_cache_key(output, extension='txt'):
+    """S3 key of a summary, versioned by video and sponsor setting (see output_id), models and prompt.
+
+    Chapter summaries come from CHAPTER_SUMMARY_MODEL, so a different chapter
+    model gets its own entry; with the default (BEDROCK_MODEL) the key is unchanged.
+    """
+    models = BEDROCK_MODEL if CHAPTER_SUMMARY_MODEL == BEDROCK_MODEL else f"{BEDROCK_MODEL}+{CHAPTER_SUMMARY_MODEL}"
+    return f"summaries/{output}/{models}/{PROMPT_VERSION}.{extension}"
+
+def get_cached_result(output):
+    """Return the cached response body for a video and sponsor setting, or None on a miss"""
+    try:
+        cached = read_from_s3(SUMMARIES_BUCKET, summary_cache_key(output, 'json'))
+        return json.loads(cached) if cached else None
+    except Exception as e:
+        print(f"Cache read error: {str(e)}")
+        return None
+
+def save_cached_result(output, result):
+    """Store the response body so later requests for the video and sponsor setting are served from S3"""
+    try:
+        get_client('s3').put_object(
+            Bucket=SUMMARIES_BUCKET,
+            Key=summary_cache_key(output, 'json'),
+            Body=json.dumps(result),
+            ContentType='application/json'
+        )
+    except Exception as e:
+        print(f"Cache write error: {str(e)}")
+
+def fingerprint_key(video_id):
+    """S3 key of a transcribed video's stored audio fingerprint signature"""
+    return f"{FINGERPRINT_PREFIX}{video_id}.json"
+
+def fingerprint_band_prefixes(signature):
+    """S3 prefixes of a signature's LSH buckets, one per band of its MinHash values.
+
+    Each indexed video has an empty marker object under every one of its
+    buckets, so videos sharing any whole band are found by listing the prefixes.
+    """
+    rows = len(signature) // FINGERPRINT_LSH_BANDS
+    prefixes = []
+    for band in range(FINGERPRINT_LSH_BANDS):
+        values = ','.join(str(value) for value in signature[band * rows:(band + 1) * rows])
+        prefixes.append(f"{FINGERPRINT_PREFIX}lsh/{band:02d}/{hashlib.md5(values.encode()).hexdigest()[:16]}/")
+    return prefixes
+
+def durations_agree(first, second):
+    """Whether two video durations are close enough for the videos to be the same recording"""
+    slack = max(FINGERPRINT_DURATION_SLACK * max(first, second), FINGERPRINT_DURATION_SLACK_SECONDS)
+    return abs(first - second) <= slack
+
+def find_fingerprint_match(video_id, signature, duration):
+    """Return (video_id, similarity) of the closest other indexed video, or None below FINGERPRINT_MATCH_THRESHOLD.
+
+    Videos of a different duration never match: the signature only covers the
+    opening minutes, which part 1/part 2 uploads and extended cuts share.
+    """
+    s3 = get_client('s3')
+    
+    def list_bucket(prefix):
+        response = s3.list_objects_v2(Bucket=TRANSCRIPTS_BUCKET, Prefix=prefix, MaxKeys=100)
+        return [item['Key'][len(prefix):] for item in response.get('Contents', [])]
+    
+    def similarity(candidate):
+        stored = read_from_s3(TRANSCRIPTS_BUCKET, fingerprint_key(candidate))
+        if not stored:
+            return 0.0
+        stored = json.loads(stored)
+        if not stored.get('duration') or not durations_agree(stored['duration'], duration):
+            return 0.0
+        other = stored['signature']
+        return sum(1 for mine, theirs in zip(signature, other) if mine == theirs) / len(signature)
+    
+    with ThreadPoolExecutor(max_workers=FINGERPRINT_LSH_BANDS) as executor:
+        candidates = sorted({
+            candidate for listed in executor.map(list_bucket, fingerprint_band_prefixes(signature))
+            for candidate in listed
+        } - {video_id})
+        scores = list(executor.map(similarity, candidates))
+    if not candidates:
+        return None
+    best = max(range(len(candidates)), key=lambda index: scores[index])
+    if scores[best] < FINGERPRINT_MATCH_THRESHOLD:
+        return None
+    return candidates[best], scores[best]
+
+def register_fingerprint(video_id, fingerprint):
+    """Add a transcribed video's audio fingerprint to the lookup index"""
+    s3 = get_client('s3')
+    signature = fingerprint['signature']
+    s3.put_object(
+        Bucket=TRANSCRIPTS_BUCKET,
+        Key=fingerprint_key(video_id),
+        Body=json.dumps({
+            'video_id': video_id,
+            'signature': signature,
+            'hashes': fingerprint['hashes'],
+            'duration': fingerprint.get('duration')
+        }),
+        ContentType='application/json'
+    )
+    with ThreadPoolExecutor(max_workers=FINGERPRINT_LSH_BANDS) as executor:
+        list(executor.map(
+            lambda prefix: s3.put_object(Bucket=TRANSCRIPTS_BUCKET, Key=f"{prefix}{video_id}", Body=b''),
+            fingerprint_band_prefixes(signature)
+        ))
+    print(f"Registered audio fingerprint: s3://{TRANSCRIPTS_BUCKET}/{fingerprint_key(video_id)}")
+
+def tokenize(text):
+    """Split text into lowercase search terms with their word positions, leaving out stopwords"""
+    return [
+        (position, term)
+        for position, term in enumerate(match.group().lower() for match in SEARCH_TOKEN_PATTERN.finditer(text))
+        if term not in SEARCH_STOPWORDS
+    ]
+
+def search_shard(term, shard_count):
+    """Shard holding a term's postings"""
+    return int(hashlib.md5(term.encode('utf-8')).hexdigest()[:8], 16) % shard_count
+
+def search_shard_key(generation, shard):
+    """S3 key of one shard of a merged index generation"""
+    return f"{SEARCH_PREFIX}shards/{generation}/{shard:03d}.json"
+
+def index_video(video_id, summary, transcript_text):
+    """Add a video's summary and transcript to the search index as a new segment.
+
+    A segment holds one document: term -> positions, plus the document length.
+    It is written once and never changed; newer segments for the same video
+    replace older ones. Merges run once enough segments have piled up.
+    """
+    postings = {}
+    tokens = tokenize(f"{summary}\n{transcript_text}")
+    for position, term in tokens:
+        postings.setdefault(term, []).append(position)
+    segment = {'video_id': video_id, 'length': len(tokens), 'postings': postings}
+    key = f"{SEARCH_PREFIX}segments/{time.time_ns():020d}-{video_id}.json"
+    get_client('s3').put_object(Bucket=SUMMARIES_BUCKET, Key=key, Body=json.dumps(segment), ContentType='application/json')
+    print(f"Indexed {video_id}: {len(postings)} terms in {key}")
+    
+    pending = count_search_segments(1)
+    if pending is not None and pending >= SEARCH_MERGE_SEGMENTS:
+        merge_search_index()
+
+def count_search_segments(delta):
+    """Add delta to the count of unmerged segments in search/pending.json, returning the new count.
+
+    index_video adds one per segment and a merge subtracts what it merged, so
+    deciding whether to merge costs two small requests instead of a listing.
+    The count is updated with conditional puts; when it cannot be settled after
+    SEARCH_COUNT_ATTEMPTS, None is returned and the scheduled merge catches up.
+    """
+    from botocore.exceptions import ClientError
+    s3 = get_client('s3')
+    key = f"{SEARCH_PREFIX}pending.json"
+    for _ in range(SEARCH_COUNT_ATTEMPTS):
+        try:
+            response = s3.get_object(Bucket=SUMMARIES_BUCKET, Key=key)
+            count = json.loads(response['Body'].read())['segments']
+            condition = {'IfMatch': response['ETag']}
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ['NoSuchKey', '404']:
+                raise
+            count, condition = 0, {'IfNoneMatch': '*'}
+        
+        count = max(0, count + delta)
+        try:
+            s3.put_object(
+                Bucket=SUMMARIES_BUCKET, Key=key, Body=json.dumps({'segments': count}),
+                ContentType='application/json', **condition
+            )
+            return count
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ['PreconditionFailed', 'ConditionalRequestConflict']:
+                raise
+    print("Could not update the unmerged search segment count")
+    return None
+
+def list_search_segments():
+    """Keys of the unmerged index segments, oldest first"""
+    keys = []
+    paginator = get_client('s3').get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=SUMMARIES_BUCKET, Prefix=f"{SEARCH_PREFIX}segments/"):
+        keys.extend(item['Key'] for item in page.get('Contents', []))
+    return sorted(keys)
+
+def load_search_manifest():
+    """Return the merged index manifest and its ETag, or an empty manifest and None"""
+    from botocore.exceptions import ClientError
+    try:
+        response = get_client('s3').get_object(Bucket=SUMMARIES_BUCKET, Key=f"{SEARCH_PREFIX}manifest.json")
+        return json.loads(response['Body'].read()), response['ETag']
+    except ClientError as e:
+        if e.response['Error']['Code'] in ['NoSuchKey', '404']:
+            return {'generation': None, 'previous_generation': None, 'shards': SEARCH_SHARDS, 'documents': {}}, None
+        raise
+
+def split_search_shard(shard, manifest):
+    """Return a merged shard's (postings, weights), each keyed by term and then video ID.
+
+    Generations merged before weights were stored hold the postings alone, and
+    get no weights, so their documents are scored at query time.
+    """
+    shard = shard or {}
+    if not manifest.get('weighted'):
+        return shard, {}
+    return shard['postings'], shard['weights']
+
+def search_term_weights(postings, documents):
+    """TF-IDF weight of every posting, tf / length * log(1 + N / df), as term -> {video_id: weight}.
+
+    Runs at merge time over one shard, whose terms hold every document they
+    occur in, so /search only adds the stored weights up. With NumPy installed
+    the whole shard is weighted in one vectorized pass.
+    """
+    import importlib.util
+    total = len(documents)
+    if not importlib.util.find_spec('numpy'):
+        return {
+            term: {
+                video_id: len(positions) / max(documents.get(video_id, 1), 1) * math.log(1 + total / len(term_postings))
+                for video_id, positions in term_postings.items()
+            }
+            for term, term_postings in postings.items()
+        }
+    
+    import numpy as np
+    terms = list(postings)
+    video_ids = [video_id for term in terms for video_id in postings[term]]
+    if not video_ids:
+        return {}
+    counts = np.fromiter(
+        (len(positions) for term in terms for positions in postings[term].values()), dtype=np.float64, count=len(video_ids)
+    )
+    lengths = np.fromiter((max(documents.get(video_id, 1), 1) for video_id in video_ids), dtype=np.float64, count=len(video_ids))
+    document_frequencies = np.fromiter((len(postings[term]) for term in terms), dtype=np.int64, count=len(terms))
+    idf = np.log1p(total / document_frequencies)
+    weights = (counts / lengths * np.repeat(idf, document_frequencies)).tolist()
+    
+    result = {}
+    offset = 0
+    for term, frequency in zip(terms, document_frequencies.tolist()):
+        result[term] = dict(zip(video_ids[offset:offset + frequency], weights[offset:offset + frequency]))
+        offset += frequency
+    return result
+
+def read_search_object(key):
+    """Read a JSON index object, returning None if a merge has already removed it"""
+    text = read_from_s3(SUMMARIES_BUCKET, key)
+    return json.loads(text) if text is not None else None
+
+def read_search_objects(keys):
+    """Read several index objects concurrently, preserving order"""
+    if not keys:
+        return []
+    with ThreadPoolExecutor(max_workers=min(len(keys), SEARCH_SHARDS)) as executor:
+        return list(executor.map(read_search_object, keys))
+
+def merge_search_index():
+    """Fold the unmerged segments into a new generation of shards, returning how many were merged.
+
+    Each shard stores the TF-IDF weight of every posting next to its positions
+    (see search_term_weights), computed against all documents of the generation.
+    The new shards are written under a fresh generation and the manifest is
+    switched to it with a conditional put, so readers always see a complete
+    generation and concurrent merges cannot both win. The previous generation
+    is kept for readers still using it; the one before is deleted.
+    """
+    from botocore.exceptions import ClientError
+    s3 = get_client('s3')
+    manifest, etag = load_search_manifest()
+    segment_keys = list_search_segments()
+    if not segment_keys:
+        return 0
+    
+    # Later segments for the same video replace earlier ones
+    segments = {}
+    for segment in read_search_objects(segment_keys):
+        if segment:
+            segments[segment['video_id']] = segment
+    
+    documents = dict(manifest['documents'])
+    shards = [{} for _ in range(SEARCH_SHARDS)]
+    if manifest['generation']:
+        old_shards = read_search_objects([search_shard_key(manifest['generation'], shard) for shard in range(manifest['shards'])])
+        for old_shard in old_shards:
+            for term, postings in split_search_shard(old_shard, manifest)[0].items():
+                kept = {video_id: positions for video_id, positions in postings.items() if video_id not in segments}
+                if kept:
+                    shards[search_shard(term, SEARCH_SHARDS)].setdefault(term, {}).update(kept)
+    for video_id, segment in segments.items():
+        documents[video_id] = segment['length']
+        for term, positions in segment['postings'].items():
+            shards[search_shard(term, SEARCH_SHARDS)].setdefault(term, {})[video_id] = positions
+    
+    generation = uuid.uuid4().hex
+    with ThreadPoolExecutor(max_workers=SEARCH_SHARDS) as executor:
+        list(executor.map(
+            lambda shard: s3.put_object(
+                Bucket=SUMMARIES_BUCKET, Key=search_shard_key(generation, shard),
+                Body=json.dumps(
+                    {'postings': shards[shard], 'weights': search_term_weights(shards[shard], documents)},
+                    separators=(',', ':')
+                ),
+                ContentType='application/json'
+            ),
+            range(SEARCH_SHARDS)
+        ))
+    new_manifest = {
+        'generation': generation,
+        'previous_generation': manifest['generation'],
+        'shards': SEARCH_SHARDS,
+        'weighted': True,
+        'documents': documents,
+        'merged_at': int(time.time())
+    }
+    condition = {'IfMatch': etag} if etag else {'IfNoneMatch': '*'}
+    try:
+        s3.put_object(
+            Bucket=SUMMARIES_BUCKET, Key=f"{SEARCH_PREFIX}manifest.json",
+            Body=json.dumps(new_manifest), ContentType='application/json', **condition
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] in ['PreconditionFailed', 'ConditionalRequestConflict']:
+            print("Another invocation merged the search index first")
+            delete_search_objects([search_shard_key(generation, shard) for shard in range(SEARCH_SHARDS)])
+            return 0
+        raise
+    
+    stale = segment_keys
+    if manifest.get('previous_generation'):
+        stale = stale + [search_shard_key(manifest['previous_generation'], shard) for shard in range(manifest['shards'])]
+    delete_search_objects(stale)
+    count_search_segments(-len(segment_keys))
+    print(f"Merged {len(segment_keys)} segments into search index generation {generation} ({len(documents)} videos)")
+    return len(segment_keys)
+
+def delete_search_objects(keys):
+    """Delete index objects in batches of up to 1000"""
+    for start in range(0, len(keys), 1000):
+        get_client('s3').delete_objects(
+            Bucket=SUMMARIES_BUCKET,
+            Delete={'Objects': [{'Key': key} for key in keys[start:start + 1000]], 'Quiet': True}
+        )
+
+def load_search_postings(terms):
+    """Gather the postings of the given terms from the merged shards and the unmerged segments.
 
-def lambda_handler(event, context):
+    Returns (postings as term -> {video_id: positions}, document lengths by video ID,
+    merge-time weights as term -> {video_id: weight} for the documents served
+    from shards). Segments are listed before the manifest is read, so a merge that finishes
+    in between leaves a document in both places rather than in neither; the
+    segment copy wins.
+    """
+    segment_keys = list_search_segments()
+    manifest, _ = load_search_manifest()
+    if manifest['generation'] != _search_cache['generation']:
+        _search_cache.update(generation=manifest['generation'], shards={})
+    live_segments = set(segment_keys)
+    for key in [key for key in _search_cache['segments'] if key not in live_segments]:
+        del _search_cache['segments'][key]
+    
+    shard_numbers = sorted({search_shard(term, manifest['shards']) for term in terms}) if manifest['generation'] else []
+    missing_shards = [shard for shard in shard_numbers if shard not in _search_cache['shards']]
+    missing_segments = [key for key in segment_keys if key not in _search_cache['segments']]
+    loaded = read_search_objects(
+        [search_shard_key(manifest['generation'], shard) for shard in missing_shards] + missing_segments
+    )
+    _search_cache['shards'].update(zip(missing_shards, [shard or {} for shard in loaded[:len(missing_shards)]]))
+    _search_cache['segments'].update(
+        (key, segment) for key, segment in zip(missing_segments, loaded[len(missing_shards):]) if segment
+    )
+    
+    documents = dict(manifest['documents'])
+    segments = {}
+    for key in segment_keys:
+        segment = _search_cache['segments'].get(key)
+        if segment:
+            segments[segment['video_id']] = segment
+            documents[segment['video_id']] = segment['length']
+    
+    postings = {}
+    weights = {}
+    for term in terms:
+        term_postings = {}
+        if manifest['generation']:
+            shard_postings, shard_weights = split_search_shard(
+                _search_cache['shards'][search_shard(term, manifest['shards'])], manifest
+            )
+            term_postings.update(
+                (video_id, positions) for video_id, positions in shard_postings.get(term, {}).items() if video_id not in segments
+            )
+            weights[term] = {
+                video_id: weight for video_id, weight in shard_weights.get(term, {}).items() if video_id not in segments
+            }
+        for video_id, segment in segments.items():
+            if term in segment['postings']:
+                term_postings[video_id] = segment['postings'][term]
+        postings[term] = term_postings
+    return postings, documents, weights
+
+def phrase_matches(phrase_tokens, postings):
+    """Video IDs containing the phrase, using the word positions of its terms"""
+    first_position, first_term = phrase_tokens[0]
+    matches = set(postings[first_term])
+    for position, term in phrase_tokens[1:]:
+        matches &= set(postings[term])
+    result = set()
+    for video_id in matches:
+        position_sets = {term: set(postings[term][video_id]) for _, term in phrase_tokens}
+        if any(
+            all(start + position - first_position in position_sets[term] for position, term in phrase_tokens[1:])
+            for start in postings[first_term][video_id]
+        ):
+            result.add(video_id)
+    return result
+
+def score_documents(terms, postings, documents, weights):
+    """TF-IDF score of every document containing a query term, as video ID -> score.
+
+    Documents in the merged shards add up the weights stored at merge time.
+    Only the few documents still in unmerged segments are weighted here, as
+    tf / document length * log(1 + N / df).
     """
-    Main Lambda handler for YouTube video summarization
+    total = len(documents)
+    scores = {}
+    for term in terms:
+        if not postings[term]:
+            continue
+        term_weights = weights.get(term, {})
+        idf = math.log(1 + total / len(postings[term]))
+        for video_id, positions in postings[term].items():
+            weight = term_weights.get(video_id)
+            if weight is None:
+                weight = len(positions) / max(documents.get(video_id, 1), 1) * idf
+            scores[video_id] = scores.get(video_id, 0.0) + weight
+    return scores
+
+def search_videos(query):
+    """Handle GET /search?q=...&limit=...
+
+    Quoted parts of q must appear as phrases. Results are ranked by TF-IDF
+    over the summary and transcript of each video.
     """
+    started = time.perf_counter()
+    text = (query.get('q') or '').strip()
     try:
-        # Parse request body
-        if isinstance(event.get('body'), str):
-            body = json.loads(event['body'])
-        else:
-            body = event.get('body', {})
-        
-        youtube_url = body.get('url')
-        email = body.get('email')
-        
-        if not youtube_url or not email:
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type',
-                    'Access-Control-Allow-Methods': 'POST, OPTIONS'
-                },
-                'body': json.dumps({'error': 'URL and email are required'})
-            }
-        
-        # Extract video ID from YouTube URL
-        video_id = extract_video_id(youtube_url)
-        if not video_id:
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': 'Invalid YouTube URL'})
-            }
-        
-        print(f"Processing video: {video_id}")
-        
-        # Step 1: Download video audio
-        audio_file_path = download_video_audio(youtube_url, video_id)
-        if not audio_file_path:
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': 'Failed to download video audio. YouTube may be blocking automated requests.'})
+        limit = min(max(int(query.get('limit') or 10), 1), SEARCH_MAX_RESULTS)
+    except ValueError:
+        return build_response(400, {'error': 'limit must be a number'})
+    tokens = tokenize(text)
+    if not tokens:
+        return build_response(400, {'error': 'q must contain at least one search term'})
+    
+    terms = sorted({term for _, term in tokens})
+    postings, documents, weights = load_search_postings(terms)
+    scores = score_documents(terms, postings, documents, weights)
+    for phrase in SEARCH_PHRASE_PATTERN.findall(text):
+        phrase_tokens = tokenize(phrase)
+        if len(phrase_tokens) > 1:
+            matching = phrase_matches(phrase_tokens, postings)
+            scores = {video_id: score for video_id, score in scores.items() if video_id in matching}
+    
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+    return build_response(200, {
+        'query': text,
+        'total': len(scores),
+        'results': [
+            {
+                'video_id': video_id,
+                'score': round(score, 6),
+                'matched_terms': [term for term in terms if video_id in postings[term]]
             }
-        
-        # Step 2: Upload audio to S3
-        audio_s3_key = f"audio/{video_id}_{uuid.uuid4().hex}.mp3"
-        upload_audio_to_s3(audio_file_path, audio_s3_key)
-        
-        # Step 3: Start transcription job
-        job_name = f"transcribe-{video_id}-{int(time.time())}"
-        start_transcription_job(job_name, audio_s3_key)
-        
-        # Step 4: Wait for transcription to complete
-        transcript_text = wait_for_transcription(job_name)
-        if not transcript_text:
+            for video_id, score in ranked
+        ],
+        'took_ms': round((time.perf_counter() - started) * 1000, 1)
+    })
+
+def select_audio_format(formats, containers=TRANSCRIBE_MEDIA_FORMATS):
+    """Pick the smallest audio-only format that is adequate for speech, in one of the given containers if any"""
+    candidates = [
+        fmt for fmt in formats
+        if fmt.get('vcodec') == 'none' and fmt.get('acodec') not in [None, 'none']
+        and (containers is None or fmt.get('ext') in containers)
+        and fmt.get('protocol') in ['https', 'http']
+        and fmt.get('abr')
+    ]
+    adequate = [fmt for fmt in candidates if fmt['abr'] >= MIN_SPEECH_ABR]
+    if adequate:
+        return min(adequate, key=lambda fmt: fmt['abr'])
+    # Nothing reaches the speech threshold, so take the best of what there is
+    return max(candidates, key=lambda fmt: fmt['abr'], default=None)
+
+def plan_audio_format(info, audio_profile):
+    """Decide which format to download and whether it needs re-encoding for Transcribe"""
+    if audio_profile == 'native' and info:
+        fmt = select_audio_format(info.get('formats') or [])
+        if fmt:
+            media_format, content_type = TRANSCRIBE_MEDIA_FORMATS[fmt['ext']]
+            print(f"Selected audio format {fmt['format_id']}: {fmt['ext']} {fmt.get('acodec')} {fmt['abr']}kbps")
             return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': 'Failed to transcribe audio'})
+                'format': fmt['format_id'],
+                'ext': fmt['ext'],
+                'media_format': media_format,
+                'content_type': content_type,
+                'transcode': False,
+                'abr': fmt['abr'],
+                'filesize': fmt.get('filesize') or fmt.get('filesize_approx')
             }
-        
-        # Step 5: Generate summary using Bedrock
-        summary = generate_summary_bedrock(transcript_text)
-        
-        # Step 6: Save transcript and summary to S3
-        transcript_key = f"transcripts/{video_id}_{int(time.time())}.txt"
-        summary_key = f"summaries/{video_id}_{int(time.time())}.txt"
-        
-        save_to_s3(TRANSCRIPTS_BUCKET, transcript_key, transcript_text)
-        save_to_s3(SUMMARIES_BUCKET, summary_key, summary)
-        
-        # Step 7: Clean up temporary files
-        cleanup_temp_files(audio_file_path)
-        cleanup_s3_audio(audio_s3_key)
-        
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({
-                'summary': summary,
-                'transcript': transcript_text[:1000] + '...' if len(transcript_text) > 1000 else transcript_text,
-                'video_id': video_id,
-                'transcript_key': transcript_key,
-                'summary_key': summary_key
-            })
-        }
-        
-    except Exception as e:
-        print(f"Error: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({'error': f'Internal server error: {str(e)}'})
-        }
+        print("No native audio format available, re-encoding to MP3")
+    if audio_profile in SPEECH_AUDIO_PLANS:
+        audio_plan = dict(SPEECH_AUDIO_PLANS[audio_profile])
+        # The audio is re-encoded anyway, so the smallest adequate source in any container will do
+        fmt = select_audio_format((info or {}).get('formats') or [], containers=None)
+        if fmt:
+            audio_plan['format'] = fmt['format_id']
+            audio_plan['source_filesize'] = fmt.get('filesize') or fmt.get('filesize_approx')
+            print(f"Re-encoding audio format {fmt['format_id']} ({fmt['ext']} {fmt['abr']}kbps) as {audio_profile}")
+        return audio_plan
+    return dict(MP3_AUDIO_PLAN)
 
-def extract_video_id(url):
-    """Extract video ID from YouTube URL"""
-    try:
-        parsed = urlparse(url)
-        if parsed.hostname in ['www.youtube.com', 'youtube.com']:
-            if parsed.path == '/watch':
-                return parse_qs(parsed.query).get('v', [None])[0]
-        elif parsed.hostname == 'youtu.be':
-            return parsed.path[1:]
-    except:
-        pass
-    return None
+def download_video_audio(url, video_id, audio_plan=MP3_AUDIO_PLAN):
+    """Download video audio using yt-dlp as Python library.
 
-def download_video_audio(url, video_id):
-    """Download video audio using yt-dlp as Python library"""
+    The audio is stream-copied in its original container unless the plan asks
+    for it to be re-encoded, in which case the downloaded source is encoded with
+    the plan's AUDIO_ENCODINGS options and then removed.
+    """
+    import yt_dlp
     try:
         temp_dir = tempfile.mkdtemp()
-        audio_file = os.path.join(temp_dir, f"{video_id}.mp3")
+        audio_file = os.path.join(temp_dir, f"{video_id}.{audio_plan['ext']}")
+        # Re-encoded audio is downloaded under another name so source and output never collide
+        download_name = f"{video_id}.source" if audio_plan['transcode'] else video_id
+        
+        base_opts = {
+            'format': audio_plan['format'],
+            'outtmpl': os.path.join(temp_dir, f"{download_name}.%(ext)s"),
+            'quiet': True,
+            'no_warnings': True,
+        }
 
         # Try multiple approaches to bypass YouTube detection
         ydl_opts_list = [
             # Approach 1: Minimal options
-            {
-                'format': 'bestaudio/best',
-                'outtmpl': audio_file,
-                'postprocessors': [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': '0',
-                }],
-                'quiet': True,
-                'no_warnings': True,
-            },
+            base_opts,
             # Approach 2: With headers
-            {
-                'format': 'bestaudio/best',
-                'outtmpl': audio_file,
-                'postprocessors': [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': '0',
-                }],
-                'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'referer': 'https://www.youtube.com/',
-                'quiet': True,
-                'no_warnings': True,
-            },
+            dict(
+                base_opts,
+                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+                referer='https://www.youtube.com/',
+            ),
             # Approach 3: With extractor args
-            {
-                'format': 'bestaudio/best',
-                'outtmpl': audio_file,
-                'postprocessors': [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': '0',
-                }],
-                'extractor_args': {
+            dict(
+                base_opts,
+                extractor_args={
                     'youtube': {
                         'skip': ['dash', 'hls'],
                         'player_skip': ['configs'],
                     }
                 },
-                'quiet': True,
-                'no_warnings': True,
-            }
+            ),
         ]
         
         # Try each approach until one works
@@ -207,6 +3224,11 @@ def download_video_audio(url, video_id):
                 with yt_dlp.YoutubeDL(ydl_opts) as ydl:
                     ydl.download([url])
                 
+                if audio_plan['transcode']:
+                    downloaded = [name for name in os.listdir(temp_dir) if name.startswith(f"{download_name}.")]
+                    if downloaded:
+                        encode_audio_file(os.path.join(temp_dir, downloaded[0]), audio_file, audio_plan)
+                
                 if os.path.exists(audio_file):
                     print(f"Success with approach {i+1}!")
                     success = True
@@ -231,111 +3253,829 @@ def download_video_audio(url, video_id):
         print(f"Download error: {str(e)}")
         return None
 
-def upload_audio_to_s3(audio_file_path, s3_key):
+def encode_audio_file(source_path, audio_file, audio_plan):
+    """Re-encode a downloaded file with the plan's ffmpeg options, removing the source"""
+    result = subprocess.run(
+        [FFMPEG_PATH, '-hide_banner', '-loglevel', 'error', '-y', '-i', source_path,
+         '-vn', *AUDIO_ENCODINGS[audio_plan['encoding']], audio_file],
+        capture_output=True, text=True
+    )
+    source_bytes = os.path.getsize(source_path)
+    os.remove(source_path)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg encode failed: {result.stderr[-2000:]}")
+    print(f"Encoded {audio_plan['encoding']}: {source_bytes} -> {os.path.getsize(audio_file)} bytes")
+
+def upload_audio_to_s3(audio_file_path, s3_key, content_type='audio/mpeg'):
     """Upload audio file to S3"""
     try:
-        s3_client.upload_file(audio_file_path, RAW_BUCKET, s3_key)
+        get_client('s3').upload_file(audio_file_path, RAW_BUCKET, s3_key, ExtraArgs={'ContentType': content_type})
         print(f"Audio uploaded to S3: s3://{RAW_BUCKET}/{s3_key}")
     except Exception as e:
         print(f"S3 upload error: {str(e)}")
         raise
 
-def start_transcription_job(job_name, audio_s3_key):
+def stream_audio_to_s3(url, s3_key, audio_plan=MP3_AUDIO_PLAN, upload_id=None, on_start=None):
+    """Stream audio from yt-dlp straight into an S3 multipart upload.
+
+    yt-dlp writes the media to stdout and parts are uploaded as they fill, so
+    download and upload overlap and nothing is written to /tmp. Formats that
+    need re-encoding are piped through ffmpeg (stdin to stdout) on the way.
+    upload_id and on_start are passed to upload_stream_to_s3.
+    Returns the number of bytes uploaded, or None on failure.
+    """
+    processes = []
+    try:
+        # The yt-dlp layer is on sys.path but not necessarily on the child's PYTHONPATH
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        downloader = subprocess.Popen(
+            [sys.executable, '-m', 'yt_dlp', '--quiet', '--no-warnings',
+             '--format', audio_plan['format'], '--output', '-', url],
+            stdout=subprocess.PIPE, stderr=tempfile.TemporaryFile(), env=env
+        )
+        processes.append(('yt-dlp', downloader))
+        audio_stream = downloader.stdout
+        
+        if audio_plan['transcode']:
+            encoder = subprocess.Popen(
+                [FFMPEG_PATH, '-hide_banner', '-loglevel', 'error', '-i', 'pipe:0',
+                 '-vn', *AUDIO_ENCODINGS[audio_plan['encoding']], 'pipe:1'],
+                stdin=downloader.stdout, stdout=subprocess.PIPE, stderr=tempfile.TemporaryFile()
+            )
+            processes.append(('ffmpeg', encoder))
+            # Let ffmpeg own the read end so yt-dlp sees SIGPIPE if ffmpeg exits early
+            downloader.stdout.close()
+            audio_stream = encoder.stdout
+        
+        uploaded_bytes = upload_stream_to_s3(audio_stream, RAW_BUCKET, s3_key, audio_plan['content_type'], upload_id, on_start)
+        
+        failed = False
+        for name, process in processes:
+            if process.wait() != 0:
+                process.stderr.seek(0)
+                print(f"{name} error: {process.stderr.read().decode(errors='replace')[-2000:]}")
+                failed = True
+        if failed:
+            cleanup_s3_audio(s3_key)
+            return None
+        
+        print(f"Audio streamed to S3: s3://{RAW_BUCKET}/{s3_key} ({uploaded_bytes} bytes)")
+        return uploaded_bytes
+    
+    except Exception as e:
+        print(f"Streaming upload error: {str(e)}")
+        for name, process in processes:
+            if process.poll() is None:
+                process.kill()
+        return None
+
+def read_exactly(stream, size):
+    """Read up to size bytes from a pipe, blocking until the buffer is full or EOF"""
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        chunk = stream.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+def upload_stream_to_s3(stream, bucket, key, content_type, upload_id=None, on_start=None):
+    """Upload a byte stream to S3 as a multipart upload, returning the number of bytes uploaded.
+
+    Parts are uploaded by a small thread pool while the next part is read, with at
+    most MULTIPART_MAX_IN_FLIGHT parts held in memory. The upload is aborted on error.
+    
+    Given the upload_id of an unfinished upload of the same stream, parts already
+    in S3 whose ETag matches the MD5 of the bytes read are kept instead of being
+    uploaded again. on_start is called with the ID of a newly created upload.
+    """
+    uploaded = list_uploaded_parts(bucket, key, upload_id) if upload_id else None
+    if uploaded is None:
+        upload_id = get_client('s3').create_multipart_upload(
+            Bucket=bucket,
+            Key=key,
+            ContentType=content_type
+        )['UploadId']
+        uploaded = {}
+        if on_start:
+            on_start(upload_id)
+    else:
+        print(f"Resuming multipart upload of {key} with {len(uploaded)} parts in S3")
+    
+    def upload_part(part_number, data):
+        etag = uploaded.get(part_number)
+        if etag and etag.strip('"') == hashlib.md5(data).hexdigest():
+            return {'ETag': etag, 'PartNumber': part_number}
+        response = get_client('s3').upload_part(
+            Bucket=bucket,
+            Key=key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=data
+        )
+        return {'ETag': response['ETag'], 'PartNumber': part_number}
+    
+    try:
+        total_bytes = 0
+        futures = []
+        with ThreadPoolExecutor(max_workers=MULTIPART_MAX_IN_FLIGHT) as executor:
+            while True:
+                data = read_exactly(stream, MULTIPART_PART_SIZE)
+                if not data:
+                    break
+                # Wait for the oldest part before buffering another one
+                if len(futures) - sum(f.done() for f in futures) >= MULTIPART_MAX_IN_FLIGHT:
+                    next(f for f in futures if not f.done()).result()
+                futures.append(executor.submit(upload_part, len(futures) + 1, data))
+                total_bytes += len(data)
+            parts = [future.result() for future in futures]
+        
+        if not parts:
+            raise ValueError('Audio stream was empty')
+        
+        get_client('s3').complete_multipart_upload(
+            Bucket=bucket,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': parts}
+        )
+        return total_bytes
+    
+    except Exception:
+        get_client('s3').abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        raise
+
+def raw_audio_exists(audio_s3_key):
+    """Whether uploaded audio is still in RAW_BUCKET"""
+    from botocore.exceptions import ClientError
+    try:
+        get_client('s3').head_object(Bucket=RAW_BUCKET, Key=audio_s3_key)
+        return True
+    except ClientError:
+        # Without ListBucket on RAW_BUCKET a missing key is reported as 403
+        return False
+
+def list_uploaded_parts(bucket, key, upload_id):
+    """Return {part number: ETag} of an unfinished multipart upload, or None if it cannot be resumed.
+
+    Any ListParts error, not only NoSuchUpload, means the upload is started over:
+    the abandoned upload is left to the raw bucket's lifecycle rule.
+    """
+    from botocore.exceptions import ClientError
+    parts = {}
+    marker = 0
+    try:
+        while True:
+            response = get_client('s3').list_parts(Bucket=bucket, Key=key, UploadId=upload_id, PartNumberMarker=marker)
+            parts.update((part['PartNumber'], part['ETag']) for part in response.get('Parts', []))
+            if not response.get('IsTruncated'):
+                return parts
+            marker = response['NextPartNumberMarker']
+    except ClientError as e:
+        print(f"Cannot resume multipart upload of {key} ({e.response['Error']['Code']}), starting over")
+        return None
+
+def presign_raw_audio(audio_s3_key):
+    """Presigned GET URL for uploaded audio, so ffmpeg can read it over HTTP (streamed uploads included)"""
+    return get_client('s3').generate_presigned_url(
+        'get_object', Params={'Bucket': RAW_BUCKET, 'Key': audio_s3_key}, ExpiresIn=3600
+    )
+
+def detect_silences_energy(source):
+    """Find non-speech stretches from the frame energy of the decoded audio, returning (silences, duration).
+
+    ffmpeg decodes to 16 kHz mono PCM, which is read a minute at a time and
+    reduced to one energy value per VAD_FRAME_SECONDS frame with NumPy.
+    Runs of frames below VAD_NOISE_DB dBFS lasting at least VAD_MIN_SILENCE
+    seconds are returned as (start, end) pairs in seconds.
+    """
+    import numpy as np
+
+    frame_size = int(VAD_SAMPLE_RATE * VAD_FRAME_SECONDS)
+    decoder = subprocess.Popen(
+        [FFMPEG_PATH, '-hide_banner', '-loglevel', 'error', '-i', source,
+         '-vn', '-ac', '1', '-ar', str(VAD_SAMPLE_RATE), '-f', 's16le', 'pipe:1'],
+        stdout=subprocess.PIPE, stderr=tempfile.TemporaryFile()
+    )
+    energies = []
+    try:
+        while True:
+            data = read_exactly(decoder.stdout, frame_size * 2 * 2000)
+            whole_frames = len(data) // (frame_size * 2)
+            if not whole_frames:
+                break
+            samples = np.frombuffer(data, dtype='<i2', count=whole_frames * frame_size).astype(np.float32) / 32768
+            power = np.mean(samples.reshape(whole_frames, frame_size) ** 2, axis=1)
+            energies.append(10 * np.log10(power + 1e-10))
+    finally:
+        decoder.stdout.close()
+        if decoder.wait() != 0:
+            decoder.stderr.seek(0)
+            raise RuntimeError(f"ffmpeg decode failed: {decoder.stderr.read().decode(errors='replace')[-2000:]}")
+
+    energy = np.concatenate(energies) if energies else np.zeros(0, dtype=np.float32)
+    silent = np.concatenate([[False], energy < VAD_NOISE_DB, [False]])
+    edges = np.flatnonzero(np.diff(silent.astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]
+    long_enough = (ends - starts) * VAD_FRAME_SECONDS >= VAD_MIN_SILENCE
+    silences = [
+        (float(start) * VAD_FRAME_SECONDS, float(end) * VAD_FRAME_SECONDS)
+        for start, end in zip(starts[long_enough], ends[long_enough])
+    ]
+    return silences, len(energy) * VAD_FRAME_SECONDS
+
+def detect_silences_ffmpeg(source, duration):
+    """Find non-speech stretches with ffmpeg silencedetect, returning (start, end) pairs in seconds"""
+    result = subprocess.run(
+        [FFMPEG_PATH, '-hide_banner', '-nostats', '-i', source, '-vn',
+         '-af', f'silencedetect=noise={VAD_NOISE_DB}dB:d={VAD_MIN_SILENCE}', '-f', 'null', '-'],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg silencedetect failed: {result.stderr[-2000:]}")
+
+    silences = []
+    silence_start = None
+    for kind, value in SILENCE_PATTERN.findall(result.stderr):
+        if kind == 'start':
+            silence_start = max(0.0, float(value))
+        elif silence_start is not None:
+            silences.append((silence_start, float(value)))
+            silence_start = None
+    # Silence running to the end of the file has no silence_end line
+    if silence_start is not None and duration - silence_start >= VAD_MIN_SILENCE:
+        silences.append((silence_start, float(duration)))
+    return silences
+
+def audio_fingerprint(source):
+    """Compute the landmark hashes of the first FINGERPRINT_SECONDS of the audio at source (a local path or URL).
+
+    ffmpeg decodes to 8 kHz mono PCM and NumPy takes a Hann-windowed spectrogram.
+    In each frame, the strongest bin of every FINGERPRINT_PEAK_BANDS range is a
+    peak when it stands well clear of the rest of its range. Each peak is paired
+    with the next FINGERPRINT_FAN_OUT peaks up to FINGERPRINT_MAX_DELTA frames
+    later, and a pair is packed into one (f1, f2, dt) hash, which depends neither
+    on where the recording starts nor on its volume or encoding. Returns the
+    sorted unique hashes as a uint64 array.
+    """
+    import numpy as np
+
+    result = subprocess.run(
+        [FFMPEG_PATH, '-hide_banner', '-loglevel', 'error', '-t', str(FINGERPRINT_SECONDS), '-i', source,
+         '-vn', '-ac', '1', '-ar', str(FINGERPRINT_SAMPLE_RATE), '-f', 's16le', 'pipe:1'],
+        capture_output=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg decode failed: {result.stderr.decode(errors='replace')[-2000:]}")
+    samples = np.frombuffer(result.stdout, dtype='<i2', count=len(result.stdout) // 2).astype(np.float32) / 32768
+    if len(samples) < FINGERPRINT_WINDOW * 2:
+        return np.zeros(0, dtype=np.uint64)
+    
+    frames = np.lib.stride_tricks.sliding_window_view(samples, FINGERPRINT_WINDOW)[::FINGERPRINT_HOP]
+    spectrum = np.log(np.abs(np.fft.rfft(frames * np.hanning(FINGERPRINT_WINDOW), axis=1)) + 1e-6)
+    rows = np.arange(len(frames))
+    peak_times, peak_bins = [], []
+    for low, high in FINGERPRINT_PEAK_BANDS:
+        band = spectrum[:, low:high]
+        strongest = band.argmax(axis=1)
+        level = band[rows, strongest]
+        # At least ~17 dB above the range's mean and clear of the noise floor
+        keep = np.flatnonzero((level - band.mean(axis=1) > 2.0) & (level > -1.0))
+        peak_times.append(keep)
+        peak_bins.append(strongest[keep] + low)
+    times = np.concatenate(peak_times)
+    bins = np.concatenate(peak_bins)
+    order = np.lexsort((bins, times))
+    times, bins = times[order].astype(np.uint64), bins[order].astype(np.uint64)
+    
+    hashes = []
+    for step in range(1, FINGERPRINT_FAN_OUT + 1):
+        delta = times[step:] - times[:-step]
+        paired = (delta > 0) & (delta <= FINGERPRINT_MAX_DELTA)
+        hashes.append((bins[:-step][paired] << 15) | (bins[step:][paired] << 6) | delta[paired])
+    return np.unique(np.concatenate(hashes)) if hashes else np.zeros(0, dtype=np.uint64)
+
+def minhash_signature(hashes):
+    """Reduce a set of fingerprint hashes to FINGERPRINT_PERMUTATIONS MinHash values.
+
+    Each value is the minimum of (a * hash + b) mod MINHASH_PRIME over the set,
+    with a and b fixed per permutation, so the fraction of values two signatures
+    share estimates the Jaccard similarity of their hash sets.
+    """
+    import numpy as np
+
+    seeds = [hashlib.md5(f"minhash-{index}".encode()).digest() for index in range(FINGERPRINT_PERMUTATIONS)]
+    a = np.array([int.from_bytes(seed[:8], 'little') % (MINHASH_PRIME - 1) + 1 for seed in seeds], dtype=np.uint64)
+    b = np.array([int.from_bytes(seed[8:], 'little') % MINHASH_PRIME for seed in seeds], dtype=np.uint64)
+    signature = np.full(FINGERPRINT_PERMUTATIONS, MINHASH_PRIME, dtype=np.uint64)
+    # Hashes are below 2**24 and a below 2**31, so the products fit in uint64
+    for start in range(0, len(hashes), 16384):
+        chunk = hashes[start:start + 16384]
+        permuted = (a[:, None] * chunk[None, :] + b[:, None]) % np.uint64(MINHASH_PRIME)
+        signature = np.minimum(signature, permuted.min(axis=1))
+    return [int(value) for value in signature]
+
+def cut_speech_intervals(source, intervals, audio_plan, s3_key=None):
+    """Encode only the given (start, end) intervals of the source audio with the audio plan's encoding.
+
+    With s3_key the output is piped into a multipart upload to RAW_BUCKET and
+    the number of bytes uploaded is returned. Otherwise it is written to a file
+    in a new temporary directory, whose path is returned.
+    """
+    temp_dir = tempfile.mkdtemp()
+    # The select expression grows with the number of intervals, so pass it as a filter script
+    filter_path = os.path.join(temp_dir, 'filter.txt')
+    with open(filter_path, 'w') as f:
+        selected = '+'.join(f'between(t,{start:.3f},{end:.3f})' for start, end in intervals)
+        f.write(f"aselect='{selected}',asetpts=N/SR/TB")
+    command = [FFMPEG_PATH, '-hide_banner', '-loglevel', 'error', '-i', source, '-vn',
+               '-filter_script:a', filter_path, *AUDIO_ENCODINGS[audio_plan['encoding']]]
+    
+    if s3_key:
+        try:
+            encoder = subprocess.Popen([*command, 'pipe:1'], stdout=subprocess.PIPE, stderr=tempfile.TemporaryFile())
+            try:
+                uploaded_bytes = upload_stream_to_s3(encoder.stdout, RAW_BUCKET, s3_key, audio_plan['content_type'])
+            except Exception:
+                encoder.kill()
+                raise
+            if encoder.wait() != 0:
+                encoder.stderr.seek(0)
+                cleanup_s3_audio(s3_key)
+                raise RuntimeError(f"ffmpeg trim failed: {encoder.stderr.read().decode(errors='replace')[-2000:]}")
+        finally:
+            cleanup_temp_files(filter_path)
+        print(f"Trimmed audio streamed to S3: s3://{RAW_BUCKET}/{s3_key} ({uploaded_bytes} bytes)")
+        return uploaded_bytes
+    
+    trimmed_path = os.path.join(temp_dir, f"trimmed.{audio_plan['ext']}")
+    result = subprocess.run([*command, trimmed_path], capture_output=True, text=True)
+    os.remove(filter_path)
+    if result.returncode != 0 or not os.path.exists(trimmed_path):
+        cleanup_temp_files(trimmed_path)
+        raise RuntimeError(f"ffmpeg trim failed: {result.stderr[-2000:]}")
+    return trimmed_path
+
+def find_silence_near(source_url, time_point):
+    """Return the middle of the silence closest to time_point (seconds), or None if there is none nearby.
+
+    Only the SILENCE_SEARCH_WINDOW seconds either side of time_point are decoded.
+    """
+    window_start = max(0.0, time_point - SILENCE_SEARCH_WINDOW)
+    try:
+        result = subprocess.run(
+            [FFMPEG_PATH, '-hide_banner', '-nostats', '-ss', f'{window_start:.3f}', '-t', str(2 * SILENCE_SEARCH_WINDOW),
+             '-i', source_url, '-vn', '-af', SILENCE_DETECT_FILTER, '-f', 'null', '-'],
+            capture_output=True, text=True, timeout=120
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"Silence detection error: {str(e)}")
+        return None
+    
+    # Input seeking restarts timestamps at zero, so times are relative to window_start
+    silences = []
+    silence_start = None
+    for kind, value in SILENCE_PATTERN.findall(result.stderr):
+        if kind == 'start':
+            silence_start = float(value)
+        elif silence_start is not None:
+            silences.append(window_start + (max(0.0, silence_start) + float(value)) / 2)
+            silence_start = None
+    return min(silences, key=lambda silence: abs(silence - time_point), default=None)
+
+def cut_audio_segment_to_s3(source_url, segment, audio_plan):
+    """Cut one segment out of the source audio with ffmpeg (stream copy) and upload it to RAW_BUCKET"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        segment_path = os.path.join(temp_dir, f"segment_{segment['index']}.{audio_plan['ext']}")
+        result = subprocess.run(
+            [FFMPEG_PATH, '-hide_banner', '-loglevel', 'error', '-ss', f"{segment['start']:.3f}",
+             '-i', source_url, '-t', f"{segment['end'] - segment['start']:.3f}",
+             '-vn', '-c', 'copy', segment_path],
+            capture_output=True, text=True
+        )
+        if result.returncode != 0 or not os.path.exists(segment_path):
+            print(f"ffmpeg error: {result.stderr[-2000:]}")
+            raise PipelineError('Failed to split audio for transcription')
+        upload_audio_to_s3(segment_path, segment['audio_s3_key'], audio_plan['content_type'])
+
+def start_transcription_job(job_name, audio_s3_key, media_format='mp3'):
     """Start AWS Transcribe job"""
     try:
-        transcribe_client.start_transcription_job(
+        get_client('transcribe').start_transcription_job(
             TranscriptionJobName=job_name,
             Media={'MediaFileUri': f's3://{RAW_BUCKET}/{audio_s3_key}'},
-            MediaFormat='mp3',
+            MediaFormat=media_format,
             LanguageCode='en-US',
             OutputBucketName=TRANSCRIPTS_BUCKET,
-            OutputKey=f'transcribe-output/{job_name}.json'
+            OutputKey=f'{TRANSCRIBE_OUTPUT_PREFIX}{job_name}.json'
         )
         print(f"Transcription job started: {job_name}")
     except Exception as e:
         print(f"Transcription start error: {str(e)}")
         raise
 
-def wait_for_transcription(job_name, max_wait=300):
-    """Wait for transcription to complete and return transcript text"""
-    try:
-        start_time = time.time()
+def get_transcription_status(job_name):
+    """Return the TranscriptionJob description for a Transcribe job"""
+    response = get_client('transcribe').get_transcription_job(
+        TranscriptionJobName=job_name
+    )
+    return response['TranscriptionJob']
+
+def transcribe_output_key(status):
+    """S3 key of a completed Transcribe job's output in TRANSCRIPTS_BUCKET"""
+    transcript_uri = status['Transcript']['TranscriptFileUri']
+    return f"{TRANSCRIBE_OUTPUT_PREFIX}{transcript_uri.split('/')[-1]}"
+
+def load_transcribe_output(output_key):
+    """Download and parse a Transcribe output JSON document"""
+    transcript_obj = get_client('s3').get_object(
+        Bucket=TRANSCRIPTS_BUCKET,
+        Key=output_key
+    )
+    return json.loads(transcript_obj['Body'].read())
+
+def wait_for_transcription_job(job_name, max_wait=300):
+    """Poll with adaptive backoff until a Transcribe job finishes, returning its final description.
+
+    Returns None on timeout.
+    """
+    start_time = time.time()
+    delay = POLL_INITIAL_DELAY
+    
+    while time.time() - start_time < max_wait:
+        status = get_transcription_status(job_name)
         
-        while time.time() - start_time < max_wait:
-            response = transcribe_client.get_transcription_job(
-                TranscriptionJobName=job_name
-            )
-            
-            status = response['TranscriptionJob']['TranscriptionJobStatus']
-            
-            if status == 'COMPLETED':
-                # Get transcript from S3
-                transcript_uri = response['TranscriptionJob']['Transcript']['TranscriptFileUri']
-                transcript_key = transcript_uri.split('/')[-1]
-                
-                # Download and parse transcript
-                transcript_obj = s3_client.get_object(
-                    Bucket=TRANSCRIPTS_BUCKET,
-                    Key=f'transcribe-output/{transcript_key}'
-                )
-                
-                transcript_data = json.loads(transcript_obj['Body'].read())
-                transcript_text = transcript_data['results']['transcripts'][0]['transcript']
-                
-                print(f"Transcription completed: {len(transcript_text)} characters")
-                return transcript_text
-                
-            elif status == 'FAILED':
-                print(f"Transcription failed: {response['TranscriptionJob'].get('FailureReason', 'Unknown error')}")
-                return None
+        if status['TranscriptionJobStatus'] == 'COMPLETED':
+            return status
             
-            time.sleep(10)  # Wait 10 seconds before checking again
-        
-        print("Transcription timeout")
-        return None
+        elif status['TranscriptionJobStatus'] == 'FAILED':
+            print(f"Transcription failed: {status.get('FailureReason', 'Unknown error')}")
+            return status
         
-    except Exception as e:
-        print(f"Transcription wait error: {str(e)}")
-        return None
-
-def generate_summary_bedrock(transcript):
-    """Generate summary using AWS Bedrock"""
-    try:
-        prompt = f"""Please provide a comprehensive summary of this video transcript in 2-3 paragraphs, focusing on the main points, key insights, and important takeaways:
+        remaining = max_wait - (time.time() - start_time)
+        time.sleep(max(0, min(delay, remaining)))
+        delay = min(delay * POLL_BACKOFF, POLL_MAX_DELAY)
+    
+    print(f"Transcription timeout: {job_name}")
+    return None
 
-{transcript[:4000]}
+def transcript_from_transcribe_output(transcribe_output):
+    """Convert a Transcribe output document into a backend transcript (see TranscriptionBackend)"""
+    return {
+        'text': transcribe_output['results']['transcripts'][0]['transcript'],
+        'words': transcribe_words(transcribe_output)
+    }
 
-Summary:"""
+def transcribe_words(transcribe_output):
+    """Return the words of a Transcribe output with their times in seconds.
 
-        body = json.dumps({
-            "prompt": prompt,
-            "max_tokens_to_sample": 1000,
-            "temperature": 0.7,
-            "top_p": 1,
-            "stop_sequences": ["\n\nHuman:"]
+    Punctuation is attached to the preceding word, as in Transcribe's own transcript text.
+    """
+    words = []
+    for item in transcribe_output['results'].get('items', []):
+        alternative = item['alternatives'][0]
+        if item['type'] == 'punctuation':
+            if words:
+                words[-1]['text'] += alternative['content']
+            continue
+        words.append({
+            'start': round(float(item['start_time']), 3),
+            'end': round(float(item['end_time']), 3),
+            'text': alternative['content'],
+            'confidence': float(alternative.get('confidence') or 0)
         })
-        
-        response = bedrock_client.invoke_model(
-            modelId=BEDROCK_MODEL,
+    return words
+
+def offset_words(words, offset):
+    """Shift word times by offset seconds"""
+    return [
+        dict(word, start=round(word['start'] + offset, 3), end=round(word['end'] + offset, 3))
+        for word in words
+    ]
+
+def speech_intervals(silences, duration, cuts=()):
+    """Return the (start, end) intervals to keep: everything except the silences and cuts.
+
+    Silences keep VAD_PADDING of audio on each side next to speech; cuts
+    (sponsor segments) are removed exactly as given.
+    """
+    spans = [
+        (start + VAD_PADDING if start > 0 else 0.0, end - VAD_PADDING if end < duration else duration)
+        for start, end in silences
+    ]
+    spans += [(max(0.0, start), min(end, duration)) for start, end in cuts]
+    intervals = []
+    position = 0.0
+    for cut_start, cut_end in sorted(spans):
+        if cut_end <= cut_start:
+            continue
+        if cut_start > position:
+            intervals.append((position, cut_start))
+        position = max(position, cut_end)
+    if position < duration:
+        intervals.append((position, duration))
+    return intervals
+
+def build_offset_map(intervals):
+    """Map each kept interval's start in the trimmed audio to its start in the original: [[trimmed, original], ...]"""
+    offset_map = []
+    trimmed_position = 0.0
+    for start, end in intervals:
+        offset_map.append([round(trimmed_position, 3), round(start, 3)])
+        trimmed_position += end - start
+    return offset_map
+
+def remap_words(words, offset_map):
+    """Convert word times in trimmed audio back to original video time using the offset map"""
+    if not offset_map:
+        return words
+    trimmed_starts = [trimmed for trimmed, _ in offset_map]
+
+    def to_original(seconds):
+        trimmed, original = offset_map[max(0, bisect_right(trimmed_starts, seconds) - 1)]
+        return round(original + seconds - trimmed, 3)
+
+    return [dict(word, start=to_original(word['start']), end=to_original(word['end'])) for word in words]
+
+def normalize_word(text):
+    """Lowercase a word and strip punctuation for comparing transcripts"""
+    return re.sub(r"[^\w']", '', text.lower())
+
+def stitch_words(previous, following, overlap_start, overlap_end):
+    """Join two word lists whose audio overlaps between overlap_start and overlap_end.
+
+    Both transcripts contain the words spoken in the overlap. The longest run of
+    words they agree on is found, and the join is made in the middle of that run
+    so each side keeps the words furthest from its own segment edge. Without a
+    reliable match the overlap is split at its midpoint by word start time.
+    """
+    if not previous or not following:
+        return previous + following
+
+    tail_start = next((i for i, word in enumerate(previous) if word['end'] > overlap_start), len(previous))
+    head_end = next((i for i, word in enumerate(following) if word['start'] >= overlap_end), len(following))
+    tail = [normalize_word(word['text']) for word in previous[tail_start:]]
+    head = [normalize_word(word['text']) for word in following[:head_end]]
+    match = SequenceMatcher(None, tail, head, autojunk=False).find_longest_match(0, len(tail), 0, len(head))
+    if match.size >= MIN_STITCH_MATCH:
+        middle = match.size // 2
+        return previous[:tail_start + match.a + middle] + following[match.b + middle:]
+
+    midpoint = (overlap_start + overlap_end) / 2
+    return (
+        [word for word in previous if word['start'] < midpoint]
+        + [word for word in following if word['start'] >= midpoint]
+    )
+
+def estimate_tokens(text):
+    """Rough token count for English text (about four characters per token)"""
+    return len(text) // 4 + 1
+
+def split_transcript(text, max_tokens=CHUNK_TOKEN_BUDGET):
+    """Split text into chunks of at most max_tokens, breaking on sentence boundaries.
+
+    Sentences longer than the budget (e.g. unpunctuated captions) are split on words.
+    """
+    pieces = []
+    for sentence in SENTENCE_BOUNDARY_PATTERN.split(text.strip()):
+        if estimate_tokens(sentence) <= max_tokens:
+            pieces.append(sentence)
+            continue
+        words = []
+        for word in sentence.split():
+            if words and estimate_tokens(' '.join(words + [word])) > max_tokens:
+                pieces.append(' '.join(words))
+                words = []
+            words.append(word)
+        if words:
+            pieces.append(' '.join(words))
+    
+    chunks = []
+    current = []
+    current_tokens = 0
+    for piece in pieces:
+        piece_tokens = estimate_tokens(piece)
+        if current and current_tokens + piece_tokens > max_tokens:
+            chunks.append(' '.join(current))
+            current = []
+            current_tokens = 0
+        current.append(piece)
+        current_tokens += piece_tokens
+    if current:
+        chunks.append(' '.join(current))
+    return chunks
+
+def invoke_bedrock(prompt, max_tokens=1000, model_id=None):
+    """Run a single Bedrock completion (with BEDROCK_MODEL unless model_id is given) and return its text"""
+    body = json.dumps({
+        "prompt": prompt,
+        "max_tokens_to_sample": max_tokens,
+        "temperature": 0.7,
+        "top_p": 1,
+        "stop_sequences": ["\n\nHuman:"]
+    })
+    
+    with BEDROCK_SLOTS.hold():
+        response = get_client('bedrock-runtime').invoke_model(
+            modelId=model_id or BEDROCK_MODEL,
             body=body,
             contentType='application/json'
         )
-        
         response_body = json.loads(response['body'].read())
-        summary = response_body['completion'].strip()
-        
-        print(f"Summary generated: {len(summary)} characters")
+    return response_body['completion'].strip()
+
+def invoke_bedrock_stream(prompt, on_text, max_tokens=1000):
+    """Run a Bedrock completion with response streaming, passing each text delta
+    to on_text as it arrives, and return the complete text"""
+    body = json.dumps({
+        "prompt": prompt,
+        "max_tokens_to_sample": max_tokens,
+        "temperature": 0.7,
+        "top_p": 1,
+        "stop_sequences": ["\n\nHuman:"]
+    })
+    
+    parts = []
+    with BEDROCK_SLOTS.hold():
+        response = get_client('bedrock-runtime').invoke_model_with_response_stream(
+            modelId=BEDROCK_MODEL,
+            body=body,
+            contentType='application/json'
+        )
+        for event in response['body']:
+            if 'chunk' not in event:
+                continue
+            text = json.loads(event['chunk']['bytes']).get('completion', '')
+            if text:
+                parts.append(text)
+                on_text(text)
+    return ''.join(parts).strip()
+
+def summarize_chunk(chunk, index, total):
+    """Map step: summarize one part of a long transcript"""
+    prompt = f"""This is part {index + 1} of {total} of a video transcript. Summarize this part in one paragraph, keeping every main point, key insight and important takeaway:
+
+{chunk}
+
+Summary:"""
+    return invoke_bedrock(prompt, max_tokens=500)
+
+def combine_summaries(summaries):
+    """Reduce step: merge consecutive partial summaries into one"""
+    joined = '\n\n'.join(summaries)
+    prompt = f"""These are summaries of consecutive parts of a video transcript. Combine them into a single summary in one or two paragraphs, keeping every main point, key insight and important takeaway:
+
+{joined}
+
+Summary:"""
+    return invoke_bedrock(prompt, max_tokens=700)
+
+def group_summaries(summaries, max_tokens=CHUNK_TOKEN_BUDGET):
+    """Group consecutive summaries so each group fits in one reduce prompt.
+
+    Every group holds at least two summaries so each reduce level shrinks the list.
+    """
+    groups = []
+    current = []
+    current_tokens = 0
+    for summary in summaries:
+        summary_tokens = estimate_tokens(summary)
+        if len(current) >= 2 and current_tokens + summary_tokens > max_tokens:
+            groups.append(current)
+            current = []
+            current_tokens = 0
+        current.append(summary)
+        current_tokens += summary_tokens
+    if current:
+        groups.append(current)
+    return groups
+
+def summarize_chapter(chapter):
+    """Map step for chapters: summarize one chapter, condensing it first if it is too long for one prompt"""
+    prompt = f"""This is the chapter "{chapter['title']}" of a video transcript. Summarize it in one paragraph, keeping its main points, key insights and important takeaways:
+
+{condense_transcript(chapter['text'])}
+
+Summary:"""
+    return invoke_bedrock(prompt, max_tokens=500, model_id=CHAPTER_SUMMARY_MODEL)
+
+def split_into_chapters(timed_text, chapters):
+    """Group timed words or cues into the chapters their start time falls in, dropping empty chapters"""
+    chapter_starts = [chapter['start'] for chapter in chapters]
+    texts = [[] for _ in chapters]
+    for item in timed_text:
+        texts[max(0, bisect_right(chapter_starts, item['start']) - 1)].append(item['text'])
+    return [dict(chapter, text=' '.join(text)) for chapter, text in zip(chapters, texts) if text]
+
+def load_summary_checkpoint(video_id):
+    """Load the chunk, reduce and chapter summaries checkpointed for a video, for summarize_in_parallel"""
+    stage = load_checkpoint(video_id).get('partials') or {}
+    return {'video_id': video_id, 'summaries': dict(stage.get('summaries') or {})}
+
+def summarize_in_parallel(function, items, summary_checkpoint=None):
+    """Apply a Bedrock call to each item on a bounded thread pool, preserving order.
+
+    With summary_checkpoint (see load_summary_checkpoint), results checkpointed by an earlier
+    attempt are reused and new ones are checkpointed as they complete, so a
+    retry after throttling only repeats the calls that had not finished.
+    """
+    if summary_checkpoint is None:
+        with ThreadPoolExecutor(max_workers=SUMMARY_WORKERS) as executor:
+            return list(executor.map(function, items))
+    
+    def checkpointed(item):
+        key = hashlib.md5(json.dumps(
+            [function.__qualname__, BEDROCK_MODEL, CHAPTER_SUMMARY_MODEL, PROMPT_VERSION, item]
+        ).encode()).hexdigest()
+        summary = summary_checkpoint['summaries'].get(key)
+        if summary is None:
+            summary = function(item)
+            with _checkpoint_lock:
+                summary_checkpoint['summaries'][key] = summary
+                save_checkpoint(summary_checkpoint['video_id'], 'partials', summaries=summary_checkpoint['summaries'])
         return summary
-        
+    
+    with ThreadPoolExecutor(max_workers=SUMMARY_WORKERS) as executor:
+        return list(executor.map(checkpointed, items))
+
+def generate_summary_bedrock(transcript, on_text=None, summary_checkpoint=None):
+    """Generate summary using AWS Bedrock.
+
+    Transcripts that fit in one prompt are summarized directly. Longer ones are
+    map-reduced: chunks are summarized concurrently, then the partial summaries
+    are combined level by level until they fit in the final prompt, so wall-clock
+    time grows with the number of reduce levels rather than the transcript length.
+    
+    When on_text is given the final summary is streamed to it as it is generated.
+    summary_checkpoint checkpoints the map and reduce steps (see summarize_in_parallel).
+    """
+    try:
+        return write_final_summary(condense_transcript(transcript, summary_checkpoint), on_text)
+    except Exception as e:
+        print(f"Bedrock error: {str(e)}")
+        return None
+
+def generate_chapter_summaries_bedrock(chapters, on_text=None, summary_checkpoint=None):
+    """Summarize each chapter concurrently, then the whole video from the chapter summaries.
+
+    Returns (summary, chapter summaries as title/start/end/summary dicts), or
+    (None, None) if Bedrock fails.
+    """
+    try:
+        print(f"Summarizing {len(chapters)} chapters")
+        chapter_summaries = summarize_in_parallel(summarize_chapter, chapters, summary_checkpoint)
+        outline = '\n\n'.join(
+            f"{chapter['title']}: {chapter_summary}" for chapter, chapter_summary in zip(chapters, chapter_summaries)
+        )
+        summary = write_final_summary(condense_transcript(outline, summary_checkpoint), on_text)
+        return summary, [
+            {'title': chapter['title'], 'start': chapter['start'], 'end': chapter['end'], 'summary': chapter_summary}
+            for chapter, chapter_summary in zip(chapters, chapter_summaries)
+        ]
     except Exception as e:
         print(f"Bedrock error: {str(e)}")
-        # Fallback to simple summary
-        return f"This video discusses: {transcript[:500]}..."
+        return None, None
+
+def condense_transcript(transcript, summary_checkpoint=None):
+    """Map-reduce a transcript that is too long for one prompt into partial summaries that fit"""
+    chunks = split_transcript(transcript)
+    if len(chunks) <= 1:
+        return transcript
+    
+    print(f"Summarizing {len(chunks)} transcript chunks")
+    partials = summarize_in_parallel(
+        lambda item: summarize_chunk(item[1], item[0], len(chunks)),
+        list(enumerate(chunks)),
+        summary_checkpoint
+    )
+    # Combine groups of partial summaries until they fit in one prompt
+    while len(split_transcript('\n\n'.join(partials))) > 1:
+        groups = group_summaries(partials)
+        print(f"Reducing {len(partials)} partial summaries in {len(groups)} groups")
+        partials = summarize_in_parallel(combine_summaries, groups, summary_checkpoint)
+    return '\n\n'.join(partials)
+
+def write_final_summary(transcript, on_text=None):
+    """Write the 2-3 paragraph summary from a transcript (or partial summaries) that fits in one prompt"""
+    prompt = f"""Please provide a comprehensive summary of this video transcript in 2-3 paragraphs, focusing on the main points, key insights, and important takeaways:
+
+{transcript}
+
+Summary:"""
+    if on_text:
+        summary = invoke_bedrock_stream(prompt, on_text)
+    else:
+        summary = invoke_bedrock(prompt)
+    
+    print(f"Summary generated: {len(summary)} characters")
+    return summary
 
 def save_to_s3(bucket, key, content):
     """Save content to S3"""
     try:
-        s3_client.put_object(
+        get_client('s3').put_object(
             Bucket=bucket,
             Key=key,
             Body=content,
@@ -346,6 +4086,17 @@ def save_to_s3(bucket, key, content):
         print(f"S3 save error: {str(e)}")
         raise
 
+def read_from_s3(bucket, key):
+    """Read a text object from S3, returning None if it does not exist"""
+    from botocore.exceptions import ClientError
+    try:
+        response = get_client('s3').get_object(Bucket=bucket, Key=key)
+        return response['Body'].read().decode('utf-8')
+    except ClientError as e:
+        if e.response['Error']['Code'] in ['NoSuchKey', '404']:
+            return None
+        raise
+
 def cleanup_temp_files(audio_file_path):
     """Clean up temporary files"""
     try:
@@ -359,11 +4110,16 @@ def cleanup_temp_files(audio_file_path):
 def cleanup_s3_audio(s3_key):
     """Clean up audio file from S3"""
     try:
-        s3_client.delete_object(Bucket=RAW_BUCKET, Key=s3_key)
+        get_client('s3').delete_object(Bucket=RAW_BUCKET, Key=s3_key)
         print(f"Audio file deleted from S3: {s3_key}")
     except Exception as e:
         print(f"S3 cleanup error: {str(e)}")
 
+def cleanup_segment_audio(segments):
+    """Clean up the per-segment audio of a chunked transcription from S3"""
+    for segment in segments:
+        cleanup_s3_audio(segment['audio_s3_key'])
+
 def create_mock_response(video_id, email):
     """
     Create a mock response when video download fails
@@ -403,7 +4159,7 @@ def create_mock_response(video_id, email):
     
     try:
         # Upload summary to S3
-        s3_client.put_object(
+        get_client('s3').put_object(
             Bucket=SUMMARIES_BUCKET,
             Key=summary_key,
             Body=mock_summary.encode('utf-8'),
@@ -411,7 +4167,7 @@ def create_mock_response(video_id, email):
         )
         
         # Upload transcript to S3
-        s3_client.put_object(
+        get_client('s3').put_object(
             Bucket=TRANSCRIPTS_BUCKET,
             Key=transcript_key,
             Body=mock_transcript.encode('utf-8'),
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the SponsorBlock API
+
+Serves the one endpoint the pipeline uses, GET /api/skipSegments/{hash prefix},
+from a JSON file mapping video IDs to their segments, so sponsor removal can be
+exercised without reaching sponsor.ajay.app. Point the function at it with
+SPONSORBLOCK_API=http://127.0.0.1:8765.
+
+Segments file format:
+    {"dQw4w9WgXcQ": [{"category": "sponsor", "segment": [30.0, 75.5]}]}
+
+Usage:
+    python sponsorblock_stub.py segments.json [--port 8765]
+"""
+import argparse
+import hashlib
+import json
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def build_response(segments_by_video, hash_prefix, categories):
+    """Answer a hash-prefix query the way the real API does: every matching video with its segments"""
+    response = []
+    for video_id, segments in segments_by_video.items():
+        if not hashlib.sha256(video_id.encode('ascii')).hexdigest().startswith(hash_prefix):
+            continue
+        matching = [
+            {
+                'segment': segment['segment'],
+                'category': segment['category'],
+                'actionType': segment.get('actionType', 'skip'),
+                'description': segment.get('description', ''),
+                'videoDuration': segment.get('videoDuration', 0),
+                'UUID': f"{video_id}-{index}",
+            }
+            for index, segment in enumerate(segments)
+            if not categories or segment['category'] in categories
+        ]
+        if matching:
+            response.append({'videoID': video_id, 'segments': matching})
+    return response
+
+
+def make_handler(segments_by_video):
+    class SkipSegmentsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = [part for part in url.path.split('/') if part]
+            if len(parts) != 3 or parts[:2] != ['api', 'skipSegments']:
+                self.send_error(404)
+                return
+            categories = json.loads(parse_qs(url.query).get('categories', ['[]'])[0])
+            response = build_response(segments_by_video, parts[2], categories)
+            if not response:
+                # The real API answers 404 when nothing matches
+                self.send_error(404)
+                return
+            body = json.dumps(response).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return SkipSegmentsHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve SponsorBlock segments from a local JSON file')
+    parser.add_argument('segments', help='JSON file mapping video IDs to segments')
+    parser.add_argument('--port', type=int, default=8765, help='port to listen on')
+    args = parser.parse_args()
+
+    with open(args.segments) as f:
+        segments_by_video = json.load(f)
+
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(segments_by_video))
+    print(f"SponsorBlock stand-in for {len(segments_by_video)} videos on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,187 @@
+"""Shared fixtures: lambda_function_full imported against in-memory S3 and Transcribe stand-ins.
+
+botocore and yt-dlp are taken from the installed packages when present, and
+otherwise from the copies vendored for deployment.
+"""
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.extend([
+    os.path.join(BACKEND_DIR, 'deployment_full'),
+    os.path.join(BACKEND_DIR, 'lambda-layer', 'python'),
+])
+
+os.environ.setdefault('RAW_BUCKET', 'raw-bucket')
+os.environ.setdefault('TRANSCRIPTS_BUCKET', 'transcripts-bucket')
+os.environ.setdefault('SUMMARIES_BUCKET', 'summaries-bucket')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+
+import lambda_function_full  # noqa: E402
+from botocore.exceptions import ClientError  # noqa: E402
+
+
+def client_error(code, operation):
+    return ClientError({'Error': {'Code': code, 'Message': code}}, operation)
+
+
+class FakeS3:
+    """The S3 calls the pipeline makes, over a dict of (bucket, key) -> bytes"""
+
+    def __init__(self):
+        self.objects = {}
+        # Conditional writes are atomic, as in S3
+        self.lock = threading.Lock()
+
+    def etag(self, bucket, key):
+        return f'"{hashlib.md5(self.objects[(bucket, key)]).hexdigest()}"'
+
+    def put_object(self, Bucket, Key, Body, IfNoneMatch=None, IfMatch=None, **kwargs):
+        if isinstance(Body, str):
+            Body = Body.encode()
+        elif hasattr(Body, 'read'):
+            Body = Body.read()
+        with self.lock:
+            exists = (Bucket, Key) in self.objects
+            if (IfNoneMatch == '*' and exists) or (IfMatch and (not exists or self.etag(Bucket, Key) != IfMatch)):
+                raise client_error('PreconditionFailed', 'PutObject')
+            self.objects[(Bucket, Key)] = Body
+            return {'ETag': self.etag(Bucket, Key)}
+
+    def get_object(self, Bucket, Key, Range=None, **kwargs):
+        with self.lock:
+            if (Bucket, Key) not in self.objects:
+                raise client_error('NoSuchKey', 'GetObject')
+            content = self.objects[(Bucket, Key)]
+            etag = self.etag(Bucket, Key)
+        if Range:
+            first, last = Range.split('=')[1].split('-')
+            content = content[int(first):int(last) + 1]
+        return {'Body': io.BytesIO(content), 'ETag': etag}
+
+    def head_object(self, Bucket, Key, **kwargs):
+        if (Bucket, Key) not in self.objects:
+            raise client_error('404', 'HeadObject')
+        return {'ContentLength': len(self.objects[(Bucket, Key)]), 'ETag': self.etag(Bucket, Key)}
+
+    def delete_object(self, Bucket, Key, IfMatch=None, **kwargs):
+        with self.lock:
+            if IfMatch and (Bucket, Key) in self.objects and self.etag(Bucket, Key) != IfMatch:
+                raise client_error('PreconditionFailed', 'DeleteObject')
+            self.objects.pop((Bucket, Key), None)
+
+    def delete_objects(self, Bucket, Delete, **kwargs):
+        for item in Delete['Objects']:
+            self.objects.pop((Bucket, item['Key']), None)
+
+    def list_objects_v2(self, Bucket, Prefix='', **kwargs):
+        keys = sorted(key for bucket, key in self.objects if bucket == Bucket and key.startswith(Prefix))
+        return {'Contents': [{'Key': key, 'Size': len(self.objects[(Bucket, key)])} for key in keys]}
+
+    def get_paginator(self, operation):
+        s3 = self
+
+        class Paginator:
+            def paginate(self, **kwargs):
+                yield getattr(s3, operation)(**kwargs)
+
+        return Paginator()
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn=3600):
+        return f"https://{Params['Bucket']}.s3.amazonaws.com/{Params['Key']}"
+
+    def keys(self, bucket, prefix=''):
+        return sorted(key for name, key in self.objects if name == bucket and key.startswith(prefix))
+
+
+class FakeTranscribe:
+    """Transcribe jobs that finish when a test calls complete() or fail()"""
+
+    def __init__(self, s3):
+        self.s3 = s3
+        self.jobs = {}
+
+    def start_transcription_job(self, TranscriptionJobName, OutputBucketName, OutputKey, **kwargs):
+        self.jobs[TranscriptionJobName] = {
+            'TranscriptionJobName': TranscriptionJobName,
+            'TranscriptionJobStatus': 'IN_PROGRESS',
+            'OutputBucketName': OutputBucketName,
+            'OutputKey': OutputKey,
+            'Media': kwargs.get('Media'),
+        }
+
+    def complete(self, name, words):
+        """Write the job's output document as Transcribe would and return its S3 key"""
+        job = self.jobs[name]
+        items = [
+            {
+                'type': 'pronunciation',
+                'start_time': str(start),
+                'end_time': str(end),
+                'alternatives': [{'content': text, 'confidence': '0.99'}]
+            }
+            for start, end, text in words
+        ]
+        output = {'results': {'transcripts': [{'transcript': ' '.join(text for _, _, text in words)}], 'items': items}}
+        self.s3.put_object(Bucket=job['OutputBucketName'], Key=job['OutputKey'], Body=json.dumps(output))
+        job['TranscriptionJobStatus'] = 'COMPLETED'
+        job['Transcript'] = {'TranscriptFileUri': f"https://s3.amazonaws.com/{job['OutputBucketName']}/{job['OutputKey']}"}
+        return job['OutputKey']
+
+    def fail(self, name, reason):
+        self.jobs[name].update(TranscriptionJobStatus='FAILED', FailureReason=reason)
+
+    def get_transcription_job(self, TranscriptionJobName):
+        if TranscriptionJobName not in self.jobs:
+            raise client_error('BadRequestException', 'GetTranscriptionJob')
+        return {'TranscriptionJob': dict(self.jobs[TranscriptionJobName])}
+
+    def list_transcription_jobs(self, Status=None, **kwargs):
+        return {'TranscriptionJobSummaries': [
+            {'TranscriptionJobName': name} for name, job in self.jobs.items() if job['TranscriptionJobStatus'] == Status
+        ]}
+
+
+class FakeAws:
+    def __init__(self):
+        self.s3 = FakeS3()
+        self.transcribe = FakeTranscribe(self.s3)
+
+    def client(self, service_name):
+        return getattr(self, service_name)
+
+
+@pytest.fixture
+def lf():
+    return lambda_function_full
+
+
+@pytest.fixture
+def aws(monkeypatch):
+    """Route every AWS client the pipeline asks for to fresh in-memory fakes"""
+    fake = FakeAws()
+    monkeypatch.setattr(lambda_function_full, 'get_client', fake.client)
+    return fake
+
+
+@pytest.fixture
+def summaries(monkeypatch):
+    """Replace Bedrock with a summarizer that records each transcript it is given"""
+    calls = []
+
+    def generate_summary_bedrock(transcript_text, on_text=None, checkpoint=None):
+        calls.append(transcript_text)
+        return f"Summary of {len(transcript_text.split())} words"
+
+    monkeypatch.setattr(lambda_function_full, 'generate_summary_bedrock', generate_summary_bedrock)
+    monkeypatch.setattr(lambda_function_full, 'index_video', lambda video_id, summary, transcript_text: None)
+    return calls
@@ -0,0 +1,83 @@
+"""One boto3 client per service, with calls bounded by the time left in the invocation"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+RESPONSE_DELAY = 1.0
+
+
+class SlowS3Handler(BaseHTTPRequestHandler):
+    """Answers every request with an empty 200 after RESPONSE_DELAY seconds"""
+
+    def do_HEAD(self):
+        time.sleep(RESPONSE_DELAY)
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Context:
+    def __init__(self, remaining_seconds):
+        self.remaining_seconds = remaining_seconds
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_seconds * 1000
+
+
+@pytest.fixture
+def slow_s3(lf, monkeypatch):
+    """Point fresh S3 clients at a local server that is slow to respond"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SlowS3Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    monkeypatch.setenv('AWS_ENDPOINT_URL_S3', f"http://127.0.0.1:{server.server_address[1]}")
+    monkeypatch.setattr(lf, '_clients', {})
+    monkeypatch.setattr(lf, '_invocation_deadline', None)
+    yield
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_one_client_per_service_across_deadlines(lf, slow_s3):
+    client = lf.get_client('s3')
+    lf.set_invocation_deadline(Context(lf.CLIENT_DEADLINE_MARGIN + 1))
+
+    assert lf.get_client('s3') is client
+    assert list(lf._clients) == ['s3']
+
+
+def test_call_time_limit_applies_only_near_the_deadline(lf, monkeypatch):
+    monkeypatch.setattr(lf, '_invocation_deadline', None)
+    assert lf.call_time_limit('bedrock-runtime') is None
+
+    lf.set_invocation_deadline(Context(lf.CLIENT_DEADLINE_MARGIN + 400))
+    assert lf.call_time_limit('bedrock-runtime') is None
+
+    lf.set_invocation_deadline(Context(lf.CLIENT_DEADLINE_MARGIN + 100))
+    assert 99 < lf.call_time_limit('bedrock-runtime') <= 100
+    assert lf.call_time_limit('s3') is None
+
+    lf.set_invocation_deadline(Context(1))
+    assert lf.call_time_limit('s3') == lf.CLIENT_MIN_CALL_SECONDS
+
+
+def test_call_near_the_deadline_stops_waiting_for_a_slow_response(lf, slow_s3, monkeypatch):
+    monkeypatch.setattr(lf, 'CLIENT_DEADLINE_MARGIN', 0)
+    s3 = lf.get_client('s3')
+    s3.head_object(Bucket='raw-bucket', Key='audio/early.m4a')
+
+    lf.set_invocation_deadline(Context(0.2))
+    monkeypatch.setattr(lf, 'CLIENT_MIN_CALL_SECONDS', 0.2)
+    started = time.monotonic()
+    with pytest.raises(lf.DeadlineExceeded, match='Ran out of time waiting for s3'):
+        s3.head_object(Bucket='raw-bucket', Key='audio/late.m4a')
+
+    # Not retried, and answered well before the slow response would have arrived
+    assert time.monotonic() - started < RESPONSE_DELAY
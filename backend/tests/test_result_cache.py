@@ -0,0 +1,23 @@
+"""Keys of the cached transcripts and summaries"""
+VIDEO_ID = 'dQw4w9WgXcQ'
+CHAPTER_MODEL = 'anthropic.claude-3-haiku-20240307-v1:0'
+
+
+def test_summary_key_names_the_model_and_prompt(lf):
+    assert lf.summary_cache_key(VIDEO_ID) == f"summaries/{VIDEO_ID}/{lf.BEDROCK_MODEL}/{lf.PROMPT_VERSION}.txt"
+
+
+def test_chapter_summary_model_is_part_of_the_summary_key(lf, monkeypatch):
+    monkeypatch.setattr(lf, 'CHAPTER_SUMMARY_MODEL', CHAPTER_MODEL)
+
+    assert lf.summary_cache_key(VIDEO_ID, 'json') == (
+        f"summaries/{VIDEO_ID}/{lf.BEDROCK_MODEL}+{CHAPTER_MODEL}/{lf.PROMPT_VERSION}.json"
+    )
+
+
+def test_sponsor_free_outputs_have_their_own_keys(lf):
+    output = lf.output_id(VIDEO_ID, {'skip_sponsors': True})
+
+    assert lf.transcript_cache_key(output) == f"transcripts/{VIDEO_ID}.no-sponsors.txt"
+    assert lf.summary_cache_key(output).startswith(f"summaries/{VIDEO_ID}.no-sponsors/")
+    assert lf.output_id(VIDEO_ID, {'skip_sponsors': False}) == VIDEO_ID
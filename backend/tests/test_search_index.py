@@ -0,0 +1,102 @@
+"""Search index segments, merges with stored TF-IDF weights, and queries"""
+import importlib.util
+import json
+import math
+
+import pytest
+
+DOCUMENTS = {
+    'aaaaaaaaaaa': ('Machine learning basics', 'We talk about neural networks and gradient descent. Neural networks learn.'),
+    'bbbbbbbbbbb': ('Cooking pasta', 'Boil water, add salt, cook the pasta. Gradient of flavors.'),
+    'ccccccccccc': ('Deep learning', 'Convolutional neural networks for images and machine vision.'),
+}
+TERMS = ['gradient', 'learning', 'networks', 'neural']
+
+
+@pytest.fixture
+def index(lf, aws, monkeypatch):
+    monkeypatch.setattr(lf, 'SEARCH_SHARDS', 4)
+    monkeypatch.setattr(lf, 'SEARCH_MERGE_SEGMENTS', 3)
+    monkeypatch.setattr(lf, '_search_cache', {'generation': None, 'shards': {}, 'segments': {}})
+    listings = []
+    list_objects_v2 = aws.s3.list_objects_v2
+
+    def counting_list_objects_v2(**kwargs):
+        listings.append(kwargs['Prefix'])
+        return list_objects_v2(**kwargs)
+
+    monkeypatch.setattr(aws.s3, 'list_objects_v2', counting_list_objects_v2)
+    return listings
+
+
+def search(lf, text):
+    return json.loads(lf.search_videos({'q': text})['body'])
+
+
+def scores(lf):
+    postings, documents, weights = lf.load_search_postings(TERMS)
+    return lf.score_documents(TERMS, postings, documents, weights)
+
+
+def test_segments_merge_once_enough_are_counted_without_listing(lf, aws, index):
+    for video_id in list(DOCUMENTS)[:2]:
+        lf.index_video(video_id, *DOCUMENTS[video_id])
+    assert index == []
+    assert len(aws.s3.keys(lf.SUMMARIES_BUCKET, 'search/segments/')) == 2
+
+    lf.index_video('ccccccccccc', *DOCUMENTS['ccccccccccc'])
+
+    assert aws.s3.keys(lf.SUMMARIES_BUCKET, 'search/segments/') == []
+    assert json.loads(aws.s3.objects[(lf.SUMMARIES_BUCKET, 'search/pending.json')]) == {'segments': 0}
+    assert [result['video_id'] for result in search(lf, 'neural networks')['results']] == ['aaaaaaaaaaa', 'ccccccccccc']
+
+
+def test_merged_shards_store_the_weights_queries_add_up(lf, aws, index, monkeypatch):
+    monkeypatch.setattr(lf, 'SEARCH_MERGE_SEGMENTS', 100)
+    for video_id, (summary, transcript) in DOCUMENTS.items():
+        lf.index_video(video_id, summary, transcript)
+    unmerged = scores(lf)
+
+    lf.merge_search_index()
+    manifest, _ = lf.load_search_manifest()
+    shard = json.loads(aws.s3.objects[(lf.SUMMARIES_BUCKET, lf.search_shard_key(manifest['generation'], lf.search_shard('neural', 4)))])
+
+    # "neural" is in 2 of 3 documents, twice among the 12 indexed words of the first
+    assert shard['weights']['neural']['aaaaaaaaaaa'] == pytest.approx(2 / 12 * math.log(1 + 3 / 2))
+    assert set(shard['postings']['neural']) == {'aaaaaaaaaaa', 'ccccccccccc'}
+    assert scores(lf) == pytest.approx(unmerged)
+
+
+def test_weights_without_numpy_match(lf, aws, index, monkeypatch):
+    monkeypatch.setattr(lf, 'SEARCH_MERGE_SEGMENTS', 100)
+    for video_id, (summary, transcript) in DOCUMENTS.items():
+        lf.index_video(video_id, summary, transcript)
+    postings, documents, _ = lf.load_search_postings(TERMS)
+    vectorized = lf.search_term_weights(postings, documents)
+
+    monkeypatch.setattr(importlib.util, 'find_spec', lambda name: None)
+    weights = lf.search_term_weights(postings, documents)
+
+    assert weights.keys() == vectorized.keys()
+    for term, term_weights in weights.items():
+        assert term_weights == pytest.approx(vectorized[term])
+
+
+def test_generation_without_weights_is_scored_at_query_time(lf, aws, index, monkeypatch):
+    monkeypatch.setattr(lf, 'SEARCH_MERGE_SEGMENTS', 100)
+    for video_id, (summary, transcript) in DOCUMENTS.items():
+        lf.index_video(video_id, summary, transcript)
+    lf.merge_search_index()
+    expected = scores(lf)
+
+    # Rewrite the generation in the format used before weights were stored
+    manifest, _ = lf.load_search_manifest()
+    for shard in range(manifest['shards']):
+        key = lf.search_shard_key(manifest['generation'], shard)
+        postings = json.loads(aws.s3.objects[(lf.SUMMARIES_BUCKET, key)])['postings']
+        aws.s3.put_object(Bucket=lf.SUMMARIES_BUCKET, Key=key, Body=json.dumps(postings))
+    manifest.pop('weighted')
+    aws.s3.put_object(Bucket=lf.SUMMARIES_BUCKET, Key='search/manifest.json', Body=json.dumps(manifest))
+    monkeypatch.setattr(lf, '_search_cache', {'generation': None, 'shards': {}, 'segments': {}})
+
+    assert scores(lf) == pytest.approx(expected)
@@ -0,0 +1,164 @@
+"""Sponsor segment removal against sponsorblock_stub.py on an ephemeral port"""
+import json
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import sponsorblock_stub
+
+VIDEO_ID = 'abcdefghijk'
+DURATION = 600
+SEGMENTS = {
+    VIDEO_ID: [
+        {'category': 'intro', 'segment': [0.0, 5.0]},
+        {'category': 'sponsor', 'segment': [30.0, 75.5]},
+        # Not in SPONSORBLOCK_CATEGORIES, so never requested
+        {'category': 'music_offtopic', 'segment': [200.0, 260.0]},
+    ]
+}
+
+
+def caption_track():
+    """WebVTT with one three-word cue every 5 seconds for the first two minutes"""
+    cues = [
+        f"00:{second // 60:02d}:{second % 60:02d}.000 --> 00:{(second + 5) // 60:02d}:{(second + 5) % 60:02d}.000\nline {second} here\n"
+        for second in range(0, 120, 5)
+    ]
+    return ('WEBVTT\n\n' + '\n'.join(cues)).encode()
+
+
+@pytest.fixture
+def sponsorblock(lf, monkeypatch):
+    """Serve the stub on a free port, plus the video's caption track at /captions.vtt"""
+    stub_handler = sponsorblock_stub.make_handler(SEGMENTS)
+
+    class Handler(stub_handler):
+        def do_GET(self):
+            if self.path != '/captions.vtt':
+                return super().do_GET()
+            body = caption_track()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/vtt')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setattr(lf, 'SPONSORBLOCK_API', base_url)
+    yield base_url
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def video_info(video_id=VIDEO_ID, **fields):
+    return dict({'id': video_id, 'extractor_key': 'Youtube', 'duration': DURATION}, **fields)
+
+
+def test_fetch_sponsor_segments_returns_requested_categories(lf, sponsorblock):
+    segments = lf.fetch_sponsor_segments(video_info())
+
+    assert segments == [
+        {'category': 'intro', 'start': 0.0, 'end': 5.0},
+        {'category': 'sponsor', 'start': 30.0, 'end': 75.5},
+    ]
+
+
+def test_fetch_sponsor_segments_for_an_unknown_video_is_empty(lf, sponsorblock):
+    assert lf.fetch_sponsor_segments(video_info('zzzzzzzzzzz')) == []
+
+
+def test_failed_lookup_skips_nothing(lf, monkeypatch):
+    monkeypatch.setattr(lf, 'SPONSORBLOCK_API', 'http://127.0.0.1:1')
+
+    assert lf.fetch_sponsor_segments(video_info()) == []
+
+
+def test_caption_cues_inside_sponsor_segments_are_dropped(lf, sponsorblock):
+    info = video_info(subtitles={'en': [{'ext': 'vtt', 'url': f"{sponsorblock}/captions.vtt"}]})
+    segments = lf.fetch_sponsor_segments(info)
+
+    full = lf.fetch_caption_transcript(info)
+    filtered = lf.fetch_caption_transcript(info, segments)
+
+    assert len(full['cues']) == 24
+    # Cues are kept or dropped by their midpoint: 2.5s is in the intro, 32.5s to 72.5s in the sponsor read
+    assert [cue['start'] for cue in filtered['cues']] == [5.0, 10.0, 15.0, 20.0, 25.0] + [float(s) for s in range(75, 120, 5)]
+    assert 'line 30 here' in full['text']
+    assert 'line 30 here' not in filtered['text']
+    assert filtered['text'].startswith('line 5 here line 10 here')
+
+
+def test_sponsor_cuts_map_back_to_video_time(lf, aws, sponsorblock, monkeypatch):
+    monkeypatch.setattr(lf, 'VAD_METHOD', 'off')
+    cuts = []
+
+    def cut_speech_intervals(source, intervals, audio_plan, s3_key=None):
+        cuts.append(intervals)
+        return '/tmp/trimmed.opus'
+
+    monkeypatch.setattr(lf, 'cut_speech_intervals', cut_speech_intervals)
+    job = lf.create_job(VIDEO_ID, f"https://youtu.be/{VIDEO_ID}", None, lf.parse_job_options({'skip_sponsors': True}))
+    lf.record_sponsor_segments(job, video_info())
+
+    trimmed = lf.trim_non_speech(job, 'audio.m4a', DURATION, lf.SPEECH_AUDIO_PLANS['speech-opus'])
+
+    assert trimmed == '/tmp/trimmed.opus'
+    # Sponsor segments are cut at their exact boundaries, without VAD_PADDING
+    assert cuts == [[(5.0, 30.0), (75.5, float(DURATION))]]
+    assert job['audio_offset_map'] == [[0.0, 5.0], [25.0, 75.5]]
+    assert job['vad']['sponsor_seconds'] == 50.5
+    assert job['vad']['removed_seconds'] == 50.5
+
+    words = [
+        {'start': 0.0, 'end': 0.5, 'text': 'Welcome'},
+        {'start': 24.0, 'end': 24.5, 'text': 'before'},
+        {'start': 25.0, 'end': 25.5, 'text': 'after'},
+    ]
+    assert [(word['start'], word['end']) for word in lf.remap_words(words, job['audio_offset_map'])] == [
+        (5.0, 5.5), (29.0, 29.5), (75.5, 76.0)
+    ]
+
+
+def test_only_silences_keep_padding_next_to_sponsor_cuts(lf):
+    padding = lf.VAD_PADDING
+    # A silence overlapping the end of the sponsor read, one in speech and one ending the video
+    silences = [(70.0, 78.0), (100.0, 110.0), (590.0, float(DURATION))]
+
+    intervals = lf.speech_intervals(silences, float(DURATION), [(30.0, 75.5)])
+
+    assert intervals == [(0.0, 30.0), (78.0 - padding, 100.0 + padding), (110.0 - padding, 590.0 + padding)]
+
+def summarize_request(url, **options):
+    return {'body': json.dumps(dict({'url': url, 'email': 'viewer@example.com'}, **options))}
+
+
+def test_sponsor_free_requests_keep_their_own_results_and_jobs(lf, aws, monkeypatch):
+    started = []
+    monkeypatch.setattr(lf, 'start_job_worker', lambda job_id, context: started.append(job_id))
+    url = f"https://youtu.be/{VIDEO_ID}"
+    lf.save_cached_result(VIDEO_ID, {'video_id': VIDEO_ID, 'summary': 'Summary with the sponsor read'})
+
+    # The summary of the full video is not served to, or shared with, a sponsor-free request
+    assert json.loads(lf.submit_summarize_job(summarize_request(url), None)['body'])['cached'] is True
+    response = json.loads(lf.submit_summarize_job(summarize_request(url, skip_sponsors=True), None)['body'])
+    assert response['attached'] is False
+    assert started == [response['job_id']]
+    assert lf.load_job(response['job_id'])['options']['skip_sponsors'] is True
+
+    # A matching request attaches; one without the option starts its own job
+    holder, attached = lf.claim_video_job(VIDEO_ID, url, None, lf.parse_job_options({'skip_sponsors': True}))
+    aws.s3.delete_object(Bucket=lf.SUMMARIES_BUCKET, Key=lf.summary_cache_key(VIDEO_ID, 'json'))
+    plain = json.loads(lf.submit_summarize_job(summarize_request(url, skip_sponsors=False), None)['body'])
+    assert attached
+    assert holder['job_id'] == response['job_id']
+    assert plain['attached'] is False
+    assert plain['job_id'] != response['job_id']
+    assert aws.s3.keys(lf.SUMMARIES_BUCKET, 'leases/') == [f"leases/{VIDEO_ID}.json", f"leases/{VIDEO_ID}.no-sponsors.json"]
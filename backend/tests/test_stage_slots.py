@@ -0,0 +1,123 @@
+"""Per-stage concurrency limits shared by every invocation through slot objects in S3"""
+import threading
+import time
+
+import pytest
+
+VIDEO_IDS = ['aaaaaaaaaaa', 'bbbbbbbbbbb']
+
+
+@pytest.fixture
+def fast_slots(lf, monkeypatch):
+    monkeypatch.setattr(lf, 'SLOT_POLL_INITIAL_DELAY', 0.01)
+    monkeypatch.setattr(lf, 'SLOT_POLL_MAX_DELAY', 0.05)
+
+
+def test_slots_are_shared_between_containers(lf, aws):
+    # Two containers each build their own StageSlots; only S3 is shared
+    first, second = lf.StageSlots('download', 1), lf.StageSlots('download', 1)
+
+    tokens = first.acquire('job-a')
+    assert second.try_acquire('job-b', time.time() + 60) is None
+
+    first.release(tokens)
+    assert second.try_acquire('job-b', time.time() + 60)['key'] == 'slots/download/0.json'
+
+
+def test_expired_slot_is_taken_over_and_not_freed_by_its_old_holder(lf, aws):
+    slots = lf.StageSlots('bedrock', 1)
+    stale = slots.acquire('crashed-invocation', ttl=-1)
+
+    taken = slots.acquire('next-invocation')
+    slots.release(stale)
+
+    assert taken[0]['key'] == stale[0]['key']
+    assert aws.s3.keys(lf.SUMMARIES_BUCKET, 'slots/') == ['slots/bedrock/0.json']
+    slots.release(taken)
+    assert aws.s3.keys(lf.SUMMARIES_BUCKET, 'slots/') == []
+
+
+def test_several_slots_are_taken_all_or_nothing(lf, aws, fast_slots, monkeypatch):
+    monkeypatch.setattr(lf, 'SLOT_MAX_WAIT', 0.1)
+    slots = lf.StageSlots('transcribe', 3)
+    held = slots.acquire('paused-job', 2)
+
+    with pytest.raises(lf.PipelineError, match='Timed out waiting for a free transcribe slot'):
+        slots.acquire('chunked-job', 2)
+    # The slot that was free is not kept while waiting for the second
+    assert len(aws.s3.keys(lf.SUMMARIES_BUCKET, 'slots/transcribe/')) == 2
+
+    slots.release(held)
+    assert len(slots.acquire('chunked-job', 2)) == 2
+
+
+def test_second_job_waits_for_the_download_slot(lf, aws, summaries, fast_slots, tmp_path, monkeypatch):
+    monkeypatch.setattr(lf, 'DOWNLOAD_SLOTS', lf.StageSlots('download', 1))
+    monkeypatch.setattr(lf, 'TRANSCRIPTION_BACKEND', 'fake')
+    monkeypatch.setattr(lf, 'VAD_METHOD', 'off')
+    monkeypatch.setattr(lf, 'extract_video_info', lambda url: {'duration': 30, 'formats': []})
+    started = {video_id: threading.Event() for video_id in VIDEO_IDS}
+    finish_first = threading.Event()
+
+    def download_video_audio(url, video_id, audio_plan):
+        started[video_id].set()
+        if video_id == VIDEO_IDS[0]:
+            assert finish_first.wait(5)
+        path = tmp_path / video_id / f"{video_id}.{audio_plan['ext']}"
+        path.parent.mkdir()
+        path.write_bytes(b'\0' * 100)
+        return str(path)
+
+    monkeypatch.setattr(lf, 'download_video_audio', download_video_audio)
+    jobs = [
+        lf.create_job(video_id, f"https://youtu.be/{video_id}", None, lf.parse_job_options({'dedupe': False}))
+        for video_id in VIDEO_IDS
+    ]
+    # Each thread stands in for a separate process_job invocation
+    invocations = [threading.Thread(target=lf.process_job, args=(job['job_id'],)) for job in jobs]
+    invocations[0].start()
+    assert started[VIDEO_IDS[0]].wait(5)
+    invocations[1].start()
+
+    assert not started[VIDEO_IDS[1]].wait(0.3)
+    assert lf.load_job(jobs[1]['job_id'])['stage'] == 'downloading'
+
+    finish_first.set()
+    for invocation in invocations:
+        invocation.join(5)
+    assert started[VIDEO_IDS[1]].is_set()
+    assert [lf.load_job(job['job_id'])['status'] for job in jobs] == ['completed', 'completed']
+    assert aws.s3.keys(lf.SUMMARIES_BUCKET, 'slots/') == []
+
+
+def test_paused_job_holds_its_transcribe_slot_until_it_resumes(lf, aws, summaries, fast_slots, monkeypatch):
+    monkeypatch.setattr(lf, 'TRANSCRIBE_SLOTS', lf.StageSlots('transcribe', 1))
+    monkeypatch.setattr(lf, 'SLOT_MAX_WAIT', 0.1)
+    monkeypatch.setattr(lf, 'extract_video_info', lambda url: {'duration': 120, 'formats': []})
+    monkeypatch.setattr(lf, 'deduplicate_job_audio', lambda job, source: None)
+    monkeypatch.setattr(lf, 'trim_job_audio', lambda job, audio_s3_key, audio_plan, duration: (audio_s3_key, audio_plan, duration))
+
+    def upload_job_audio(job, info, checkpoint=None):
+        audio_s3_key = f"audio/{job['video_id']}.m4a"
+        aws.s3.put_object(Bucket=lf.RAW_BUCKET, Key=audio_s3_key, Body=b'audio')
+        return audio_s3_key, {'ext': 'm4a', 'media_format': 'mp4', 'content_type': 'audio/mp4', 'transcode': False}
+
+    monkeypatch.setattr(lf, 'upload_job_audio', upload_job_audio)
+    options = lf.parse_job_options({'transcription_backend': 'transcribe', 'chunked': False})
+    first, second = [lf.create_job(video_id, f"https://youtu.be/{video_id}", None, options) for video_id in VIDEO_IDS]
+
+    lf.process_job(first['job_id'])
+    assert aws.s3.keys(lf.SUMMARIES_BUCKET, 'slots/') == ['slots/transcribe/0.json']
+
+    # The invocation has ended, but the paused job still counts against the limit
+    lf.process_job(second['job_id'])
+    second = lf.load_job(second['job_id'])
+    assert second['status'] == 'failed'
+    assert second['error'] == 'Timed out waiting for a free transcribe slot. Please try again later.'
+    assert aws.transcribe.jobs.keys() == {f"transcribe-{VIDEO_IDS[0]}-{first['job_id']}"}
+
+    job_name = lf.load_job(first['job_id'])['transcribe_job_name']
+    aws.transcribe.complete(job_name, [(0.0, 0.5, 'Hello')])
+    lf.handle_transcription_event({'source': 'aws.transcribe', 'detail': {'TranscriptionJobName': job_name, 'TranscriptionJobStatus': 'COMPLETED'}})
+    assert lf.load_job(first['job_id'])['status'] == 'completed'
+    assert aws.s3.keys(lf.SUMMARIES_BUCKET, 'slots/') == []
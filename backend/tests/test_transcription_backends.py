@@ -0,0 +1,171 @@
+"""Backend selection, and jobs transcribed through FakeTranscriptionBackend"""
+import pytest
+
+VIDEO_ID = 'jNQXAC9IVRw'
+TRANSCRIPT = 'All right so here we are in front of the elephants'
+
+
+@pytest.fixture
+def local_installed(lf, monkeypatch):
+    """Pretend faster-whisper is installed, without loading a model"""
+    monkeypatch.setattr(lf.TRANSCRIPTION_BACKENDS['local'], 'available', lambda: True)
+    return lf.TRANSCRIPTION_BACKENDS['local']
+
+
+def job_with_backend(lf, choice):
+    return {'job_id': 'a' * 32, 'video_id': VIDEO_ID, 'options': {'transcription_backend': choice}}
+
+
+def test_explicit_choice_selects_that_backend(lf):
+    backend = lf.select_transcription_backend(job_with_backend(lf, 'fake'), {'duration': 60})
+
+    assert isinstance(backend, lf.FakeTranscriptionBackend)
+    assert not backend.remote
+
+
+def test_environment_default_selects_the_fake_backend(lf, monkeypatch):
+    monkeypatch.setattr(lf, 'TRANSCRIPTION_BACKEND', 'fake')
+    job = {'options': lf.parse_job_options({})}
+
+    assert job['options']['transcription_backend'] == 'fake'
+    assert lf.select_transcription_backend(job, {'duration': 60}).name == 'fake'
+
+
+def test_unavailable_choice_falls_back_to_transcribe(lf, monkeypatch):
+    monkeypatch.setattr(lf.TRANSCRIPTION_BACKENDS['local'], 'available', lambda: False)
+
+    assert lf.select_transcription_backend(job_with_backend(lf, 'local'), {'duration': 60}).name == 'transcribe'
+    assert lf.select_transcription_backend(job_with_backend(lf, 'unknown'), {'duration': 60}).name == 'transcribe'
+
+
+def test_auto_without_local_engine_uses_transcribe(lf, monkeypatch):
+    monkeypatch.setattr(lf.TRANSCRIPTION_BACKENDS['local'], 'available', lambda: False)
+
+    assert lf.select_transcription_backend(job_with_backend(lf, 'auto'), {'duration': 60}).name == 'transcribe'
+
+
+def test_auto_transcribes_short_clips_locally(lf, local_installed):
+    job = job_with_backend(lf, 'auto')
+
+    assert lf.select_transcription_backend(job, {'duration': lf.LOCAL_TRANSCRIPTION_MAX_SECONDS}) is local_installed
+    assert lf.select_transcription_backend(job, {'duration': None}).name == 'transcribe'
+    assert lf.select_transcription_backend(job, None).name == 'transcribe'
+
+
+def test_auto_takes_medium_clips_locally_only_while_transcribe_is_queued(lf, aws, local_installed, monkeypatch):
+    job = job_with_backend(lf, 'auto')
+    info = {'duration': lf.LOCAL_TRANSCRIPTION_MAX_SECONDS + 1}
+    assert lf.select_transcription_backend(job, info).name == 'transcribe'
+
+    monkeypatch.setattr(lf, 'TRANSCRIBE_QUEUE_THRESHOLD', 2)
+    for index in range(2):
+        aws.transcribe.jobs[f"queued-{index}"] = {'TranscriptionJobStatus': 'QUEUED'}
+    assert lf.select_transcription_backend(job, info) is local_installed
+    assert lf.select_transcription_backend(job, {'duration': lf.LOCAL_TRANSCRIPTION_BUSY_MAX_SECONDS + 1}).name == 'transcribe'
+
+
+def test_auto_skips_a_busy_local_engine(lf, local_installed, monkeypatch):
+    monkeypatch.setattr(local_installed, 'queue_depth', lambda: lf.LOCAL_TRANSCRIPTION_WORKERS)
+
+    assert lf.select_transcription_backend(job_with_backend(lf, 'auto'), {'duration': 60}).name == 'transcribe'
+
+
+@pytest.fixture
+def local_job(lf, aws, summaries, tmp_path, monkeypatch):
+    """A job routed to a fresh fake backend, with yt-dlp replaced by a file write"""
+    backend = lf.FakeTranscriptionBackend(seconds_per_word=0.5)
+    monkeypatch.setitem(lf.TRANSCRIPTION_BACKENDS, 'fake', backend)
+    monkeypatch.setattr(lf, 'TRANSCRIPTION_BACKEND', 'fake')
+    monkeypatch.setattr(lf, 'VAD_METHOD', 'off')
+    monkeypatch.setattr(lf, 'extract_video_info', lambda url: {'id': VIDEO_ID, 'duration': 19, 'formats': []})
+    downloads = []
+
+    def download_video_audio(url, video_id, audio_plan):
+        path = tmp_path / f"download-{len(downloads)}" / f"{video_id}.{audio_plan['ext']}"
+        path.parent.mkdir()
+        path.write_bytes(b'\0' * 4000)
+        downloads.append(path)
+        return str(path)
+
+    monkeypatch.setattr(lf, 'download_video_audio', download_video_audio)
+    options = lf.parse_job_options({'dedupe': False})
+    job = lf.create_job(VIDEO_ID, f"https://www.youtube.com/watch?v={VIDEO_ID}", None, options)
+    backend.transcripts[f"fake-{VIDEO_ID}-{job['job_id']}"] = TRANSCRIPT
+    return job, backend, downloads
+
+
+def test_local_backend_transcribes_in_process(lf, aws, summaries, local_job):
+    job, backend, downloads = local_job
+
+    lf.process_job(job['job_id'])
+
+    job = lf.load_job(job['job_id'])
+    assert job['status'] == 'completed'
+    assert job['transcription_backend'] == 'fake'
+    assert job['result']['transcript_source'] == 'fake'
+    assert job['audio_size']['bytes'] == 4000
+    assert backend.submitted == [(f"fake-{VIDEO_ID}-{job['job_id']}", str(downloads[0]))]
+    assert summaries == [TRANSCRIPT]
+    # Nothing goes through RAW_BUCKET or Transcribe, and the download is removed
+    assert aws.s3.keys(lf.RAW_BUCKET) == []
+    assert aws.transcribe.jobs == {}
+    assert not downloads[0].exists()
+    assert lf.read_transcript_range(VIDEO_ID, 1.0, 2.0)['text'] == 'so here'
+
+
+def test_local_backend_word_times_follow_trimmed_audio_back_to_the_video(lf, aws, summaries, local_job, monkeypatch):
+    job, backend, downloads = local_job
+
+    def trim_non_speech(job, source, duration, audio_plan, s3_key=None):
+        # Keep 0-2s and 10-19s of the video
+        lf.update_job(job, audio_offset_map=lf.build_offset_map([(0.0, 2.0), (10.0, 19.0)]))
+        path = downloads[0].parent / f"trimmed.{audio_plan['ext']}"
+        path.write_bytes(b'\0' * 1000)
+        return str(path)
+
+    monkeypatch.setattr(lf, 'trim_non_speech', trim_non_speech)
+    lf.process_job(job['job_id'])
+
+    job = lf.load_job(job['job_id'])
+    assert job['status'] == 'completed'
+    assert backend.submitted[0][1] == str(downloads[0].parent / f"trimmed.{job['audio_format']['ext']}")
+    assert not downloads[0].exists()
+    # Words 5 and 6 were spoken 2.0-3.0s into the trimmed audio, so 10.0-11.0s into the video
+    assert lf.read_transcript_range(VIDEO_ID, 10.0, 11.0)['text'] == 'we are'
+    assert lf.read_transcript_range(VIDEO_ID, 2.0, 10.0)['word_count'] == 0
+
+
+def test_empty_local_transcript_fails_the_job(lf, aws, summaries, local_job):
+    job, backend, downloads = local_job
+    backend.transcripts[f"fake-{VIDEO_ID}-{job['job_id']}"] = ''
+
+    lf.process_job(job['job_id'])
+
+    job = lf.load_job(job['job_id'])
+    assert job['status'] == 'failed'
+    assert job['error'] == 'Failed to transcribe audio'
+    assert summaries == []
+
+
+def test_finish_transcription_summarizes_and_removes_the_audio(lf, aws, summaries):
+    audio_s3_key = f"audio/{VIDEO_ID}_upload.mp3"
+    aws.s3.put_object(Bucket=lf.RAW_BUCKET, Key=audio_s3_key, Body=b'audio')
+    job = lf.create_job(VIDEO_ID, f"https://youtu.be/{VIDEO_ID}", None, lf.parse_job_options({}))
+    lf.update_job(job, audio_s3_key=audio_s3_key, audio_offset_map=[[0.0, 0.0], [1.0, 30.0]])
+    transcript = lf.FakeTranscriptionBackend(seconds_per_word=0.5).submit('name', audio_s3_key, {})
+
+    result = lf.finish_transcription(job, transcript)
+
+    assert result['transcript_source'] == 'transcribe'
+    assert summaries == ['This is a placeholder transcript.']
+    assert aws.s3.keys(lf.RAW_BUCKET) == []
+    # "a" was at 1.0s of the trimmed audio, 30.0s into the video
+    assert lf.read_transcript_range(VIDEO_ID, 30.0, 31.0)['text'] == 'a placeholder'
+
+
+def test_finish_transcription_without_text_raises(lf, aws, summaries):
+    job = {'job_id': 'b' * 32, 'video_id': VIDEO_ID, 'audio_s3_key': f"audio/{VIDEO_ID}_upload.mp3"}
+
+    with pytest.raises(lf.PipelineError, match='Failed to transcribe audio'):
+        lf.finish_transcription(job, None)
+    assert summaries == []
@@ -0,0 +1,121 @@
+"""Paused jobs resumed by Transcribe completion events (S3 notifications and EventBridge)"""
+import pytest
+
+VIDEO_ID = 'dQw4w9WgXcQ'
+WORDS = [(0.0, 0.4, 'Never'), (0.4, 0.7, 'gonna'), (0.7, 1.1, 'give'), (1.1, 1.3, 'you'), (1.3, 1.6, 'up')]
+
+
+@pytest.fixture
+def paused_job(lf, aws, summaries, monkeypatch):
+    """A job run up to the point where it waits on its Transcribe job"""
+    audio_plan = {'ext': 'm4a', 'media_format': 'mp4', 'content_type': 'audio/mp4', 'transcode': False}
+
+    def upload_job_audio(job, info, checkpoint=None):
+        audio_s3_key = f"audio/{job['video_id']}_{job['job_id']}.m4a"
+        aws.s3.put_object(Bucket=lf.RAW_BUCKET, Key=audio_s3_key, Body=b'audio')
+        return audio_s3_key, audio_plan
+
+    monkeypatch.setattr(lf, 'extract_video_info', lambda url: {'id': VIDEO_ID, 'duration': 120, 'formats': []})
+    monkeypatch.setattr(lf, 'upload_job_audio', upload_job_audio)
+    monkeypatch.setattr(lf, 'deduplicate_job_audio', lambda job, source: None)
+    monkeypatch.setattr(lf, 'trim_job_audio', lambda job, audio_s3_key, audio_plan, duration: (audio_s3_key, audio_plan, duration))
+
+    options = lf.parse_job_options({'transcription_backend': 'transcribe', 'chunked': False})
+    job = lf.create_job(VIDEO_ID, f"https://www.youtube.com/watch?v={VIDEO_ID}", None, options)
+    lf.process_job(job['job_id'])
+    return lf.load_job(job['job_id'])
+
+
+def s3_event(key):
+    return {'Records': [{'eventSource': 'aws:s3', 's3': {'bucket': {'name': 'transcripts-bucket'}, 'object': {'key': key}}}]}
+
+
+def eventbridge_event(job_name, status):
+    return {
+        'source': 'aws.transcribe',
+        'detail-type': 'Transcribe Job State Change',
+        'detail': {'TranscriptionJobName': job_name, 'TranscriptionJobStatus': status}
+    }
+
+
+def test_job_pauses_on_its_transcribe_job(lf, aws, paused_job):
+    assert paused_job['status'] == 'running'
+    assert paused_job['stage'] == 'transcribing'
+    assert paused_job['transcribe_job_name'] == f"transcribe-{VIDEO_ID}-{paused_job['job_id']}"
+    assert aws.transcribe.jobs[paused_job['transcribe_job_name']]['TranscriptionJobStatus'] == 'IN_PROGRESS'
+
+
+def test_s3_output_event_resumes_and_summarizes(lf, aws, summaries, paused_job):
+    output_key = aws.transcribe.complete(paused_job['transcribe_job_name'], WORDS)
+
+    lf.handle_transcription_event(s3_event(output_key))
+
+    job = lf.load_job(paused_job['job_id'])
+    assert job['status'] == 'completed'
+    assert job['result']['transcript'] == 'Never gonna give you up'
+    assert job['result']['transcript_source'] == 'transcribe'
+    assert summaries == ['Never gonna give you up']
+    assert lf.read_from_s3(lf.SUMMARIES_BUCKET, lf.summary_cache_key(VIDEO_ID)) == 'Summary of 5 words'
+    assert aws.s3.keys(lf.RAW_BUCKET, 'audio/') == []
+
+
+def test_eventbridge_completed_event_resumes_and_summarizes(lf, aws, summaries, paused_job):
+    aws.transcribe.complete(paused_job['transcribe_job_name'], WORDS)
+
+    lf.handle_transcription_event(eventbridge_event(paused_job['transcribe_job_name'], 'COMPLETED'))
+
+    job = lf.load_job(paused_job['job_id'])
+    assert job['status'] == 'completed'
+    assert summaries == ['Never gonna give you up']
+    assert lf.read_transcript_range(VIDEO_ID, 0.4, 1.2)['text'] == 'gonna give you'
+
+
+def test_both_completion_events_summarize_once(lf, aws, summaries, paused_job):
+    job_name = paused_job['transcribe_job_name']
+    output_key = aws.transcribe.complete(job_name, WORDS)
+
+    lf.handle_transcription_event(s3_event(output_key))
+    lf.handle_transcription_event(eventbridge_event(job_name, 'COMPLETED'))
+    lf.handle_transcription_event(s3_event(output_key))
+
+    assert lf.load_job(paused_job['job_id'])['status'] == 'completed'
+    assert len(summaries) == 1
+
+
+def test_concurrent_completion_events_summarize_once(lf, aws, summaries, paused_job):
+    # The second delivery loads the job before the first has finished with it
+    job_name = paused_job['transcribe_job_name']
+    output_key = aws.transcribe.complete(job_name, WORDS)
+    stale = lf.load_paused_job(job_name)
+
+    lf.handle_transcription_event(s3_event(output_key))
+    assert lf.claim_job_resume(stale) is False
+
+    assert len(summaries) == 1
+
+
+def test_failed_transcription_fails_the_job(lf, aws, summaries, paused_job):
+    job_name = paused_job['transcribe_job_name']
+    aws.transcribe.fail(job_name, 'The media format is not supported')
+
+    lf.handle_transcription_event(eventbridge_event(job_name, 'FAILED'))
+
+    job = lf.load_job(paused_job['job_id'])
+    assert job['status'] == 'failed'
+    assert job['error'] == 'Failed to transcribe audio: The media format is not supported'
+    assert summaries == []
+    assert aws.s3.keys(lf.RAW_BUCKET, 'audio/') == []
+
+
+def test_events_for_finished_or_foreign_transcriptions_are_ignored(lf, aws, summaries, paused_job):
+    job_name = paused_job['transcribe_job_name']
+    aws.transcribe.fail(job_name, 'Internal failure')
+    lf.handle_transcription_event(eventbridge_event(job_name, 'FAILED'))
+
+    # A completion arriving after the job failed does not revive it
+    lf.handle_transcription_event(eventbridge_event(job_name, 'COMPLETED'))
+    lf.handle_transcription_event(eventbridge_event('transcribe-someone-elses-job', 'COMPLETED'))
+    lf.handle_transcription_event(s3_event('transcribe-output/notes.txt'))
+
+    assert lf.load_job(paused_job['job_id'])['status'] == 'failed'
+    assert summaries == []
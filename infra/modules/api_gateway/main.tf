@@ -36,6 +36,222 @@ resource "aws_api_gateway_integration" "lambda_integration" {
   uri                    = var.lambda_invoke_arn
 }
 
+# API Gateway Resources for /jobs/{job_id}
+resource "aws_api_gateway_resource" "jobs" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  parent_id   = aws_api_gateway_rest_api.main.root_resource_id
+  path_part   = "jobs"
+}
+
+resource "aws_api_gateway_resource" "job" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  parent_id   = aws_api_gateway_resource.jobs.id
+  path_part   = "{job_id}"
+}
+
+# API Gateway Method (GET) for polling job status
+resource "aws_api_gateway_method" "job_get" {
+  rest_api_id   = aws_api_gateway_rest_api.main.id
+  resource_id   = aws_api_gateway_resource.job.id
+  http_method   = "GET"
+  authorization = "NONE"
+
+  request_parameters = {
+    "method.request.path.job_id" = true
+  }
+}
+
+resource "aws_api_gateway_integration" "job_lambda_integration" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  resource_id = aws_api_gateway_resource.job.id
+  http_method = aws_api_gateway_method.job_get.http_method
+
+  integration_http_method = "POST"
+  type                   = "AWS_PROXY"
+  uri                    = var.lambda_invoke_arn
+}
+
+# API Gateway Resource for POST /batch
+resource "aws_api_gateway_resource" "batch" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  parent_id   = aws_api_gateway_rest_api.main.root_resource_id
+  path_part   = "batch"
+}
+
+resource "aws_api_gateway_method" "batch_post" {
+  rest_api_id   = aws_api_gateway_rest_api.main.id
+  resource_id   = aws_api_gateway_resource.batch.id
+  http_method   = "POST"
+  authorization = "NONE"
+}
+
+resource "aws_api_gateway_integration" "batch_lambda_integration" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  resource_id = aws_api_gateway_resource.batch.id
+  http_method = aws_api_gateway_method.batch_post.http_method
+
+  integration_http_method = "POST"
+  type                   = "AWS_PROXY"
+  uri                    = var.lambda_invoke_arn
+}
+
+# API Gateway Resources for GET /batches/{batch_id}
+resource "aws_api_gateway_resource" "batches" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  parent_id   = aws_api_gateway_rest_api.main.root_resource_id
+  path_part   = "batches"
+}
+
+resource "aws_api_gateway_resource" "batch_status" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  parent_id   = aws_api_gateway_resource.batches.id
+  path_part   = "{batch_id}"
+}
+
+resource "aws_api_gateway_method" "batch_status_get" {
+  rest_api_id   = aws_api_gateway_rest_api.main.id
+  resource_id   = aws_api_gateway_resource.batch_status.id
+  http_method   = "GET"
+  authorization = "NONE"
+
+  request_parameters = {
+    "method.request.path.batch_id" = true
+  }
+}
+
+resource "aws_api_gateway_integration" "batch_status_lambda_integration" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  resource_id = aws_api_gateway_resource.batch_status.id
+  http_method = aws_api_gateway_method.batch_status_get.http_method
+
+  integration_http_method = "POST"
+  type                   = "AWS_PROXY"
+  uri                    = var.lambda_invoke_arn
+}
+
+# API Gateway Resource for POST /ingest (playlists and channels)
+resource "aws_api_gateway_resource" "ingest" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  parent_id   = aws_api_gateway_rest_api.main.root_resource_id
+  path_part   = "ingest"
+}
+
+resource "aws_api_gateway_method" "ingest_post" {
+  rest_api_id   = aws_api_gateway_rest_api.main.id
+  resource_id   = aws_api_gateway_resource.ingest.id
+  http_method   = "POST"
+  authorization = "NONE"
+}
+
+resource "aws_api_gateway_integration" "ingest_lambda_integration" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  resource_id = aws_api_gateway_resource.ingest.id
+  http_method = aws_api_gateway_method.ingest_post.http_method
+
+  integration_http_method = "POST"
+  type                   = "AWS_PROXY"
+  uri                    = var.lambda_invoke_arn
+}
+
+# API Gateway Resources for GET /sources/{source_id}
+resource "aws_api_gateway_resource" "sources" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  parent_id   = aws_api_gateway_rest_api.main.root_resource_id
+  path_part   = "sources"
+}
+
+resource "aws_api_gateway_resource" "source_status" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  parent_id   = aws_api_gateway_resource.sources.id
+  path_part   = "{source_id}"
+}
+
+resource "aws_api_gateway_method" "source_status_get" {
+  rest_api_id   = aws_api_gateway_rest_api.main.id
+  resource_id   = aws_api_gateway_resource.source_status.id
+  http_method   = "GET"
+  authorization = "NONE"
+
+  request_parameters = {
+    "method.request.path.source_id" = true
+  }
+}
+
+resource "aws_api_gateway_integration" "source_status_lambda_integration" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  resource_id = aws_api_gateway_resource.source_status.id
+  http_method = aws_api_gateway_method.source_status_get.http_method
+
+  integration_http_method = "POST"
+  type                   = "AWS_PROXY"
+  uri                    = var.lambda_invoke_arn
+}
+
+# API Gateway Resources for GET /transcripts/{video_id}
+resource "aws_api_gateway_resource" "transcripts" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  parent_id   = aws_api_gateway_rest_api.main.root_resource_id
+  path_part   = "transcripts"
+}
+
+resource "aws_api_gateway_resource" "transcript" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  parent_id   = aws_api_gateway_resource.transcripts.id
+  path_part   = "{video_id}"
+}
+
+resource "aws_api_gateway_method" "transcript_get" {
+  rest_api_id   = aws_api_gateway_rest_api.main.id
+  resource_id   = aws_api_gateway_resource.transcript.id
+  http_method   = "GET"
+  authorization = "NONE"
+
+  request_parameters = {
+    "method.request.path.video_id"      = true
+    "method.request.querystring.start" = false
+    "method.request.querystring.end"   = false
+  }
+}
+
+resource "aws_api_gateway_integration" "transcript_lambda_integration" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  resource_id = aws_api_gateway_resource.transcript.id
+  http_method = aws_api_gateway_method.transcript_get.http_method
+
+  integration_http_method = "POST"
+  type                   = "AWS_PROXY"
+  uri                    = var.lambda_invoke_arn
+}
+
+# API Gateway Resource for GET /search
+resource "aws_api_gateway_resource" "search" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  parent_id   = aws_api_gateway_rest_api.main.root_resource_id
+  path_part   = "search"
+}
+
+resource "aws_api_gateway_method" "search_get" {
+  rest_api_id   = aws_api_gateway_rest_api.main.id
+  resource_id   = aws_api_gateway_resource.search.id
+  http_method   = "GET"
+  authorization = "NONE"
+
+  request_parameters = {
+    "method.request.querystring.q"     = true
+    "method.request.querystring.limit" = false
+  }
+}
+
+resource "aws_api_gateway_integration" "search_lambda_integration" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  resource_id = aws_api_gateway_resource.search.id
+  http_method = aws_api_gateway_method.search_get.http_method
+
+  integration_http_method = "POST"
+  type                   = "AWS_PROXY"
+  uri                    = var.lambda_invoke_arn
+}
+
 # Lambda permission for API Gateway
 resource "aws_lambda_permission" "api_gateway_lambda" {
   statement_id  = "AllowExecutionFromAPIGateway"
@@ -50,10 +266,42 @@ resource "aws_api_gateway_deployment" "main" {
   depends_on = [
     aws_api_gateway_method.summarize_post,
     aws_api_gateway_integration.lambda_integration,
+    aws_api_gateway_method.job_get,
+    aws_api_gateway_integration.job_lambda_integration,
+    aws_api_gateway_integration.job_cors_integration,
+    aws_api_gateway_integration.batch_lambda_integration,
+    aws_api_gateway_integration.batch_status_lambda_integration,
+    aws_api_gateway_integration.ingest_lambda_integration,
+    aws_api_gateway_integration.source_status_lambda_integration,
+    aws_api_gateway_integration.transcript_lambda_integration,
+    aws_api_gateway_integration.search_lambda_integration,
+    aws_api_gateway_integration.route_cors_integration,
   ]
 
   rest_api_id = aws_api_gateway_rest_api.main.id
 
+  # Redeploy the stage whenever routes are added or changed
+  triggers = {
+    redeployment = sha1(jsonencode([
+      aws_api_gateway_resource.summarize.id,
+      aws_api_gateway_integration.lambda_integration.id,
+      aws_api_gateway_resource.job.id,
+      aws_api_gateway_integration.job_lambda_integration.id,
+      aws_api_gateway_resource.batch.id,
+      aws_api_gateway_integration.batch_lambda_integration.id,
+      aws_api_gateway_resource.batch_status.id,
+      aws_api_gateway_integration.batch_status_lambda_integration.id,
+      aws_api_gateway_resource.ingest.id,
+      aws_api_gateway_integration.ingest_lambda_integration.id,
+      aws_api_gateway_resource.source_status.id,
+      aws_api_gateway_integration.source_status_lambda_integration.id,
+      aws_api_gateway_resource.transcript.id,
+      aws_api_gateway_integration.transcript_lambda_integration.id,
+      aws_api_gateway_resource.search.id,
+      aws_api_gateway_integration.search_lambda_integration.id,
+    ]))
+  }
+
   lifecycle {
     create_before_destroy = true
   }
@@ -112,3 +360,111 @@ resource "aws_api_gateway_integration_response" "cors_integration_response" {
     "method.response.header.Access-Control-Allow-Origin"  = "'*'"
   }
 }
+
+resource "aws_api_gateway_method" "job_options" {
+  rest_api_id   = aws_api_gateway_rest_api.main.id
+  resource_id   = aws_api_gateway_resource.job.id
+  http_method   = "OPTIONS"
+  authorization = "NONE"
+}
+
+resource "aws_api_gateway_integration" "job_cors_integration" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  resource_id = aws_api_gateway_resource.job.id
+  http_method = aws_api_gateway_method.job_options.http_method
+  type        = "MOCK"
+
+  request_templates = {
+    "application/json" = "{\"statusCode\": 200}"
+  }
+}
+
+resource "aws_api_gateway_method_response" "job_cors_response" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  resource_id = aws_api_gateway_resource.job.id
+  http_method = aws_api_gateway_method.job_options.http_method
+  status_code = "200"
+
+  response_parameters = {
+    "method.response.header.Access-Control-Allow-Headers" = true
+    "method.response.header.Access-Control-Allow-Methods" = true
+    "method.response.header.Access-Control-Allow-Origin"  = true
+  }
+}
+
+resource "aws_api_gateway_integration_response" "job_cors_integration_response" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  resource_id = aws_api_gateway_resource.job.id
+  http_method = aws_api_gateway_method.job_options.http_method
+  status_code = aws_api_gateway_method_response.job_cors_response.status_code
+
+  response_parameters = {
+    "method.response.header.Access-Control-Allow-Headers" = "'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token'"
+    "method.response.header.Access-Control-Allow-Methods" = "'GET,OPTIONS'"
+    "method.response.header.Access-Control-Allow-Origin"  = "'*'"
+  }
+}
+
+# CORS preflight for the batch, ingestion, transcript and search routes
+locals {
+  cors_routes = {
+    batch         = { resource_id = aws_api_gateway_resource.batch.id, methods = "'POST,OPTIONS'" }
+    batch_status  = { resource_id = aws_api_gateway_resource.batch_status.id, methods = "'GET,OPTIONS'" }
+    ingest        = { resource_id = aws_api_gateway_resource.ingest.id, methods = "'POST,OPTIONS'" }
+    source_status = { resource_id = aws_api_gateway_resource.source_status.id, methods = "'GET,OPTIONS'" }
+    transcript    = { resource_id = aws_api_gateway_resource.transcript.id, methods = "'GET,OPTIONS'" }
+    search        = { resource_id = aws_api_gateway_resource.search.id, methods = "'GET,OPTIONS'" }
+  }
+}
+
+resource "aws_api_gateway_method" "route_options" {
+  for_each = local.cors_routes
+
+  rest_api_id   = aws_api_gateway_rest_api.main.id
+  resource_id   = each.value.resource_id
+  http_method   = "OPTIONS"
+  authorization = "NONE"
+}
+
+resource "aws_api_gateway_integration" "route_cors_integration" {
+  for_each = local.cors_routes
+
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  resource_id = each.value.resource_id
+  http_method = aws_api_gateway_method.route_options[each.key].http_method
+  type        = "MOCK"
+
+  request_templates = {
+    "application/json" = "{\"statusCode\": 200}"
+  }
+}
+
+resource "aws_api_gateway_method_response" "route_cors_response" {
+  for_each = local.cors_routes
+
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  resource_id = each.value.resource_id
+  http_method = aws_api_gateway_method.route_options[each.key].http_method
+  status_code = "200"
+
+  response_parameters = {
+    "method.response.header.Access-Control-Allow-Headers" = true
+    "method.response.header.Access-Control-Allow-Methods" = true
+    "method.response.header.Access-Control-Allow-Origin"  = true
+  }
+}
+
+resource "aws_api_gateway_integration_response" "route_cors_integration_response" {
+  for_each = local.cors_routes
+
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  resource_id = each.value.resource_id
+  http_method = aws_api_gateway_method.route_options[each.key].http_method
+  status_code = aws_api_gateway_method_response.route_cors_response[each.key].status_code
+
+  response_parameters = {
+    "method.response.header.Access-Control-Allow-Headers" = "'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token'"
+    "method.response.header.Access-Control-Allow-Methods" = each.value.methods
+    "method.response.header.Access-Control-Allow-Origin"  = "'*'"
+  }
+}
@@ -16,11 +16,12 @@ resource "aws_lambda_function" "video_processor" {
 
   environment {
     variables = {
-      RAW_BUCKET         = var.raw_bucket_name
-      TRANSCRIPTS_BUCKET = var.transcripts_bucket_name
-      SUMMARIES_BUCKET   = var.summaries_bucket_name
-      OPENAI_API_KEY     = var.openai_api_key
-      BEDROCK_MODEL      = var.bedrock_model
+      RAW_BUCKET           = var.raw_bucket_name
+      TRANSCRIPTS_BUCKET   = var.transcripts_bucket_name
+      SUMMARIES_BUCKET     = var.summaries_bucket_name
+      OPENAI_API_KEY       = var.openai_api_key
+      BEDROCK_MODEL        = var.bedrock_model
+      TRANSCRIPTION_EVENTS = "true"
     }
   }
 
@@ -69,7 +70,8 @@ resource "aws_iam_role_policy" "lambda_policy" {
         Action = [
           "s3:GetObject",
           "s3:PutObject",
-          "s3:DeleteObject"
+          "s3:DeleteObject",
+          "s3:AbortMultipartUpload"
         ]
         Resource = [
           "arn:aws:s3:::${var.raw_bucket_name}/*",
@@ -77,25 +79,124 @@ resource "aws_iam_role_policy" "lambda_policy" {
           "arn:aws:s3:::${var.summaries_bucket_name}/*"
         ]
       },
+      {
+        # Resuming a checkpointed streaming upload lists the parts already in S3
+        Effect = "Allow"
+        Action = [
+          "s3:ListMultipartUploadParts"
+        ]
+        Resource = "arn:aws:s3:::${var.raw_bucket_name}/*"
+      },
+      {
+        # Lets GetObject on a missing key return 404 instead of 403 (cache misses)
+        Effect = "Allow"
+        Action = [
+          "s3:ListBucket"
+        ]
+        Resource = [
+          "arn:aws:s3:::${var.transcripts_bucket_name}",
+          "arn:aws:s3:::${var.summaries_bucket_name}"
+        ]
+      },
       {
         Effect = "Allow"
         Action = [
           "transcribe:StartTranscriptionJob",
-          "transcribe:GetTranscriptionJob"
+          "transcribe:GetTranscriptionJob",
+          "transcribe:ListTranscriptionJobs"
         ]
         Resource = "*"
       },
       {
         Effect = "Allow"
         Action = [
-          "bedrock:InvokeModel"
+          "bedrock:InvokeModel",
+          "bedrock:InvokeModelWithResponseStream"
         ]
         Resource = "*"
+      },
+      {
+        # POST /summarize queues each job as an asynchronous self-invocation
+        Effect = "Allow"
+        Action = [
+          "lambda:InvokeFunction"
+        ]
+        Resource = aws_lambda_function.video_processor.arn
       }
     ]
   })
 }
 
+# Resume paused jobs when Transcribe writes its output to the transcripts bucket
+resource "aws_lambda_permission" "transcripts_bucket" {
+  statement_id  = "AllowExecutionFromTranscriptsBucket"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.video_processor.function_name
+  principal     = "s3.amazonaws.com"
+  source_arn    = "arn:aws:s3:::${var.transcripts_bucket_name}"
+}
+
+resource "aws_s3_bucket_notification" "transcribe_output" {
+  bucket = var.transcripts_bucket_name
+
+  lambda_function {
+    lambda_function_arn = aws_lambda_function.video_processor.arn
+    events              = ["s3:ObjectCreated:*"]
+    filter_prefix       = "transcribe-output/"
+    filter_suffix       = ".json"
+  }
+
+  depends_on = [aws_lambda_permission.transcripts_bucket]
+}
+
+# Resume or fail paused jobs when their Transcribe job finishes, including failures,
+# which write no output for the bucket notification above to pick up
+resource "aws_cloudwatch_event_rule" "transcribe_state_change" {
+  name = "${var.function_name}-transcribe-state-change"
+  event_pattern = jsonencode({
+    source        = ["aws.transcribe"]
+    "detail-type" = ["Transcribe Job State Change"]
+    detail = {
+      TranscriptionJobStatus = ["COMPLETED", "FAILED"]
+    }
+  })
+  tags = var.tags
+}
+
+resource "aws_cloudwatch_event_target" "transcribe_state_change" {
+  rule = aws_cloudwatch_event_rule.transcribe_state_change.name
+  arn  = aws_lambda_function.video_processor.arn
+}
+
+resource "aws_lambda_permission" "transcribe_state_change" {
+  statement_id  = "AllowExecutionFromTranscribeStateChange"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.video_processor.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.transcribe_state_change.arn
+}
+
+# Merge the search index segments on a schedule, so quiet periods still end with a merged index
+resource "aws_cloudwatch_event_rule" "search_merge" {
+  name                = "${var.function_name}-search-merge"
+  schedule_expression = var.search_merge_schedule
+  tags                = var.tags
+}
+
+resource "aws_cloudwatch_event_target" "search_merge" {
+  rule  = aws_cloudwatch_event_rule.search_merge.name
+  arn   = aws_lambda_function.video_processor.arn
+  input = jsonencode({ action = "merge_search_index" })
+}
+
+resource "aws_lambda_permission" "search_merge" {
+  statement_id  = "AllowExecutionFromSearchMergeSchedule"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.video_processor.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.search_merge.arn
+}
+
 # CloudWatch Log Group
 resource "aws_cloudwatch_log_group" "lambda_logs" {
   name              = "/aws/lambda/${var.function_name}"
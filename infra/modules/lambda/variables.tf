@@ -37,6 +37,12 @@ variable "bedrock_model" {
   default     = "anthropic.claude-3-sonnet-20240229-v1:0"
 }
 
+variable "search_merge_schedule" {
+  description = "EventBridge schedule for merging search index segments"
+  type        = string
+  default     = "rate(1 hour)"
+}
+
 variable "tags" {
   description = "Common tags to apply"
   type        = map(string)
@@ -38,6 +38,11 @@ resource "aws_s3_bucket_lifecycle_configuration" "raw" {
     expiration {
       days = var.raw_expiration_days
     }
+
+    # Unfinished streaming uploads are kept for a retry to resume (see checkpoints)
+    abort_incomplete_multipart_upload {
+      days_after_initiation = 1
+    }
   }
 }
 